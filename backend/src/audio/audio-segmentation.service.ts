@@ -1,5 +1,6 @@
 import { Injectable, Logger } from "@nestjs/common";
 import { ConfigService } from "@nestjs/config";
+import axios from "axios";
 import { exec } from "child_process";
 import { promisify } from "util";
 import { promises as fs } from "fs";
@@ -21,6 +22,8 @@ export class AudioSegmentationService {
   private readonly logger = new Logger(AudioSegmentationService.name);
   private readonly segmentDuration: number;
   private readonly segmentOverlap: number;
+  private readonly segmentPlanner: string;
+  private readonly pythonServiceUrl: string;
 
   constructor(
     private readonly storageService: StorageService,
@@ -34,6 +37,15 @@ export class AudioSegmentationService {
       this.configService.get<string>("AUDIO_SEGMENT_OVERLAP", "30"),
       10,
     );
+    // "fixed" cuts every N seconds; "silence" asks the Python service for
+    // cut points inside speech pauses (overlap can then be set near zero)
+    this.segmentPlanner = this.configService.get<string>(
+      "AUDIO_SEGMENT_PLANNER",
+      "fixed",
+    );
+    this.pythonServiceUrl =
+      this.configService.get<string>("PYTHON_SERVICE_URL") ||
+      "http://localhost:5000";
   }
 
   async getAudioDuration(audioPath: string): Promise<number> {
@@ -87,15 +99,17 @@ export class AudioSegmentationService {
     );
     await fs.mkdir(segmentsDir, { recursive: true });
 
-    let currentStart = 0;
-    let segmentIndex = 0;
+    const ranges =
+      (this.segmentPlanner === "silence" &&
+        (await this.planSilenceAlignedRanges(
+          audioPath,
+          optimalSegmentDuration,
+        ))) ||
+      this.planFixedRanges(duration, optimalSegmentDuration);
 
-    while (currentStart < duration) {
-      const segmentEnd = Math.min(
-        currentStart + optimalSegmentDuration,
-        duration,
-      );
-      const segmentStart = Math.max(0, currentStart - this.segmentOverlap);
+    for (const [segmentIndex, range] of ranges.entries()) {
+      const segmentStart = range.start;
+      const segmentEnd = range.end;
 
       const segmentFilename = `segment_${segmentIndex.toString().padStart(4, "0")}.wav`;
       const segmentPath = join(segmentsDir, segmentFilename);
@@ -109,9 +123,11 @@ export class AudioSegmentationService {
         segmentEnd - segmentStart,
       );
 
+      // startTime is where the segment audio begins (including the overlap),
+      // so segment-relative timestamps map onto the meeting timeline
       segments.push({
         index: segmentIndex,
-        startTime: currentStart,
+        startTime: segmentStart,
         endTime: segmentEnd,
         filePath: relativePath,
         absolutePath: segmentPath,
@@ -120,9 +136,6 @@ export class AudioSegmentationService {
       this.logger.log(
         `Created segment ${segmentIndex}: ${segmentStart.toFixed(2)}s - ${segmentEnd.toFixed(2)}s`,
       );
-
-      currentStart = segmentEnd;
-      segmentIndex++;
     }
 
     const estimatedParallelTime = duration / 60 / workerConcurrency;
@@ -132,6 +145,64 @@ export class AudioSegmentationService {
     return segments;
   }
 
+  private planFixedRanges(
+    duration: number,
+    segmentDuration: number,
+  ): Array<{ start: number; end: number }> {
+    const ranges: Array<{ start: number; end: number }> = [];
+    let currentStart = 0;
+    while (currentStart < duration) {
+      const segmentEnd = Math.min(currentStart + segmentDuration, duration);
+      ranges.push({
+        start: Math.max(0, currentStart - this.segmentOverlap),
+        end: segmentEnd,
+      });
+      currentStart = segmentEnd;
+    }
+    return ranges;
+  }
+
+  /**
+   * Ask the Python service for segment boundaries that fall into speech
+   * pauses near the target duration. Returns null (fixed planning is used)
+   * if the service is unavailable.
+   */
+  private async planSilenceAlignedRanges(
+    audioPath: string,
+    targetDuration: number,
+  ): Promise<Array<{ start: number; end: number }> | null> {
+    try {
+      const response = await axios.post<{
+        segments: Array<{ start: number; end: number; clean_cut: boolean }>;
+      }>(
+        `${this.pythonServiceUrl}/plan-segments`,
+        {
+          audio_path: audioPath.replace(/\\/g, "/"),
+          target_seconds: targetDuration,
+          overlap_seconds: this.segmentOverlap,
+        },
+        { timeout: 600000 },
+      );
+      const segments = response.data.segments ?? [];
+      if (segments.length === 0) {
+        return null;
+      }
+      const clean = segments.filter((segment) => segment.clean_cut).length;
+      this.logger.log(
+        `Silence-aligned plan: ${segments.length} segments, ${clean} clean cuts`,
+      );
+      return segments.map((segment) => ({
+        start: segment.start,
+        end: segment.end,
+      }));
+    } catch (error) {
+      this.logger.warn(
+        `Silence-aligned planning failed, using fixed segments: ${error}`,
+      );
+      return null;
+    }
+  }
+
   /**
    * Calculate optimal segment duration based on:
    * - Total video duration
@@ -194,6 +265,30 @@ export class AudioSegmentationService {
     return segmentDuration;
   }
 
+  /**
+   * Drop the Python service's per-meeting segment state (overlap cache and
+   * speaker reconciliation) once the meeting's segments are merged.
+   * Best effort: stale state is also pruned by age on the Python side.
+   */
+  async releaseSegmentState(meetingId: string): Promise<void> {
+    const token = this.configService.get<string>(
+      "PYTHON_SERVICE_CALLBACK_TOKEN",
+    );
+    try {
+      await axios.delete(
+        `${this.pythonServiceUrl}/meetings/${encodeURIComponent(meetingId)}/segment-state`,
+        {
+          timeout: 10000,
+          headers: token ? { "x-service-token": token } : undefined,
+        },
+      );
+    } catch (error) {
+      this.logger.warn(
+        `Failed to release segment state of meeting ${meetingId}: ${error}`,
+      );
+    }
+  }
+
   private async extractSegment(
     inputPath: string,
     outputPath: string,
@@ -1,6 +1,7 @@
 import {
   IsArray,
   IsEnum,
+  IsIn,
   IsNotEmpty,
   IsObject,
   IsOptional,
@@ -35,6 +36,11 @@ export class MeetingCallbackDto {
   @IsEnum(MeetingStatus)
   status?: MeetingStatus;
 
+  // "draft": first pass of a two-pass job, replaced by the final result
+  @IsOptional()
+  @IsIn(['draft', 'final', 'single'])
+  pass?: 'draft' | 'final' | 'single';
+
   @IsString()
   @IsOptional()
   summary?: string;
@@ -0,0 +1,70 @@
+import {
+  IsArray,
+  IsNotEmpty,
+  IsNumber,
+  IsObject,
+  IsOptional,
+  IsString,
+  ValidateNested,
+} from 'class-validator';
+import { Type } from 'class-transformer';
+
+class SegmentTranscriptEntryDto {
+  @IsString()
+  speaker: string;
+
+  // Meeting-wide speaker label from cross-segment reconciliation
+  @IsString()
+  @IsOptional()
+  meeting_speaker?: string;
+
+  @IsString()
+  text: string;
+
+  @IsNumber()
+  start: number;
+
+  @IsNumber()
+  end: number;
+
+  @IsString()
+  @IsOptional()
+  timestamp?: string;
+
+  @IsNumber()
+  @IsOptional()
+  confidence?: number;
+}
+
+export class SegmentCallbackDto {
+  @IsArray()
+  @ValidateNested({ each: true })
+  @Type(() => SegmentTranscriptEntryDto)
+  transcript: SegmentTranscriptEntryDto[];
+
+  @IsString()
+  @IsOptional()
+  error?: string;
+
+  @IsObject()
+  @IsOptional()
+  metrics?: Record<string, unknown>;
+
+  @IsObject()
+  @IsOptional()
+  quality?: Record<string, unknown>;
+}
+
+export class SegmentCallbackBatchItemDto extends SegmentCallbackDto {
+  @IsString()
+  @IsNotEmpty()
+  segmentId: string;
+}
+
+// Segment results coalesced by the Python service into one request
+export class SegmentCallbackBatchDto {
+  @IsArray()
+  @ValidateNested({ each: true })
+  @Type(() => SegmentCallbackBatchItemDto)
+  results: SegmentCallbackBatchItemDto[];
+}
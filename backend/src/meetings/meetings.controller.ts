@@ -19,10 +19,15 @@ import { UpdateMeetingDto } from './dto/update-meeting.dto';
 import { FileInterceptor } from '@nestjs/platform-express';
 import multer from 'multer';
 import { MeetingCallbackDto } from './dto/callback.dto';
+import {
+  SegmentCallbackBatchDto,
+  SegmentCallbackDto,
+} from './dto/segment-callback.dto';
 import { ConfigService } from '@nestjs/config';
 import type { Response } from 'express';
 import { StorageService } from '../storage/storage.service';
 import { promises as fs } from 'fs';
+import { MeetingSegment } from './entities/meeting-segment.entity';
 
 @Controller('meetings')
 export class MeetingsController {
@@ -113,16 +118,7 @@ export class MeetingsController {
   async handleSegmentCallback(
     @Param('meetingId') meetingId: string,
     @Param('segmentId') segmentId: string,
-    @Body()
-    segmentResult: {
-      transcript: Array<{
-        speaker: string;
-        text: string;
-        start: number;
-        end: number;
-        timestamp?: string;
-      }>;
-    },
+    @Body() segmentResult: SegmentCallbackDto,
     @Headers('x-callback-token') token?: string,
   ) {
     const expectedToken = this.configService.get<string>('callbackToken');
@@ -136,6 +132,29 @@ export class MeetingsController {
     );
   }
 
+  @Post(':meetingId/segments/callback-batch')
+  async handleSegmentCallbackBatch(
+    @Param('meetingId') meetingId: string,
+    @Body() batch: SegmentCallbackBatchDto,
+    @Headers('x-callback-token') token?: string,
+  ) {
+    const expectedToken = this.configService.get<string>('callbackToken');
+    if (!token || token !== expectedToken) {
+      throw new ForbiddenException('Invalid callback token');
+    }
+    const segments: MeetingSegment[] = [];
+    for (const result of batch.results) {
+      segments.push(
+        await this.meetingsService.handleSegmentCallback(
+          meetingId,
+          result.segmentId,
+          result,
+        ),
+      );
+    }
+    return segments;
+  }
+
   @Patch(':id')
   async update(@Param('id') id: string, @Body() updateMeetingDto: UpdateMeetingDto) {
     return this.meetingsService.update(id, updateMeetingDto);
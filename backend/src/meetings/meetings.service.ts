@@ -5,7 +5,7 @@ import {
   NotFoundException,
 } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository } from 'typeorm';
+import { In, Not, Repository } from 'typeorm';
 import { Meeting, MeetingStatus } from './entities/meeting.entity';
 import { Upload } from './entities/upload.entity';
 import { Utterance } from './entities/utterance.entity';
@@ -167,6 +167,9 @@ export class MeetingsService {
       await this.markFailed(id, callbackDto.extra?.['error'] as string);
       return this.findOne(id);
     }
+    if (callbackDto.pass === 'draft') {
+      return this.handleDraftCallback(id, callbackDto);
+    }
 
     const meeting = await this.findOne(id);
     meeting.summary = callbackDto.summary;
@@ -197,6 +200,37 @@ export class MeetingsService {
     return meeting;
   }
 
+  /**
+   * Store the draft transcript of a two-pass job without completing the
+   * meeting. Callbacks may arrive out of order, so the update only matches
+   * meetings that are not finished yet: a late draft never replaces the
+   * final result.
+   */
+  private async handleDraftCallback(
+    id: string,
+    callbackDto: MeetingCallbackDto,
+  ): Promise<Meeting> {
+    const meeting = await this.findOne(id);
+    const result = await this.meetingRepository.update(
+      {
+        id: meeting.id,
+        status: Not(In([MeetingStatus.COMPLETED, MeetingStatus.FAILED])),
+      },
+      {
+        status: MeetingStatus.PROCESSING,
+        formattedLines: callbackDto.formattedLines ?? null,
+        rawTranscript: callbackDto.raw_transcript ?? null,
+        extra: { ...(callbackDto.extra ?? {}), draft: true },
+      },
+    );
+    if (!result.affected) {
+      this.logger.log(
+        `Ignoring draft callback for meeting ${id}: already ${meeting.status}`,
+      );
+    }
+    return this.findOne(id);
+  }
+
   async markFailed(id: string, reason?: string) {
     const meeting = await this.findOne(id);
     meeting.status = MeetingStatus.FAILED;
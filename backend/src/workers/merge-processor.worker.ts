@@ -13,6 +13,7 @@ import {
   AudioMergeService,
   SegmentTranscript,
 } from '../audio/audio-merge.service';
+import { AudioSegmentationService } from '../audio/audio-segmentation.service';
 import { MeetingsService } from '../meetings/meetings.service';
 import { AUDIO_PROCESSING_QUEUE } from '../queue/audio-processing.queue';
 
@@ -33,6 +34,7 @@ export class MergeProcessorWorker extends WorkerHost {
     @InjectRepository(MeetingSegment)
     private readonly segmentRepository: Repository<MeetingSegment>,
     private readonly audioMergeService: AudioMergeService,
+    private readonly audioSegmentationService: AudioSegmentationService,
     private readonly meetingsService: MeetingsService,
   ) {
     super();
@@ -189,6 +191,7 @@ export class MergeProcessorWorker extends WorkerHost {
       await this.meetingRepository.save(meeting);
 
       this.logger.log(`[SUCCESS] Merge completed for meeting ${meetingId}`);
+      await this.audioSegmentationService.releaseSegmentState(meetingId);
     } catch (error) {
       this.logger.error(`Failed to merge segments: ${error}`);
       meeting.status = MeetingStatus.FAILED;
@@ -1,14 +1,31 @@
 import os
+import re
 import shutil
+import threading
+import time
 import traceback
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
-import requests
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, HttpUrl
 
+import metrics
+import profiles
+import thread_budget
+
+# OpenMP / MKL size their pools when torch is first imported
+thread_budget.configure_process_threads()
+
+from callback_delivery import CallbackDelivery
+from audio_processor import AudioProcessor
 from integrated_meeting_system import IntegratedMeetingSystem
+from job_scheduler import Job, JobCancelled, JobScheduler, QueueFullError
+from overlap_cache import OverlapCache, OverlapPlan
+from profiler import StageProfiler
+from quality_controller import QualityController
+from speaker_reconciliation import SpeakerReconciler
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_OUTPUT_DIR = Path(
@@ -26,10 +43,91 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CALLBACK_TOKEN = os.getenv("BACKEND_CALLBACK_TOKEN", "73755272400664530092426538745578")
 SERVICE_API_TOKEN = os.getenv("SERVICE_API_TOKEN") or CALLBACK_TOKEN
 DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "vi")
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "1"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "16"))
+JOB_AGING_SECONDS = float(os.getenv("JOB_AGING_SECONDS", "300"))
+QUALITY_SLO_SECONDS = float(os.getenv("QUALITY_SLO_SECONDS", "0"))
+QUALITY_SHED_PROFILE = os.getenv("QUALITY_SHED_PROFILE", "draft").lower()
+QUALITY_SHED_PRIORITIES = [
+    name.strip() for name in os.getenv("QUALITY_SHED_PRIORITIES", "bulk").split(",") if name.strip()
+]
+QUALITY_RESTORE_FRACTION = float(os.getenv("QUALITY_RESTORE_FRACTION", "0.5"))
+CALLBACK_OUTBOX_DIR = Path(
+    os.getenv("CALLBACK_OUTBOX_DIR", DEFAULT_OUTPUT_DIR / ".outbox")
+).resolve()
+CALLBACK_WORKERS = int(os.getenv("CALLBACK_WORKERS", "2"))
+CALLBACK_TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "30"))
+CALLBACK_COALESCE_WINDOW = float(os.getenv("CALLBACK_COALESCE_WINDOW", "0"))
+SPEAKER_RECONCILE_DIR = Path(
+    os.getenv("SPEAKER_RECONCILE_DIR", DEFAULT_OUTPUT_DIR / ".speakers")
+).resolve()
+SPEAKER_LINK_THRESHOLD = float(os.getenv("SPEAKER_LINK_THRESHOLD", "0.55"))
+SEGMENT_OVERLAP_REUSE = os.getenv("SEGMENT_OVERLAP_REUSE", "1") == "1"
+SEGMENT_OVERLAP_CACHE_DIR = Path(
+    os.getenv("SEGMENT_OVERLAP_CACHE_DIR", DEFAULT_OUTPUT_DIR / ".overlap")
+).resolve()
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Relative run time of the stages of each job kind (CPU, balanced profile);
+# the scheduler replaces them with measured shares once a job has completed
+JOB_STAGE_WEIGHTS = {
+    "process": {"normalize": 2, "enroll": 2, "transcribe": 45, "align": 10,
+                "diarize": 25, "identify": 10, "summarize": 5, "save": 1},
+    "process-segment": {"enroll": 2, "normalize": 2, "vad": 2, "transcribe": 48,
+                        "align": 10, "diarize": 26, "identify": 9, "reconcile": 1},
+    "process-segments": {"enroll": 3, "segments": 97},
+}
+
+# .../meetings/<meetingId>/segments/<segmentId>/callback
+SEGMENT_CALLBACK_PATTERN = re.compile(
+    r"^(?P<base>.*/meetings/(?P<meeting>[^/]+)/segments)/(?P<segment>[^/]+)/callback$"
+)
 
 app = FastAPI(title="Meeting Transcription Adapter")
 
 system: Optional[IntegratedMeetingSystem] = None
+system_lock = threading.Lock()
+
+# Startup progress, written by the model loading thread and read by the
+# probes: "starting" -> "loading" -> "ready" (or "failed")
+readiness_lock = threading.Lock()
+readiness: Dict = {
+    "status": "starting",
+    "models": {},
+    "error": None,
+    "started_at": time.time(),
+    "ready_seconds": None,
+}
+scheduler = JobScheduler(
+    max_concurrency=JOB_MAX_CONCURRENCY,
+    max_queue_size=JOB_MAX_QUEUE,
+    aging_seconds=JOB_AGING_SECONDS,
+    stage_weights=JOB_STAGE_WEIGHTS,
+)
+quality = QualityController(
+    scheduler,
+    slo_seconds=QUALITY_SLO_SECONDS,
+    degraded_profile=QUALITY_SHED_PROFILE,
+    priorities=QUALITY_SHED_PRIORITIES,
+    restore_fraction=QUALITY_RESTORE_FRACTION,
+)
+
+delivery = CallbackDelivery(
+    outbox_dir=str(CALLBACK_OUTBOX_DIR),
+    headers={"x-callback-token": CALLBACK_TOKEN},
+    workers=CALLBACK_WORKERS,
+    timeout=CALLBACK_TIMEOUT,
+    coalesce_window=CALLBACK_COALESCE_WINDOW,
+)
+
+reconciler = SpeakerReconciler(
+    store_dir=str(SPEAKER_RECONCILE_DIR),
+    similarity_threshold=SPEAKER_LINK_THRESHOLD,
+)
+
+overlap_cache = OverlapCache(store_dir=str(SEGMENT_OVERLAP_CACHE_DIR))
+
+Priority = Literal["interactive", "normal", "bulk"]
 
 
 class ProcessRequest(BaseModel):
@@ -38,6 +136,16 @@ class ProcessRequest(BaseModel):
     callback_url: HttpUrl
     language: Optional[str] = None
     enroll_dir: Optional[str] = None
+    priority: Priority = "normal"
+    # Quality profile (draft / balanced / accurate; DEFAULT_PROFILE if None)
+    profile: Optional[str] = None
+    # Send a draft callback (TWO_PASS_DRAFT_PROFILE, diarization labels only)
+    # before the COMPLETED one
+    two_pass: bool = False
+    # Speaker-count hints for diarization (e.g. from the participant list)
+    num_speakers: Optional[int] = None
+    min_speakers: Optional[int] = None
+    max_speakers: Optional[int] = None
 
 
 class ProcessSegmentRequest(BaseModel):
@@ -48,6 +156,39 @@ class ProcessSegmentRequest(BaseModel):
     callback_url: HttpUrl
     language: Optional[str] = None
     enroll_dir: Optional[str] = None
+    priority: Priority = "interactive"
+    profile: Optional[str] = None
+    # Meeting-level counts; a segment uses them as an upper bound
+    num_speakers: Optional[int] = None
+    min_speakers: Optional[int] = None
+    max_speakers: Optional[int] = None
+
+
+class SegmentItem(BaseModel):
+    segment_path: str
+    segment_start_time: float
+    segment_index: int
+    callback_url: HttpUrl
+
+
+class ProcessSegmentsRequest(BaseModel):
+    meeting_id: str
+    segments: List[SegmentItem]
+    language: Optional[str] = None
+    enroll_dir: Optional[str] = None
+    priority: Priority = "interactive"
+    profile: Optional[str] = None
+    num_speakers: Optional[int] = None
+    min_speakers: Optional[int] = None
+    max_speakers: Optional[int] = None
+
+
+class PlanSegmentsRequest(BaseModel):
+    audio_path: str
+    target_seconds: float = 600.0
+    search_seconds: float = 60.0
+    min_silence_seconds: float = 0.3
+    overlap_seconds: float = 0.0
 
 
 class GenerateSummaryRequest(BaseModel):
@@ -70,28 +211,104 @@ def ensure_directories() -> None:
 
 
 def get_system() -> IntegratedMeetingSystem:
+    """The shared system (cheap to build: models load on first use or preload)."""
     global system
-    if system is None:
-        if not HUGGINGFACE_TOKEN:
-            raise RuntimeError("HF_TOKEN or HUGGINGFACE_TOKEN is required")
-        ensure_directories()
-        system = IntegratedMeetingSystem(
-            huggingface_token=HUGGINGFACE_TOKEN,
-            google_api_key=GOOGLE_API_KEY,
-            speaker_db_dir=str(SPEAKER_DB_DIR),
+    with system_lock:
+        if system is None:
+            if not HUGGINGFACE_TOKEN:
+                raise RuntimeError("HF_TOKEN or HUGGINGFACE_TOKEN is required")
+            ensure_directories()
+            system = IntegratedMeetingSystem(
+                huggingface_token=HUGGINGFACE_TOKEN,
+                google_api_key=GOOGLE_API_KEY,
+                speaker_db_dir=str(SPEAKER_DB_DIR),
+            )
+        return system
+
+
+def readiness_snapshot() -> Dict:
+    with readiness_lock:
+        snapshot = dict(readiness)
+        snapshot["models"] = {name: dict(info) for name, info in readiness["models"].items()}
+    return snapshot
+
+
+def record_model_progress(model: str, status: str, seconds: Optional[float]) -> None:
+    """progress callback of IntegratedMeetingSystem.preload()."""
+    with readiness_lock:
+        info = readiness["models"].setdefault(model, {})
+        # seconds is the duration of the step that just finished
+        if seconds is not None:
+            key = "warmup_seconds" if info.get("status") == "warming" else "load_seconds"
+            info[key] = round(seconds, 3)
+            if key == "warmup_seconds":
+                metrics.MODEL_WARMUP_SECONDS.labels(model).set(seconds)
+        info["status"] = status
+    print(f"[INFO] Model {model}: {status}"
+          + (f" ({seconds:.1f}s)" if seconds is not None else ""))
+
+
+def load_models() -> None:
+    """Load (and warm up) every model; runs in a background thread at startup."""
+    with readiness_lock:
+        readiness["status"] = "loading"
+    try:
+        get_system().preload(
+            language=DEFAULT_LANGUAGE,
+            warmup=MODEL_WARMUP,
+            progress=record_model_progress,
         )
-    return system
+    except Exception as exc:  # noqa: BLE001
+        traceback.print_exc()
+        with readiness_lock:
+            readiness["status"] = "failed"
+            readiness["error"] = str(exc)
+        print(f"[python-service-metting] Failed to initialize system: {exc}")
+        return
+    with readiness_lock:
+        readiness["status"] = "ready"
+        readiness["ready_seconds"] = round(time.time() - readiness["started_at"], 3)
+    metrics.SERVICE_READY.set(1)
+    print(f"[python-service-metting] System ready in {readiness['ready_seconds']:.1f}s")
 
 
-def notify_backend(callback_url: str, payload: dict) -> None:
-    headers = {"x-callback-token": CALLBACK_TOKEN}
-    try:
-        response = requests.post(
-            callback_url, json=payload, headers=headers, timeout=120
+def collect_system_metrics() -> None:
+    """Refresh gauges that mirror the loaded system (runs on each scrape)."""
+    if system is None:
+        return
+    metrics.SPEAKER_DB_SIZE.set(len(system.speaker_db))
+    for model_name, seconds in system.all_model_load_seconds().items():
+        metrics.MODEL_LOAD_SECONDS.labels(model_name).set(seconds)
+
+
+def collect_delivery_metrics() -> None:
+    metrics.CALLBACK_OUTBOX_PENDING.set(delivery.pending())
+
+
+metrics.REGISTRY.add_collector(collect_system_metrics)
+metrics.REGISTRY.add_collector(collect_delivery_metrics)
+
+
+def notify_backend(callback_url: str, payload: dict, supersede_key: Optional[str] = None) -> None:
+    """
+    Hand a callback to the delivery outbox (returns immediately).
+
+    Segment callbacks of the same meeting may be coalesced into one POST to
+    `.../segments/callback-batch` when CALLBACK_COALESCE_WINDOW > 0. A
+    callback with a supersede_key drops pending callbacks with the same key.
+    """
+    callback_url = str(callback_url)
+    match = SEGMENT_CALLBACK_PATTERN.match(callback_url)
+    if match:
+        delivery.send(
+            callback_url,
+            payload,
+            coalesce_key=match.group("meeting"),
+            batch_url=f"{match.group('base')}/callback-batch",
+            batch_fields={"segmentId": match.group("segment")},
         )
-        response.raise_for_status()
-    except Exception as exc:  # noqa: BLE001
-        print(f"[python-service-metting] Failed to notify backend: {exc}")
+    else:
+        delivery.send(callback_url, payload, supersede_key=supersede_key)
 
 
 def format_meeting_payload(result: Dict, output_dir: Path) -> Dict:
@@ -124,14 +341,74 @@ def format_meeting_payload(result: Dict, output_dir: Path) -> Dict:
         "extra": {
             "formatted_text": formatted_text,
             "output_dir": str(output_dir),
+            "metrics": result.get("metadata", {}).get("metrics"),
         },
     }
 
 
+SPEAKER_HINT_FIELDS = ("num_speakers", "min_speakers", "max_speakers")
+
+
+def speaker_hints(request) -> Dict[str, int]:
+    """Speaker-count hints set on a request."""
+    return {
+        name: getattr(request, name)
+        for name in SPEAKER_HINT_FIELDS
+        if getattr(request, name) is not None
+    }
+
+
+def validate_speaker_hints(request) -> None:
+    hints = speaker_hints(request)
+    if any(value < 1 for value in hints.values()):
+        raise HTTPException(status_code=400, detail="Speaker counts must be >= 1")
+    if "min_speakers" in hints and "max_speakers" in hints \
+            and hints["min_speakers"] > hints["max_speakers"]:
+        raise HTTPException(status_code=400, detail="min_speakers must be <= max_speakers")
+
+
+def validate_profile(request) -> None:
+    """Reject unknown profiles and profiles whose models this service does not load."""
+    if request.profile is None:
+        return
+    try:
+        profile = profiles.get_profile(request.profile)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    active = profiles.active_profiles()
+    if profile.name not in active:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Profile '{profile.name}' is not active (active: {', '.join(active)})",
+        )
+
+
+def validate_two_pass(request: ProcessRequest) -> None:
+    if request.two_pass and profiles.DRAFT_PROFILE not in profiles.active_profiles():
+        raise HTTPException(
+            status_code=400,
+            detail=f"two_pass needs the '{profiles.DRAFT_PROFILE}' profile in ACTIVE_PROFILES",
+        )
+
+
+def observe_first_transcript(job: Job, mode: str) -> None:
+    """Time-to-first-transcript as the user sees it: from acceptance, queue wait included."""
+    metrics.TIME_TO_FIRST_TRANSCRIPT.labels(mode).observe(time.time() - job.created_at)
+
+
+def display_speaker(entry: Dict) -> str:
+    """Enrolled name if identified, otherwise the meeting-wide reconciled label."""
+    identified = entry.get("identified_speaker")
+    if identified and identified != "Unknown":
+        return identified
+    return entry.get("meeting_speaker") or identified or entry.get("speaker", "UNKNOWN")
+
+
 def build_segment_transcript(merged_entries: List[Dict]) -> List[Dict]:
     return [
         {
-            "speaker": entry.get("identified_speaker") or entry.get("speaker", "UNKNOWN"),
+            "speaker": display_speaker(entry),
+            "meeting_speaker": entry.get("meeting_speaker"),
             "text": entry.get("text", ""),
             "start": entry.get("start", 0.0),
             "end": entry.get("end", 0.0),
@@ -142,10 +419,56 @@ def build_segment_transcript(merged_entries: List[Dict]) -> List[Dict]:
     ]
 
 
+def reconcile_segment(
+    meeting_id: str, segment_index: int, segment_start: float, entries: List[Dict]
+) -> None:
+    """Attach meeting-wide speaker labels; a store failure keeps the transcript."""
+    try:
+        reconciler.reconcile(meeting_id, segment_index, segment_start, entries)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[WARN] Speaker reconciliation failed for {meeting_id}/{segment_index}: {exc}")
+
+
+def plan_overlap(
+    meeting_id: str, segment_index: int, segment_start: float, segment_end: float
+) -> OverlapPlan:
+    """Reuse plan from already processed neighbour segments (empty if disabled)."""
+    if not SEGMENT_OVERLAP_REUSE:
+        return OverlapPlan()
+    try:
+        plan = overlap_cache.plan(meeting_id, segment_index, segment_start, segment_end)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[WARN] Overlap cache lookup failed for {meeting_id}/{segment_index}: {exc}")
+        return OverlapPlan()
+    if plan.reused:
+        print(f"[CACHE] Segment {segment_index}: reusing {len(plan.reused)} overlap entries, "
+              f"transcribing {plan.transcribe_from:.1f}s - "
+              f"{'end' if plan.transcribe_to is None else f'{plan.transcribe_to:.1f}s'}")
+    return plan
+
+
+def remember_overlap(
+    meeting_id: str,
+    segment_index: int,
+    segment_start: float,
+    segment_end: float,
+    entries: List[Dict],
+) -> List[Dict]:
+    """Entries still to deliver: those a neighbour segment already delivered are dropped."""
+    if not SEGMENT_OVERLAP_REUSE:
+        return entries
+    try:
+        return overlap_cache.store(meeting_id, segment_index, segment_start, segment_end, entries)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[WARN] Overlap cache update failed for {meeting_id}/{segment_index}: {exc}")
+        return entries
+
+
 def run_segment_pipeline(
     request: ProcessSegmentRequest,
     system_instance: IntegratedMeetingSystem,
     enroll_dir: Path,
+    profiler: StageProfiler,
 ) -> List[Dict]:
     if not Path(request.segment_path).exists():
         raise FileNotFoundError(f"Segment file not found: {request.segment_path}")
@@ -156,34 +479,83 @@ def run_segment_pipeline(
     temp_dir.mkdir(parents=True, exist_ok=True)
 
     language = request.language or DEFAULT_LANGUAGE
-    normalized_path = temp_dir / "normalized.wav"
+    segment_end = request.segment_start_time + system_instance.audio_processor.get_audio_duration(
+        request.segment_path
+    )
+    plan = plan_overlap(
+        request.meeting_id, request.segment_index, request.segment_start_time, segment_end
+    )
 
     try:
-        system_instance.recognizer.enroll_speakers_from_directory(
-            str(enroll_dir), force=False
-        )
-        normalized_audio = system_instance.audio_processor.normalize_audio(
-            request.segment_path, str(normalized_path)
-        )
-        transcript_result = system_instance.transcriber.transcribe(
-            normalized_audio, language=language
-        )
-        diarization = system_instance.diarizer.diarize(normalized_audio)
-        merged = system_instance._merge_transcript_diarization_and_identify(  # noqa: SLF001
-            transcript_result,
-            diarization,
-            normalized_audio,
+        merged = system_instance.process_segment(
+            request.segment_path,
+            str(enroll_dir),
             str(temp_dir),
+            language=language,
+            profiler=profiler,
+            overlap=plan,
+            speaker_hints=speaker_hints(request),
+            profile=request.profile,
         )
-        return build_segment_transcript(merged)
+        with profiler.stage("reconcile", audio_seconds=0.0):
+            reconcile_segment(
+                request.meeting_id,
+                request.segment_index,
+                request.segment_start_time,
+                merged,
+            )
+        # Reused overlap entries were already delivered with the neighbour segment
+        delivered = remember_overlap(
+            request.meeting_id,
+            request.segment_index,
+            request.segment_start_time,
+            segment_end,
+            [entry for entry in merged if not entry.get("reused")],
+        )
+        return build_segment_transcript(delivered)
     finally:
         shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-def process_audio_task(request: ProcessRequest) -> None:
+def submit_job(kind: str, func, request):
+    """
+    Queue a job on the scheduler, translating backpressure into HTTP 429.
+
+    The quality controller may lower request.profile under load; func is
+    called as func(job, request, decision) to record that in the result.
+    """
+    decision = quality.decide(request.priority, request.profile)
+    request.profile = decision["applied_profile"]
+    try:
+        job = scheduler.submit(kind, func, request, decision, priority=request.priority)
+    except QueueFullError as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    except RuntimeError as exc:
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": "30"}
+        ) from exc
+    if decision["degraded"]:
+        metrics.JOBS_DEGRADED.labels(kind).inc()
+        print(f"[INFO] Job {job.job_id} ({kind}, {request.priority}) runs as "
+              f"'{decision['applied_profile']}' instead of '{decision['requested_profile']}' "
+              f"(projected wait {decision['projected_wait_seconds']:.0f}s)")
+    return job
+
+
+def process_audio_task(job: Job, request: ProcessRequest, decision: Dict) -> None:
     system_instance = get_system()
     enroll_dir = Path(request.enroll_dir or DEFAULT_ENROLL_DIR)
     language = request.language or DEFAULT_LANGUAGE
+    profiler = StageProfiler(listener=job)
+    job.profiler = profiler
+    # A job shed to the draft profile has nothing better to send first
+    two_pass = request.two_pass and request.profile != profiles.DRAFT_PROFILE
+    # The final (or failure) callback replaces a draft still in the outbox
+    callback_key = f"meeting:{request.meetingId}"
 
     try:
         if not Path(request.audio_path).exists():
@@ -194,72 +566,210 @@ def process_audio_task(request: ProcessRequest) -> None:
         output_dir = DEFAULT_OUTPUT_DIR / request.meetingId
         output_dir.mkdir(parents=True, exist_ok=True)
 
+        def send_draft(draft: Dict) -> None:
+            draft["metadata"]["quality"] = decision
+            payload = format_meeting_payload(draft, output_dir)
+            # The backend stores a draft without completing the meeting and
+            # ignores it once the meeting is COMPLETED
+            payload["status"] = "PROCESSING"
+            payload["pass"] = "draft"
+            notify_backend(request.callback_url, payload, supersede_key=callback_key)
+            observe_first_transcript(job, "two_pass")
+
         result = system_instance.process_meeting(
             audio_path=request.audio_path,
             enroll_dir=str(enroll_dir),
             output_dir=str(output_dir),
             language=language,
+            profiler=profiler,
+            speaker_hints=speaker_hints(request),
+            profile=request.profile,
+            on_draft=send_draft if two_pass else None,
         )
+        result["metadata"]["quality"] = decision
         payload = format_meeting_payload(result, output_dir)
+        metrics.observe_pipeline(result["metadata"]["metrics"])
+    except JobCancelled:
+        # Cancelled by the backend: it no longer expects a callback
+        raise
     except Exception as exc:  # noqa: BLE001
         traceback.print_exc()
         payload = {
             "status": "FAILED",
             "formattedLines": [],
             "raw_transcript": [],
-            "extra": {"error": str(exc)},
+            "extra": {"error": str(exc), "metrics": profiler.summary(), "quality": decision},
         }
+        notify_backend(request.callback_url, payload, supersede_key=callback_key)
+        raise
 
-    notify_backend(request.callback_url, payload)
+    notify_backend(request.callback_url, payload, supersede_key=callback_key)
+    if not two_pass:
+        observe_first_transcript(job, "single_pass")
 
 
-def process_segment_task(request: ProcessSegmentRequest) -> None:
+def process_segment_task(job: Job, request: ProcessSegmentRequest, decision: Dict) -> None:
     system_instance = get_system()
     enroll_dir = Path(request.enroll_dir or DEFAULT_ENROLL_DIR)
+    profiler = StageProfiler(listener=job)
+    job.profiler = profiler
 
     try:
         if not enroll_dir.exists():
             raise FileNotFoundError(f"Enroll directory not found: {enroll_dir}")
 
-        transcript = run_segment_pipeline(request, system_instance, enroll_dir)
-        payload = {"transcript": transcript}
+        transcript = run_segment_pipeline(
+            request, system_instance, enroll_dir, profiler
+        )
+        payload = {"transcript": transcript, "metrics": profiler.summary(), "quality": decision}
+        metrics.observe_pipeline(payload["metrics"])
+    except JobCancelled:
+        raise
     except Exception as exc:  # noqa: BLE001
         traceback.print_exc()
-        payload = {"transcript": [], "error": str(exc)}
+        payload = {
+            "transcript": [],
+            "error": str(exc),
+            "metrics": profiler.summary(),
+            "quality": decision,
+        }
+        notify_backend(request.callback_url, payload)
+        raise
 
     notify_backend(request.callback_url, payload)
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint to verify service is ready."""
+def process_segments_task(job: Job, request: ProcessSegmentsRequest, decision: Dict) -> None:
+    system_instance = get_system()
+    enroll_dir = Path(request.enroll_dir or DEFAULT_ENROLL_DIR)
+    profiler = StageProfiler(listener=job)
+    job.profiler = profiler
+    segments = [item.model_dump() for item in request.segments]
+    delivered = set()
+
+    def send_segment_result(result: Dict) -> None:
+        segment = result["segment"]
+        delivered.add(segment["segment_index"])
+        if result["error"] is None:
+            reconcile_segment(
+                request.meeting_id,
+                segment["segment_index"],
+                segment["segment_start_time"],
+                result["entries"],
+            )
+            entries = remember_overlap(
+                request.meeting_id,
+                segment["segment_index"],
+                segment["segment_start_time"],
+                segment["segment_start_time"] + result["metrics"]["total"]["audio_seconds"],
+                result["entries"],
+            )
+            payload = {
+                "transcript": build_segment_transcript(entries),
+                "metrics": result["metrics"],
+                "quality": decision,
+            }
+            metrics.observe_pipeline(payload["metrics"])
+        else:
+            payload = {
+                "transcript": [],
+                "error": str(result["error"]),
+                "metrics": result["metrics"],
+                "quality": decision,
+            }
+        notify_backend(segment["callback_url"], payload)
+
+    # Per job: a retried or re-submitted batch of the same meeting may run
+    # concurrently and must not delete this job's files
+    temp_dir = DEFAULT_OUTPUT_DIR / ".segments" / request.meeting_id / f"batch-{job.job_id}"
     try:
-        system_instance = get_system()
-        return {
-            "status": "healthy",
-            "models_loaded": True,
-            "enrolled_speakers": len(system_instance.recognizer.get_enrolled_speakers()),
-        }
+        if not enroll_dir.exists():
+            raise FileNotFoundError(f"Enroll directory not found: {enroll_dir}")
+
+        results = system_instance.process_segments(
+            segments,
+            str(enroll_dir),
+            str(temp_dir),
+            language=request.language or DEFAULT_LANGUAGE,
+            profiler=profiler,
+            on_result=send_segment_result,
+            speaker_hints=speaker_hints(request),
+            profile=request.profile,
+        )
+    except JobCancelled:
+        raise
     except Exception as exc:  # noqa: BLE001
+        traceback.print_exc()
+        # Segments that already streamed back keep their result
+        for segment in segments:
+            if segment["segment_index"] in delivered:
+                continue
+            notify_backend(
+                segment["callback_url"],
+                {"transcript": [], "error": str(exc), "metrics": profiler.summary(), "quality": decision},
+            )
+        raise
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    failed = sum(1 for result in results if result["error"] is not None)
+    if failed:
+        raise RuntimeError(f"{failed}/{len(results)} segments failed")
+
+
+@app.get("/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving HTTP (models may still be loading)."""
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once every model is loaded and warmed up, 503 before."""
+    snapshot = readiness_snapshot()
+    if snapshot["status"] != "ready":
+        raise HTTPException(status_code=503, detail=snapshot)
+    return snapshot
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint to verify service is ready (never loads models)."""
+    snapshot = readiness_snapshot()
+    if snapshot["status"] != "ready":
         raise HTTPException(
-            status_code=503, detail=f"Service not ready: {exc}"
-        ) from exc
+            status_code=503,
+            detail=f"Service not ready: {snapshot['error'] or snapshot['status']}",
+        )
+    return {
+        "status": "healthy",
+        "models_loaded": system.models_loaded,
+        "enrolled_speakers": len(system.speaker_db),
+        "jobs": scheduler.stats(),
+        "quality": quality.stats(),
+        "threads": system.thread_budget.stats() if system.thread_budget else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of pipeline, job and cache metrics."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 @app.on_event("startup")
 async def startup_event():
-    try:
-        get_system()
-        print("[python-service-metting] System initialized")
-    except Exception as exc:  # noqa: BLE001
-        print(f"[python-service-metting] Failed to initialize system: {exc}")
+    delivery.start()
+    # Models load off the event loop so /live answers immediately and
+    # /ready reports progress; jobs submitted meanwhile wait in the queue
+    threading.Thread(target=load_models, name="model-loader", daemon=True).start()
 
 
 @app.post("/process")
-async def process_audio_endpoint(
-    request: ProcessRequest,
-    background_tasks: BackgroundTasks,
-):
+async def process_audio_endpoint(request: ProcessRequest):
     # Normalize path for Windows compatibility
     # Backend now sends forward slashes, but we need to convert them back to backslashes on Windows
     import platform
@@ -278,16 +788,16 @@ async def process_audio_endpoint(
     
     if not Path(request.audio_path).exists():
         raise HTTPException(status_code=400, detail=f"Audio path not found: {request.audio_path}")
+    validate_speaker_hints(request)
+    validate_profile(request)
+    validate_two_pass(request)
 
-    background_tasks.add_task(process_audio_task, request)
-    return {"status": "queued", "meetingId": request.meetingId}
+    job = submit_job("process", process_audio_task, request)
+    return {"status": "queued", "meetingId": request.meetingId, "job_id": job.job_id}
 
 
 @app.post("/process-segment")
-async def process_segment_endpoint(
-    request: ProcessSegmentRequest,
-    background_tasks: BackgroundTasks,
-):
+async def process_segment_endpoint(request: ProcessSegmentRequest):
     # Normalize path for Windows compatibility
     # Backend now sends forward slashes, but we need to convert them back to backslashes on Windows
     import platform
@@ -302,15 +812,109 @@ async def process_segment_endpoint(
     
     if not Path(request.segment_path).exists():
         raise HTTPException(status_code=400, detail=f"Segment path not found: {request.segment_path}")
+    validate_speaker_hints(request)
+    validate_profile(request)
 
-    background_tasks.add_task(process_segment_task, request)
+    job = submit_job("process-segment", process_segment_task, request)
     return {
         "status": "queued",
         "meeting_id": request.meeting_id,
         "segment_index": request.segment_index,
+        "job_id": job.job_id,
     }
 
 
+@app.post("/process-segments")
+async def process_segments_endpoint(request: ProcessSegmentsRequest):
+    """Process all segments of a meeting as one pipelined job."""
+    import platform
+    for segment in request.segments:
+        if platform.system() == "Windows":
+            segment.segment_path = segment.segment_path.replace("/", "\\")
+        if not Path(segment.segment_path).exists():
+            raise HTTPException(
+                status_code=400, detail=f"Segment path not found: {segment.segment_path}"
+            )
+    if not request.segments:
+        raise HTTPException(status_code=400, detail="No segments given")
+    validate_speaker_hints(request)
+    validate_profile(request)
+
+    job = submit_job("process-segments", process_segments_task, request)
+    return {
+        "status": "queued",
+        "meeting_id": request.meeting_id,
+        "segment_count": len(request.segments),
+        "job_id": job.job_id,
+    }
+
+
+@app.post("/plan-segments")
+def plan_segments_endpoint(request: PlanSegmentsRequest):
+    """Suggest segment boundaries that fall into speech pauses (no models needed)."""
+    import platform
+    if platform.system() == "Windows":
+        request.audio_path = request.audio_path.replace("/", "\\")
+    if not Path(request.audio_path).exists():
+        raise HTTPException(status_code=400, detail=f"Audio path not found: {request.audio_path}")
+    if request.target_seconds <= 0 or request.search_seconds < 0:
+        raise HTTPException(status_code=400, detail="target_seconds must be > 0 and search_seconds >= 0")
+
+    try:
+        return AudioProcessor(target_sr=16000).plan_segments(
+            request.audio_path,
+            target_seconds=request.target_seconds,
+            search_seconds=min(request.search_seconds, request.target_seconds / 2),
+            min_silence_seconds=request.min_silence_seconds,
+            overlap_seconds=request.overlap_seconds,
+        )
+    except Exception as exc:  # noqa: BLE001
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    """Report a job's state, current stage, percent complete and ETA."""
+    status = scheduler.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return status
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job_endpoint(
+    job_id: str,
+    x_service_token: Optional[str] = Header(default=None),
+):
+    """Cancel a queued job, or stop a running one at its next checkpoint."""
+    if SERVICE_API_TOKEN and x_service_token != SERVICE_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid service token")
+
+    job = scheduler.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if not job.cancel_requested:
+        raise HTTPException(
+            status_code=409, detail=f"Job '{job_id}' already {job.state}"
+        )
+    return scheduler.status(job_id)
+
+
+@app.delete("/meetings/{meeting_id}/segment-state")
+async def forget_meeting_endpoint(
+    meeting_id: str,
+    x_service_token: Optional[str] = Header(default=None),
+):
+    """Drop the overlap cache and speaker reconciliation state of a finished meeting."""
+    if SERVICE_API_TOKEN and x_service_token != SERVICE_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid service token")
+
+    overlap_cache.forget(meeting_id)
+    reconciler.forget(meeting_id)
+    return {"meeting_id": meeting_id, "forgotten": True}
+
+
 @app.post("/generate-summary")
 async def generate_summary_endpoint(request: GenerateSummaryRequest):
     system_instance = get_system()
@@ -349,7 +953,7 @@ async def list_speakers_endpoint():
     """List all enrolled speakers from speaker_db.pkl."""
     system_instance = get_system()
     try:
-        speakers = system_instance.recognizer.get_enrolled_speakers()
+        speakers = system_instance.speaker_db.list_speakers()
         return {"speakers": speakers}
     except Exception as exc:  # noqa: BLE001
         traceback.print_exc()
@@ -364,13 +968,15 @@ async def delete_speaker_endpoint(speaker_name: str):
     system_instance = get_system()
     try:
         # Check if speaker exists
-        if not system_instance.recognizer.db.has_speaker(speaker_name):
+        if not system_instance.speaker_db.has_speaker(speaker_name):
             raise HTTPException(
                 status_code=404, detail=f"Speaker '{speaker_name}' not found"
             )
         
-        # Remove speaker from pkl
-        success = system_instance.recognizer.remove_speaker(speaker_name)
+        # Remove speaker from pkl (database only, no model is loaded)
+        success = system_instance.speaker_db.remove_speaker(speaker_name)
+        if success:
+            system_instance.speaker_db.save()
         if not success:
             raise HTTPException(
                 status_code=500, detail=f"Failed to remove speaker '{speaker_name}'"
@@ -419,11 +1025,12 @@ async def enroll_speaker_endpoint(
 
     system_instance = get_system()
     try:
-        success = system_instance.recognizer.enroll_speaker(
-            request.speaker_name,
-            request.sample_paths,
-            force=request.force,
-        )
+        with system_instance.checkout("recognizer") as recognizer:
+            success = recognizer.enroll_speaker(
+                request.speaker_name,
+                request.sample_paths,
+                force=request.force,
+            )
         if not success:
             raise HTTPException(
                 status_code=409,
@@ -462,14 +1069,14 @@ async def rename_speaker_endpoint(
     system_instance = get_system()
     
     # Debug: Log all speakers in PKL
-    all_speakers = system_instance.recognizer.db.list_speakers()
+    all_speakers = system_instance.speaker_db.list_speakers()
     print(f"[DEBUG] Speakers in PKL: {all_speakers}")
     print(f"[DEBUG] Looking for speaker: '{old_name}'")
-    print(f"[DEBUG] Has speaker: {system_instance.recognizer.db.has_speaker(old_name)}")
+    print(f"[DEBUG] Has speaker: {system_instance.speaker_db.has_speaker(old_name)}")
     
     try:
         # Check if old speaker exists
-        if not system_instance.recognizer.db.has_speaker(old_name):
+        if not system_instance.speaker_db.has_speaker(old_name):
             print(f"[ERROR] Speaker '{old_name}' not found in PKL")
             print(f"[ERROR] Available speakers: {all_speakers}")
             raise HTTPException(
@@ -478,7 +1085,7 @@ async def rename_speaker_endpoint(
         
         # Rename speaker
         print(f"[DEBUG] Calling rename_speaker: '{old_name}' → '{new_name}'")
-        success = system_instance.recognizer.db.rename_speaker(old_name, new_name)
+        success = system_instance.speaker_db.rename_speaker(old_name, new_name)
         if not success:
             print(f"[ERROR] rename_speaker returned False")
             raise HTTPException(
@@ -487,7 +1094,7 @@ async def rename_speaker_endpoint(
         
         # Save database
         print(f"[DEBUG] Saving database...")
-        system_instance.recognizer.db.save()
+        system_instance.speaker_db.save()
         print(f"[OK] Renamed speaker successfully: '{old_name}' → '{new_name}'")
         
         return {"status": "success", "old_name": old_name, "new_name": new_name}
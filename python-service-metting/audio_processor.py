@@ -5,14 +5,84 @@ Handles audio file operations:
   - Normalization (FFmpeg)
   - Loading and resampling
   - Audio segment extraction
+  - Silence-aligned segmentation planning (energy VAD)
+  - Speech compaction (VAD) with an offset table back to the original timeline
+
+torchaudio is imported by the methods that decode audio, so planning,
+compaction and duration lookups of WAV files do not load torch.
 """
 
+from __future__ import annotations
+
 import os
 import subprocess
+import wave
+from bisect import bisect_right
 from pathlib import Path
-from typing import Tuple
-import torchaudio
-import torch
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+
+
+def _frame_energy_db(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """Energy (dBFS) of consecutive frames of float samples in [-1, 1]."""
+    usable = len(samples) // frame_len * frame_len
+    frames = samples[:usable].reshape(-1, frame_len)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+class OffsetTable:
+    """
+    Maps times between a compacted (speech-only) buffer and the original audio.
+    
+    Each region is (compact_start, original_start, length) in seconds; regions
+    are contiguous in the compacted buffer and ordered in both timelines.
+    """
+    
+    def __init__(self, regions: List[Tuple[float, float, float]], original_seconds: float):
+        self.regions = regions
+        self.original_seconds = original_seconds
+        self._compact_starts = [r[0] for r in regions]
+        self._original_starts = [r[1] for r in regions]
+    
+    @classmethod
+    def identity(cls, duration: float) -> "OffsetTable":
+        """Table for audio that was not compacted."""
+        return cls([(0.0, 0.0, duration)], duration)
+    
+    @property
+    def compact_seconds(self) -> float:
+        return sum(r[2] for r in self.regions)
+    
+    @property
+    def compression_ratio(self) -> float:
+        """Original duration / compacted duration (1.0 = nothing removed)."""
+        compact = self.compact_seconds
+        return self.original_seconds / compact if compact > 0 else 1.0
+    
+    def to_original(self, t: float) -> float:
+        """Map a compacted-buffer time onto the original timeline."""
+        idx = max(0, bisect_right(self._compact_starts, t) - 1)
+        compact_start, original_start, length = self.regions[idx]
+        return original_start + min(max(0.0, t - compact_start), length)
+    
+    def to_compact(self, t: float) -> float:
+        """Map an original time into the compacted buffer (removed gaps collapse)."""
+        idx = bisect_right(self._original_starts, t) - 1
+        if idx < 0:
+            return 0.0
+        compact_start, original_start, length = self.regions[idx]
+        return compact_start + min(t - original_start, length)
+    
+    def remap_transcript(self, transcript_result: Dict):
+        """Move transcript segment and word timestamps onto the original timeline (in place)."""
+        for segment in transcript_result.get("segments", []):
+            for item in [segment] + segment.get("words", []):
+                for key in ("start", "end"):
+                    if key in item:
+                        item[key] = self.to_original(item[key])
 
 
 class AudioProcessor:
@@ -81,6 +151,7 @@ class AudioProcessor:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
+        import torchaudio
         waveform, sr = torchaudio.load(audio_path)
         
         if resample and sr != self.target_sr:
@@ -123,6 +194,7 @@ class AudioProcessor:
             sr: Sample rate
             output_path: Path to save audio
         """
+        import torchaudio
         torchaudio.save(output_path, waveform, sr)
         print(f"[OK] Audio saved: {output_path}")
     
@@ -136,6 +208,15 @@ class AudioProcessor:
         Returns:
             Duration in seconds
         """
+        # PCM WAV (our normalized format): read the header only
+        if audio_path.lower().endswith(".wav"):
+            try:
+                with wave.open(audio_path, "rb") as wav:
+                    return wav.getnframes() / wav.getframerate()
+            except (wave.Error, EOFError):
+                pass
+        
+        import torchaudio
         waveform, sr = torchaudio.load(audio_path)
         duration = waveform.shape[1] / sr
         return duration
@@ -153,6 +234,7 @@ class AudioProcessor:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
+        import torchaudio
         waveform, sr = torchaudio.load(audio_path)
         duration = waveform.shape[1] / sr
         file_size_mb = os.path.getsize(audio_path) / (1024 * 1024)
@@ -164,3 +246,231 @@ class AudioProcessor:
             "duration_seconds": duration,
             "file_size_mb": file_size_mb
         }
+    
+    def compute_frame_energy(self,
+                             audio_path: str,
+                             frame_seconds: float = 0.03) -> np.ndarray:
+        """
+        Compute per-frame energy (dBFS) of a file in one streaming FFmpeg pass.
+        
+        The file is decoded to 16kHz mono PCM on a pipe and processed in
+        chunks, so memory stays constant for long meetings.
+        
+        Args:
+            audio_path: Path to audio file (any format FFmpeg reads)
+            frame_seconds: Frame length in seconds
+            
+        Returns:
+            Array of frame energies in dBFS
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        frame_len = max(1, int(frame_seconds * self.target_sr))
+        chunk_frames = 2000  # one minute per read at 30 ms frames
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', audio_path,
+            '-ar', str(self.target_sr),
+            '-ac', '1',
+            '-f', 's16le',
+            '-'
+        ]
+        
+        energies = []
+        leftover = np.zeros(0, dtype=np.float32)
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            while True:
+                data = proc.stdout.read(frame_len * chunk_frames * 2)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+                samples = np.concatenate([leftover, samples])
+                usable = len(samples) // frame_len * frame_len
+                leftover = samples[usable:]
+                energies.append(_frame_energy_db(samples[:usable], frame_len))
+            stderr = proc.stderr.read().decode(errors="replace")
+        if proc.returncode != 0:
+            raise Exception(f"FFmpeg error: {stderr}")
+        
+        return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    
+    @staticmethod
+    def find_silences(energy_db: np.ndarray,
+                      frame_seconds: float = 0.03,
+                      min_silence_seconds: float = 0.3,
+                      margin_db: float = 10.0) -> List[Tuple[float, float]]:
+        """
+        Find silent stretches from frame energies.
+        
+        The threshold adapts to the recording: frames below the noise floor
+        (10th percentile energy) plus margin_db count as silence, but never
+        closer than 15 dB to the speech level (90th percentile) so recordings
+        with few pauses do not classify quiet speech as silence.
+        
+        Args:
+            energy_db: Frame energies from compute_frame_energy
+            frame_seconds: Frame length in seconds
+            min_silence_seconds: Shortest pause to report
+            margin_db: Headroom above the noise floor still treated as silence
+            
+        Returns:
+            List of (start, end) silences in seconds
+        """
+        if len(energy_db) == 0:
+            return []
+        noise_floor, speech_level = np.percentile(energy_db, [10, 90])
+        threshold = min(noise_floor + margin_db, speech_level - 15.0)
+        silent = energy_db < threshold
+        
+        # Run boundaries of the silent mask
+        padded = np.concatenate([[False], silent, [False]]).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        starts, ends = edges[0::2], edges[1::2]
+        keep = (ends - starts) * frame_seconds >= min_silence_seconds
+        return [
+            (float(start * frame_seconds), float(end * frame_seconds))
+            for start, end in zip(starts[keep], ends[keep])
+        ]
+    
+    def plan_segments(self,
+                      audio_path: str,
+                      target_seconds: float = 600.0,
+                      search_seconds: float = 60.0,
+                      min_silence_seconds: float = 0.3,
+                      overlap_seconds: float = 0.0,
+                      frame_seconds: float = 0.03) -> Dict:
+        """
+        Plan segment boundaries that fall into speech pauses near a target length.
+        
+        For every boundary the longest pause within target +/- search_seconds
+        is chosen (ties go to the pause closest to the target) and the cut is
+        placed in its middle. Without a pause in the window the cut falls on
+        the target and is reported as not clean.
+        
+        Args:
+            audio_path: Path to audio file
+            target_seconds: Desired segment length
+            search_seconds: How far a cut may move away from the target
+            min_silence_seconds: Shortest pause accepted as a cut point
+            overlap_seconds: Audio each segment repeats from the previous one
+            frame_seconds: Energy frame length
+            
+        Returns:
+            Dictionary with duration, silence statistics and the segment list
+            (index, start, end, cut, clean_cut, silence_seconds)
+        """
+        energy = self.compute_frame_energy(audio_path, frame_seconds)
+        duration = len(energy) * frame_seconds
+        silences = self.find_silences(energy, frame_seconds, min_silence_seconds)
+        
+        cuts = []
+        cursor = 0.0
+        while duration - cursor > target_seconds + search_seconds:
+            target = cursor + target_seconds
+            candidates = [
+                (end - start, -abs((start + end) / 2 - target), start, end)
+                for start, end in silences
+                if abs((start + end) / 2 - target) <= search_seconds
+            ]
+            if candidates:
+                length, _, start, end = max(candidates)
+                cut = (start + end) / 2
+                cuts.append({"cut": round(cut, 3), "clean_cut": True, "silence_seconds": round(length, 3)})
+            else:
+                cut = target
+                cuts.append({"cut": round(cut, 3), "clean_cut": False, "silence_seconds": 0.0})
+            cursor = cut
+        
+        segments = []
+        start = 0.0
+        for index, boundary in enumerate(cuts + [{"cut": round(duration, 3), "clean_cut": True, "silence_seconds": 0.0}]):
+            segments.append({
+                "index": index,
+                "start": round(max(0.0, start - overlap_seconds), 3) if index else 0.0,
+                "end": boundary["cut"],
+                "cut": boundary["cut"],
+                "clean_cut": boundary["clean_cut"],
+                "silence_seconds": boundary["silence_seconds"],
+            })
+            start = boundary["cut"]
+        
+        clean = sum(1 for c in cuts if c["clean_cut"])
+        print(f"[OK] Planned {len(segments)} segments for {duration:.1f}s audio "
+              f"({clean}/{len(cuts)} cuts in silence)")
+        return {
+            "duration": round(duration, 3),
+            "silence_seconds": round(sum(end - start for start, end in silences), 3),
+            "segments": segments,
+        }
+    
+    def compact_speech(self,
+                       audio_path: str,
+                       output_path: str,
+                       min_silence_seconds: float = 2.0,
+                       keep_silence_seconds: float = 0.4,
+                       min_gain: float = 0.05,
+                       frame_seconds: float = 0.03) -> Tuple[str, OffsetTable]:
+        """
+        Cut long silences out of a normalized (16kHz mono PCM) WAV.
+        
+        Pauses of at least min_silence_seconds are shortened to
+        keep_silence_seconds so words and sentence breaks stay intact. When
+        less than min_gain of the audio would be removed, the original file is
+        returned with an identity table.
+        
+        Args:
+            audio_path: Normalized WAV file
+            output_path: Where to write the compacted WAV
+            min_silence_seconds: Shortest pause that is shortened
+            keep_silence_seconds: Pause length kept at each cut
+            min_gain: Minimum fraction of audio removed for compaction to apply
+            frame_seconds: Energy frame length
+            
+        Returns:
+            Tuple of (path of audio to process, OffsetTable to the original timeline)
+        """
+        with wave.open(audio_path, "rb") as wav:
+            sr = wav.getframerate()
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        duration = len(pcm) / sr
+        
+        frame_len = max(1, int(frame_seconds * sr))
+        energy = _frame_energy_db(pcm.astype(np.float32) / 32768.0, frame_len)
+        silences = self.find_silences(energy, frame_len / sr, min_silence_seconds)
+        
+        # Keep everything except the inner part of each long pause
+        regions = []
+        cursor = 0.0
+        half_keep = keep_silence_seconds / 2
+        for start, end in silences:
+            cut_start, cut_end = start + half_keep, end - half_keep
+            if cut_end <= cut_start:
+                continue
+            regions.append((cursor, cut_start))
+            cursor = cut_end
+        regions.append((cursor, duration))
+        
+        removed = duration - sum(end - start for start, end in regions)
+        if duration <= 0 or removed / duration < min_gain:
+            print(f"[INFO] VAD: only {removed:.1f}s of silence, keeping original audio")
+            return audio_path, OffsetTable.identity(duration)
+        
+        table_regions = []
+        chunks = []
+        compact_cursor = 0.0
+        for start, end in regions:
+            chunk = pcm[int(start * sr):int(end * sr)]
+            table_regions.append((compact_cursor, start, len(chunk) / sr))
+            compact_cursor += len(chunk) / sr
+            chunks.append(chunk)
+        
+        with wave.open(output_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sr)
+            wav.writeframes(np.concatenate(chunks).tobytes())
+        
+        table = OffsetTable(table_regions, duration)
+        print(f"[OK] VAD: {duration:.1f}s -> {table.compact_seconds:.1f}s "
+              f"(compression {table.compression_ratio:.2f}x)")
+        return output_path, table
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ECAPA vs pyannote-embedding speaker identification
+
+Runs the segment pipeline (no Gemini summary) on the same recordings once
+per SPEAKER_EMBEDDING_BACKEND and compares:
+  - Model load time and peak RSS of the process
+  - Wall time of the diarize and identify stages
+  - Identity agreement between the backends (time-weighted)
+  - Accuracy against a reference, if one is given
+
+Each backend runs in its own child process so load time and peak RSS are
+not polluted by the other backend's models.
+
+The reference is a JSON list of {"start": s, "end": s, "speaker": name}
+turns per recording: --reference a1.mp4=a1_reference.json
+
+Usage:
+    python benchmark_identification.py --speakers ./speakers
+    python benchmark_identification.py a1.mp4 a2.mp4 --speakers ./speakers --output report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+BACKENDS = ("ecapa", "pyannote")
+
+
+def run_backend(backend: str, audio_files: List[str], enroll_dir: str, language: str) -> Dict:
+    """Child process: load the system with one backend and process every file."""
+    os.environ["SPEAKER_EMBEDDING_BACKEND"] = backend
+    from integrated_meeting_system import IntegratedMeetingSystem
+    from profiler import StageProfiler, _peak_rss_mb
+
+    load_start = time.perf_counter()
+    system = IntegratedMeetingSystem(
+        huggingface_token=os.getenv("HF_TOKEN"),
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
+    load_seconds = time.perf_counter() - load_start
+    rss_after_load = _peak_rss_mb()
+
+    files = {}
+    for audio_path in audio_files:
+        profiler = StageProfiler()
+        with tempfile.TemporaryDirectory(prefix="bench_identify_") as temp_dir:
+            entries = system.process_segment(audio_path, enroll_dir, temp_dir, language, profiler)
+        summary = profiler.summary()
+        files[audio_path] = {
+            "audio_seconds": summary["total"]["audio_seconds"],
+            "diarize_seconds": summary["stages"].get("diarize", {}).get("wall_seconds"),
+            "identify_seconds": summary["stages"].get("identify", {}).get("wall_seconds"),
+            "embedding_calls": summary["stages"].get("identify", {}).get("embedding_calls"),
+            "entries": [
+                {
+                    "start": round(float(e["start"]), 3),
+                    "end": round(float(e["end"]), 3),
+                    "speaker": e["identified_speaker"],
+                    "confidence": round(float(e["confidence"]), 4),
+                }
+                for e in entries
+            ],
+        }
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "model_load_seconds": {k: round(v, 3) for k, v in system.model_load_seconds.items()},
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": _peak_rss_mb(),
+        "files": files,
+    }
+
+
+def overlap_weighted_match(entries: List[Dict], turns: List[Dict]) -> Optional[float]:
+    """Fraction of entry speaking time whose speaker matches the overlapping turns."""
+    total = 0.0
+    matched = 0.0
+    for entry in entries:
+        for turn in turns:
+            overlap = min(entry["end"], turn["end"]) - max(entry["start"], turn["start"])
+            if overlap <= 0:
+                continue
+            total += overlap
+            if entry["speaker"] == turn["speaker"]:
+                matched += overlap
+    return round(matched / total, 4) if total > 0 else None
+
+
+def compare(results: Dict[str, Dict], references: Dict[str, str]) -> Dict:
+    """Per-file agreement between backends and accuracy against references."""
+    comparison = {}
+    audio_files = results[BACKENDS[0]]["files"].keys()
+    for audio_path in audio_files:
+        ecapa = results["ecapa"]["files"][audio_path]["entries"]
+        pyannote = results["pyannote"]["files"][audio_path]["entries"]
+        row = {"agreement": overlap_weighted_match(pyannote, ecapa)}
+        reference_path = references.get(audio_path) or references.get(os.path.basename(audio_path))
+        if reference_path:
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = json.load(f)
+            for backend in BACKENDS:
+                row[f"{backend}_accuracy"] = overlap_weighted_match(
+                    results[backend]["files"][audio_path]["entries"], reference
+                )
+        comparison[audio_path] = row
+    return comparison
+
+
+def print_report(results: Dict[str, Dict], comparison: Dict):
+    print("\n" + "=" * 70)
+    print("SPEAKER IDENTIFICATION BENCHMARK")
+    print("=" * 70)
+    for backend in BACKENDS:
+        r = results[backend]
+        print(f"\n[{backend}] load {r['load_seconds']:.1f}s "
+              f"(RSS after load {r['rss_after_load_mb']:.0f} MB, peak {r['peak_rss_mb']:.0f} MB)")
+        for audio_path, f in r["files"].items():
+            print(f"  {audio_path}: {f['audio_seconds']:.0f}s audio, "
+                  f"diarize {f['diarize_seconds']}s, identify {f['identify_seconds']}s, "
+                  f"{f['embedding_calls']} embedding calls")
+    print("\n[compare]")
+    for audio_path, row in comparison.items():
+        print(f"  {audio_path}: " + ", ".join(f"{k}={v}" for k, v in row.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ECAPA and pyannote speaker identification")
+    parser.add_argument("audio", nargs="*", default=["a1.mp4", "a2.mp4"], help="Recordings to process")
+    parser.add_argument("--speakers", default="./speakers", help="Speaker enrollment directory")
+    parser.add_argument("--language", default="vi", help="Language code")
+    parser.add_argument("--reference", action="append", default=[],
+                        help="audio=reference.json (repeatable)")
+    parser.add_argument("--output", default="benchmark_identification.json", help="JSON report path")
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        result = run_backend(args.backend, args.audio, args.speakers, args.language)
+        with open(args.child_output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        return
+
+    if not os.getenv("HF_TOKEN"):
+        print("[ERROR] HF_TOKEN environment variable not set")
+        sys.exit(1)
+    references = dict(item.split("=", 1) for item in args.reference)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_identify_") as out_dir:
+        for backend in BACKENDS:
+            print(f"\n[INFO] Running backend: {backend}")
+            child_output = os.path.join(out_dir, f"{backend}.json")
+            subprocess.run(
+                [sys.executable, __file__, *args.audio,
+                 "--speakers", args.speakers, "--language", args.language,
+                 "--backend", backend, "--child-output", child_output],
+                check=True,
+            )
+            with open(child_output, "r", encoding="utf-8") as f:
+                results[backend] = json.load(f)
+
+    comparison = compare(results, references)
+    print_report(results, comparison)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"results": results, "comparison": comparison}, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fp32 vs dynamic int8 speaker and diarization models
+
+Runs once per MODEL_QUANTIZATION mode, each in its own child process (CPU),
+and reports the deltas of int8 against fp32:
+  - Gallery: every enrollment recording is cut into windows that are
+    embedded with ECAPA and with pyannote's embedding model. Each window is
+    identified against the speaker centroids of the other windows (leave
+    one out). int8 queries are scored against an int8 gallery (re-enrolled
+    database) and against the fp32 gallery (existing speaker database kept)
+  - Pipeline: process_segment on the recordings with a fresh speaker
+    database, for the diarize / identify stage times and the identities
+    assigned (agreement with fp32, accuracy if a reference is given)
+
+The reference is a JSON list of {"start": s, "end": s, "speaker": name}
+turns per recording: --reference a1.mp4=a1_reference.json
+
+Usage:
+    python benchmark_quantization.py --speakers ./speakers
+    python benchmark_quantization.py a1.mp4 --speakers ./speakers --window 3 --output quantization.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmark_identification import overlap_weighted_match
+
+MODES = ("none", "int8")
+EMBEDDING_MODELS = ("ecapa", "pyannote")
+
+
+def cut_windows(enroll_dir: str, window_seconds: float) -> List[Dict]:
+    """Enrollment recordings cut into windows of window_seconds (last one kept if >= 1s)."""
+    import torchaudio
+    from speaker_recognition import SpeakerRecognizer
+
+    windows = []
+    for speaker, paths in sorted(SpeakerRecognizer.list_enrollment_files(enroll_dir).items()):
+        for path in sorted(paths):
+            signal, fs = torchaudio.load(path)
+            if fs != 16000:
+                signal = torchaudio.transforms.Resample(fs, 16000)(signal)
+            signal = signal.mean(dim=0)
+            step = int(window_seconds * 16000)
+            for start in range(0, len(signal), step):
+                chunk = signal[start:start + step]
+                if len(chunk) >= 16000:
+                    windows.append({"speaker": speaker, "file": os.path.basename(path), "waveform": chunk})
+    return windows
+
+
+def run_mode(mode: str,
+             audio_files: List[str],
+             enroll_dir: str,
+             language: str,
+             window_seconds: float) -> Dict:
+    """Child process: load the system in one quantization mode and measure it."""
+    os.environ["MODEL_QUANTIZATION"] = mode
+    os.environ["SPEAKER_EMBEDDING_BACKEND"] = "ecapa"
+    from integrated_meeting_system import IntegratedMeetingSystem
+    from profiler import StageProfiler, _peak_rss_mb
+
+    with tempfile.TemporaryDirectory(prefix="bench_quant_db_") as db_dir:
+        system = IntegratedMeetingSystem(
+            huggingface_token=os.getenv("HF_TOKEN"),
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            device="cpu",
+            speaker_db_dir=db_dir,
+        )
+        load_start = time.perf_counter()
+        system.preload(language=language, warmup=True)
+        load_seconds = time.perf_counter() - load_start
+
+        windows = cut_windows(enroll_dir, window_seconds)
+        waveforms = [w["waveform"] for w in windows]
+        gallery = {
+            "speakers": [w["speaker"] for w in windows],
+            "files": [w["file"] for w in windows],
+            "audio_seconds": round(sum(len(w) for w in waveforms) / 16000, 3),
+        }
+        start = time.perf_counter()
+        with system.checkout("recognizer") as recognizer:
+            ecapa = recognizer.embed_waveforms(waveforms, system.embedding_batch_size)
+        gallery["ecapa_seconds"] = round(time.perf_counter() - start, 3)
+        gallery["ecapa"] = [e.tolist() if e is not None else None for e in ecapa]
+
+        start = time.perf_counter()
+        pyannote = []
+        with system.checkout("diarizer") as diarizer:
+            for i in range(0, len(waveforms), system.embedding_batch_size):
+                pyannote.extend(diarizer.embed_waveforms(waveforms[i:i + system.embedding_batch_size]))
+        gallery["pyannote_seconds"] = round(time.perf_counter() - start, 3)
+        gallery["pyannote"] = [np.asarray(e).tolist() for e in pyannote]
+
+        files = {}
+        for audio_path in audio_files:
+            profiler = StageProfiler()
+            with tempfile.TemporaryDirectory(prefix="bench_quant_") as temp_dir:
+                entries = system.process_segment(audio_path, enroll_dir, temp_dir, language, profiler)
+            summary = profiler.summary()
+            files[audio_path] = {
+                "audio_seconds": summary["total"]["audio_seconds"],
+                "diarize_seconds": summary["stages"].get("diarize", {}).get("wall_seconds"),
+                "identify_seconds": summary["stages"].get("identify", {}).get("wall_seconds"),
+                "entries": [
+                    {
+                        "start": round(float(e["start"]), 3),
+                        "end": round(float(e["end"]), 3),
+                        "speaker": e["identified_speaker"],
+                    }
+                    for e in entries
+                ],
+            }
+
+    return {
+        "mode": mode,
+        "load_seconds": round(load_seconds, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "gallery": gallery,
+        "files": files,
+    }
+
+
+def leave_one_out_accuracy(queries: List[Optional[List[float]]],
+                           gallery: List[Optional[List[float]]],
+                           speakers: List[str]) -> Dict:
+    """
+    Identify each query window against per-speaker centroids of the gallery
+    windows, leaving the window itself out of its speaker's centroid.
+    """
+    valid = [i for i in range(len(speakers)) if queries[i] is not None and gallery[i] is not None]
+    if not valid:
+        return {"accuracy": None, "windows": 0, "speakers": 0}
+    names = sorted({speakers[i] for i in valid})
+    g = np.array([gallery[i] for i in valid], dtype=np.float64)
+    q = np.array([queries[i] for i in valid], dtype=np.float64)
+    g /= np.linalg.norm(g, axis=1, keepdims=True)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    owner = np.array([names.index(speakers[i]) for i in valid])
+    sums = np.stack([g[owner == k].sum(axis=0) for k in range(len(names))])
+    counts = np.array([(owner == k).sum() for k in range(len(names))])
+
+    correct = 0
+    scored = 0
+    for row in range(len(valid)):
+        if counts[owner[row]] < 2:
+            continue  # nothing left to enroll this speaker with
+        centroids = sums.copy()
+        centroids[owner[row]] -= g[row]
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        scored += 1
+        correct += int(np.argmax(centroids @ q[row]) == owner[row])
+    return {
+        "accuracy": round(correct / scored, 4) if scored else None,
+        "windows": scored,
+        "speakers": len(names),
+    }
+
+
+def embedding_cosines(a: List[Optional[List[float]]], b: List[Optional[List[float]]]) -> Dict:
+    """Cosine between the fp32 and int8 embeddings of the same windows."""
+    pairs = [(x, y) for x, y in zip(a, b) if x is not None and y is not None]
+    if not pairs:
+        return {"mean": None, "min": None}
+    x = np.array([p[0] for p in pairs], dtype=np.float64)
+    y = np.array([p[1] for p in pairs], dtype=np.float64)
+    cos = (x * y).sum(axis=1) / (np.linalg.norm(x, axis=1) * np.linalg.norm(y, axis=1))
+    return {"mean": round(float(cos.mean()), 6), "min": round(float(cos.min()), 6)}
+
+
+def delta(fp32: Optional[float], int8: Optional[float]) -> Optional[float]:
+    """Relative change of int8 against fp32 (negative = faster / smaller)."""
+    if not fp32 or int8 is None:
+        return None
+    return round((int8 - fp32) / fp32, 4)
+
+
+def compare(results: Dict[str, Dict], references: Dict[str, str]) -> Dict:
+    fp32, int8 = results["none"], results["int8"]
+    report = {"load_seconds_delta": delta(fp32["load_seconds"], int8["load_seconds"]),
+              "peak_rss_mb_delta": delta(fp32["peak_rss_mb"], int8["peak_rss_mb"]),
+              "gallery": {}, "files": {}}
+
+    speakers = fp32["gallery"]["speakers"]
+    for model in EMBEDDING_MODELS:
+        a = fp32["gallery"][model]
+        b = int8["gallery"][model]
+        report["gallery"][model] = {
+            "fp32": leave_one_out_accuracy(a, a, speakers),
+            "int8": leave_one_out_accuracy(b, b, speakers),
+            "int8_vs_fp32_gallery": leave_one_out_accuracy(b, a, speakers),
+            "embedding_cosine": embedding_cosines(a, b),
+            "seconds_fp32": fp32["gallery"][f"{model}_seconds"],
+            "seconds_int8": int8["gallery"][f"{model}_seconds"],
+            "seconds_delta": delta(fp32["gallery"][f"{model}_seconds"], int8["gallery"][f"{model}_seconds"]),
+        }
+
+    for audio_path, f32 in fp32["files"].items():
+        i8 = int8["files"][audio_path]
+        row = {
+            "diarize_seconds_delta": delta(f32["diarize_seconds"], i8["diarize_seconds"]),
+            "identify_seconds_delta": delta(f32["identify_seconds"], i8["identify_seconds"]),
+            "agreement": overlap_weighted_match(i8["entries"], f32["entries"]),
+        }
+        reference_path = references.get(audio_path) or references.get(os.path.basename(audio_path))
+        if reference_path:
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = json.load(f)
+            row["fp32_accuracy"] = overlap_weighted_match(f32["entries"], reference)
+            row["int8_accuracy"] = overlap_weighted_match(i8["entries"], reference)
+        report["files"][audio_path] = row
+    return report
+
+
+def print_report(results: Dict[str, Dict], report: Dict):
+    def pct(value):
+        return "n/a" if value is None else f"{100 * value:+.1f}%"
+
+    print("\n" + "=" * 70)
+    print("INT8 DYNAMIC QUANTIZATION (deltas relative to fp32)")
+    print("=" * 70)
+    print(f"Model load + warmup: {results['none']['load_seconds']:.1f}s -> "
+          f"{results['int8']['load_seconds']:.1f}s ({pct(report['load_seconds_delta'])}), "
+          f"peak RSS {pct(report['peak_rss_mb_delta'])}")
+    gallery_seconds = results["none"]["gallery"]["audio_seconds"]
+    print(f"\n[gallery] {gallery_seconds:.0f}s of enrollment audio")
+    for model, row in report["gallery"].items():
+        print(f"  {model:9s} latency {row['seconds_fp32']:.2f}s -> {row['seconds_int8']:.2f}s "
+              f"({pct(row['seconds_delta'])}), embedding cosine mean {row['embedding_cosine']['mean']} "
+              f"min {row['embedding_cosine']['min']}")
+        print(f"            accuracy fp32 {row['fp32']['accuracy']}, int8 {row['int8']['accuracy']}, "
+              f"int8 vs fp32 gallery {row['int8_vs_fp32_gallery']['accuracy']} "
+              f"({row['fp32']['windows']} windows, {row['fp32']['speakers']} speakers)")
+    print("\n[pipeline]")
+    for audio_path, row in report["files"].items():
+        extra = ""
+        if "int8_accuracy" in row:
+            extra = f", accuracy fp32 {row['fp32_accuracy']} / int8 {row['int8_accuracy']}"
+        print(f"  {audio_path}: diarize {pct(row['diarize_seconds_delta'])}, "
+              f"identify {pct(row['identify_seconds_delta'])}, "
+              f"identity agreement {row['agreement']}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and dynamic int8 speaker / diarization models")
+    parser.add_argument("audio", nargs="*", default=["a1.mp4", "a2.mp4"], help="Recordings to process")
+    parser.add_argument("--speakers", default="./speakers", help="Speaker enrollment directory (the gallery)")
+    parser.add_argument("--language", default="vi", help="Language code")
+    parser.add_argument("--window", type=float, default=3.0, help="Gallery window length (seconds)")
+    parser.add_argument("--reference", action="append", default=[],
+                        help="audio=reference.json (repeatable)")
+    parser.add_argument("--output", default="benchmark_quantization.json", help="JSON report path")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        result = run_mode(args.mode, args.audio, args.speakers, args.language, args.window)
+        with open(args.child_output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        return
+
+    if not os.getenv("HF_TOKEN"):
+        print("[ERROR] HF_TOKEN environment variable not set")
+        sys.exit(1)
+    references = dict(item.split("=", 1) for item in args.reference)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_quant_") as out_dir:
+        for mode in MODES:
+            print(f"\n[INFO] Running MODEL_QUANTIZATION={mode}")
+            child_output = os.path.join(out_dir, f"{mode}.json")
+            subprocess.run(
+                [sys.executable, __file__, *args.audio,
+                 "--speakers", args.speakers, "--language", args.language,
+                 "--window", str(args.window),
+                 "--mode", mode, "--child-output", child_output],
+                check=True,
+            )
+            with open(child_output, "r", encoding="utf-8") as f:
+                results[mode] = json.load(f)
+
+    report = compare(results, references)
+    print_report(results, report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"report": report, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n[OK] Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import time and command startup
+
+Each scenario runs in a fresh interpreter and reports wall time, peak RSS
+and which heavy libraries ended up imported:
+
+  import        import integrated_meeting_system
+  list-speakers database-only command (no model should load)
+  api-import    import api (FastAPI app, no model should load)
+  preload       IntegratedMeetingSystem(...).preload(): every model, as the
+                DB-only commands used to do before loading became lazy
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 3 --skip-preload --output startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+HEAVY_MODULES = ("torch", "torchaudio", "whisperx", "pyannote.audio", "speechbrain", "google.generativeai")
+
+SCENARIOS = {
+    "import": "import integrated_meeting_system",
+    "list-speakers": (
+        "from integrated_meeting_system import IntegratedMeetingSystem\n"
+        "system = IntegratedMeetingSystem(huggingface_token='dummy_token')\n"
+        "system.speaker_db.list_speakers()"
+    ),
+    "api-import": "import api",
+    "preload": (
+        "import os\n"
+        "from integrated_meeting_system import IntegratedMeetingSystem\n"
+        "system = IntegratedMeetingSystem(huggingface_token=os.getenv('HF_TOKEN'),"
+        " google_api_key=os.getenv('GOOGLE_API_KEY'))\n"
+        "system.preload()"
+    ),
+}
+
+# Runs inside the child interpreter; prints one JSON line at the end
+CHILD_TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+{body}
+wall = time.perf_counter() - start
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+except ImportError:
+    peak_mb = 0.0
+print("@@RESULT@@" + json.dumps({{
+    "wall_seconds": round(wall, 3),
+    "peak_rss_mb": round(peak_mb, 1),
+    "heavy_imported": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run_scenario(name: str) -> Dict:
+    """Run one scenario in a fresh interpreter."""
+    code = CHILD_TEMPLATE.format(body=SCENARIOS[name], heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("@@RESULT@@"):
+            return json.loads(line[len("@@RESULT@@"):])
+    tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["no output"]
+    return {"error": tail[0]}
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    ok = [r for r in runs if "error" not in r]
+    if not ok:
+        return {"error": runs[-1]["error"]}
+    walls = sorted(r["wall_seconds"] for r in ok)
+    return {
+        "runs": len(ok),
+        "wall_seconds_median": walls[len(walls) // 2],
+        "wall_seconds_min": walls[0],
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in ok),
+        "heavy_imported": ok[-1]["heavy_imported"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and command startup time")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--skip-preload", action="store_true", help="Skip the full model load scenario")
+    parser.add_argument("--output", default="benchmark_startup.json", help="JSON report path")
+    args = parser.parse_args()
+
+    names = [n for n in SCENARIOS if not (args.skip_preload and n == "preload")]
+    if "preload" in names and not os.getenv("HF_TOKEN"):
+        print("[WARN] HF_TOKEN not set; skipping the preload scenario")
+        names.remove("preload")
+
+    report = {}
+    for name in names:
+        print(f"[PROCESS] {name} ({args.repeat} runs)...")
+        # The preload scenario loads every model; once is enough
+        repeat = 1 if name == "preload" else args.repeat
+        report[name] = summarize([run_scenario(name) for _ in range(repeat)])
+
+    print("\n" + "=" * 70)
+    print("STARTUP BENCHMARK")
+    print("=" * 70)
+    for name, result in report.items():
+        if "error" in result:
+            print(f"{name:14s} failed: {result['error']}")
+            continue
+        print(f"{name:14s} {result['wall_seconds_median']:7.2f}s  "
+              f"{result['peak_rss_mb']:7.0f} MB  heavy: {', '.join(result['heavy_imported']) or '-'}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrency / thread-budget sweep
+
+Runs the segment pipeline (no Gemini summary) on the same recordings under
+several (concurrent jobs, threads per stage) configurations and reports
+throughput and latency, to pick JOB_MAX_CONCURRENCY, MODEL_REPLICAS and
+REPLICA_THREADS for a machine.
+
+Every configuration runs in its own child process, because the native
+thread pools are sized when torch and CTranslate2 are first imported:
+  - jobs       concurrent jobs (= JOB_MAX_CONCURRENCY = MODEL_REPLICAS)
+  - threads    REPLICA_THREADS; "auto" = cores / jobs
+  - oversub    one extra run per job count with every stage using all
+               cores and no budget (what the libraries do on their own)
+
+Models are loaded and warmed up before timing. Each job processes every
+recording once, so the work grows with the job count.
+
+Usage:
+    python benchmark_threads.py a1.mp4 a2.mp4 --speakers ./speakers
+    python benchmark_threads.py a1.mp4 --jobs 1,2,4 --threads auto,2,4,8 --output threads.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+
+def run_config(audio_files: List[str], enroll_dir: str, language: str, jobs: int) -> Dict:
+    """Child process: run `jobs` concurrent jobs over the recordings."""
+    from integrated_meeting_system import IntegratedMeetingSystem
+    from profiler import StageProfiler, _peak_rss_mb
+
+    system = IntegratedMeetingSystem(
+        huggingface_token=os.getenv("HF_TOKEN"),
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
+    system.preload(language=language, warmup=True)
+
+    latencies: List[float] = []
+    stage_seconds: Dict[str, float] = {}
+    audio_seconds = 0.0
+    lock = threading.Lock()
+    errors: List[str] = []
+
+    def job(index: int):
+        nonlocal audio_seconds
+        for audio_path in audio_files:
+            profiler = StageProfiler()
+            start = time.perf_counter()
+            try:
+                with tempfile.TemporaryDirectory(prefix=f"bench_threads_{index}_") as temp_dir:
+                    system.process_segment(audio_path, enroll_dir, temp_dir, language, profiler)
+            except Exception as e:  # noqa: BLE001
+                with lock:
+                    errors.append(str(e))
+                continue
+            summary = profiler.summary()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                audio_seconds += summary["total"]["audio_seconds"]
+                for stage, record in summary["stages"].items():
+                    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + record["wall_seconds"]
+
+    wall_start = time.perf_counter()
+    workers = [threading.Thread(target=job, args=(i,)) for i in range(jobs)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "wall_seconds": round(wall, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "throughput_rtf": round(audio_seconds / wall, 3) if wall > 0 else None,
+        "latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "latency_max": round(latencies[-1], 3) if latencies else None,
+        "stage_seconds": {k: round(v, 3) for k, v in stage_seconds.items()},
+        "threads_per_stage": system.replica_threads,
+        "peak_rss_mb": _peak_rss_mb(),
+        "errors": errors,
+    }
+
+
+def sweep(jobs_list: List[int], threads_list: List[str], cores: int, oversubscribe: bool) -> List[Dict]:
+    """Configurations to run, as {name, jobs, env}."""
+    configs = []
+    for jobs in jobs_list:
+        for threads in threads_list:
+            per_stage = max(1, cores // jobs) if threads == "auto" else int(threads)
+            configs.append({
+                "name": f"jobs={jobs} threads={per_stage}",
+                "jobs": jobs,
+                "env": {
+                    "JOB_MAX_CONCURRENCY": str(jobs),
+                    "MODEL_REPLICAS": str(jobs),
+                    "REPLICA_THREADS": str(per_stage),
+                    "OMP_NUM_THREADS": str(per_stage),
+                    "MKL_NUM_THREADS": str(per_stage),
+                },
+            })
+        if oversubscribe:
+            # Every stage sizes its pools from the core count and nothing
+            # limits how many run at once
+            configs.append({
+                "name": f"jobs={jobs} oversubscribed",
+                "jobs": jobs,
+                "env": {
+                    "JOB_MAX_CONCURRENCY": str(jobs),
+                    "MODEL_REPLICAS": str(jobs),
+                    "REPLICA_THREADS": str(cores),
+                    "CPU_THREAD_BUDGET": str(cores * jobs),
+                    "OMP_NUM_THREADS": str(cores),
+                    "MKL_NUM_THREADS": str(cores),
+                },
+            })
+    # Deduplicate configurations that resolve to the same settings
+    unique = {}
+    for config in configs:
+        unique.setdefault(config["name"], config)
+    return list(unique.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep job concurrency and per-stage thread budgets")
+    parser.add_argument("audio", nargs="*", default=["a1.mp4", "a2.mp4"], help="Recordings to process")
+    parser.add_argument("--speakers", default="./speakers", help="Speaker enrollment directory")
+    parser.add_argument("--language", default="vi", help="Language code")
+    parser.add_argument("--jobs", default="1,2,4", help="Comma-separated concurrent job counts")
+    parser.add_argument("--threads", default="auto", help="Comma-separated threads per stage ('auto' = cores / jobs)")
+    parser.add_argument("--no-oversubscribed", action="store_true", help="Skip the unbudgeted baseline runs")
+    parser.add_argument("--output", default="benchmark_threads.json", help="JSON report path")
+    parser.add_argument("--child-jobs", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_jobs:
+        result = run_config(args.audio, args.speakers, args.language, args.child_jobs)
+        with open(args.child_output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    if not os.getenv("HF_TOKEN"):
+        print("[ERROR] HF_TOKEN environment variable not set")
+        sys.exit(1)
+
+    from thread_budget import available_cores
+    cores = available_cores()
+    configs = sweep(
+        [int(j) for j in args.jobs.split(",")],
+        [t.strip() for t in args.threads.split(",")],
+        cores,
+        not args.no_oversubscribed,
+    )
+    print(f"[INFO] {cores} cores, {len(configs)} configurations")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_threads_") as out_dir:
+        for i, config in enumerate(configs):
+            print(f"\n[PROCESS] {config['name']}...")
+            child_output = os.path.join(out_dir, f"{i}.json")
+            completed = subprocess.run(
+                [sys.executable, __file__, *args.audio,
+                 "--speakers", args.speakers, "--language", args.language,
+                 "--child-jobs", str(config["jobs"]), "--child-output", child_output],
+                env={**os.environ, **config["env"]},
+            )
+            if completed.returncode != 0:
+                results[config["name"]] = {"error": f"exit code {completed.returncode}"}
+                continue
+            with open(child_output, "r", encoding="utf-8") as f:
+                results[config["name"]] = {"env": config["env"], **json.load(f)}
+
+    print("\n" + "=" * 70)
+    print("THREAD BUDGET SWEEP")
+    print("=" * 70)
+    print(f"{'configuration':32s} {'audio s / wall s':>16s} {'p50 s':>8s} {'max s':>8s}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:32s} failed: {r['error']}")
+            continue
+        print(f"{name:32s} {r['throughput_rtf']:>16} {r['latency_p50']:>8} {r['latency_max']:>8}")
+    ok = {name: r for name, r in results.items() if "error" not in r and r["throughput_rtf"]}
+    if ok:
+        best = max(ok, key=lambda name: ok[name]["throughput_rtf"])
+        print(f"\n[OK] Highest throughput: {best}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"cores": cores, "results": results}, f, indent=2)
+    print(f"[OK] Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
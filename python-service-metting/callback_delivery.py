@@ -0,0 +1,342 @@
+"""
+Callback Delivery Module
+
+Delivers job results to the backend without blocking pipeline workers.
+Supports:
+  - Persistent outbox on disk (one JSON file per callback, replayed on start)
+  - Pooled keep-alive HTTP connections (requests.Session)
+  - Retries with jittered exponential backoff; permanently rejected or
+    exhausted callbacks are moved to outbox/dead instead of being dropped
+  - gzip request bodies above a size threshold
+  - Optional coalescing of callbacks sharing a key (e.g. segment results of
+    one meeting) into a single POST to a batch URL
+  - Superseding: a callback with a supersede key drops pending callbacks
+    with the same key (e.g. a draft transcript once the final one is queued)
+
+Outbox files are named <owner pid>_<entry id>.json. Several uvicorn workers
+may share one outbox: on start a process only claims (atomically renames)
+entries whose owner is no longer running.
+"""
+
+import gzip
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CallbackDelivery:
+    """Outbox-backed callback sender with retry, gzip and coalescing."""
+
+    def __init__(self,
+                 outbox_dir: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 workers: int = 2,
+                 timeout: float = 30.0,
+                 max_attempts: int = 20,
+                 base_delay: float = 2.0,
+                 max_delay: float = 300.0,
+                 gzip_threshold: int = 64 * 1024,
+                 coalesce_window: float = 0.0):
+        """
+        Initialize delivery subsystem (call start() to begin sending).
+
+        Args:
+            outbox_dir: Directory for pending callbacks
+            headers: Headers sent with every callback (e.g. auth token)
+            workers: Number of sender threads (also the connection pool size)
+            timeout: Per-request timeout in seconds
+            max_attempts: Attempts before a callback is moved to dead/
+            base_delay: First retry delay in seconds
+            max_delay: Maximum retry delay in seconds
+            gzip_threshold: Compress bodies larger than this many bytes
+            coalesce_window: Seconds to wait for more callbacks with the same key (0 = off)
+        """
+        self.outbox_dir = Path(outbox_dir)
+        self.dead_dir = self.outbox_dir / "dead"
+        self.headers = headers or {}
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.gzip_threshold = gzip_threshold
+        self.coalesce_window = coalesce_window
+
+        self.outbox_dir.mkdir(parents=True, exist_ok=True)
+        self.dead_dir.mkdir(parents=True, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._entries: Dict[str, Dict] = {}
+        self._due: List = []  # heap of (due_at, seq, entry_id)
+        self._current_seq: Dict[str, int] = {}  # latest heap seq per entry
+        self._in_progress: set = set()
+        self._latest_by_key: Dict[str, str] = {}  # newest entry id per supersede key
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    def start(self):
+        """Replay the outbox from disk and start sender threads."""
+        replayed = []
+        for path in sorted(self.outbox_dir.glob("*_*.json")):
+            owner, _, entry_id = path.stem.partition("_")
+            if owner.isdigit() and _owner_alive(int(owner)):
+                continue
+            claimed = self.outbox_dir / f"{os.getpid()}_{entry_id}.json"
+            try:
+                os.replace(path, claimed)
+                entry = json.loads(claimed.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Unreadable callback in outbox {path.name}: {e}")
+                continue
+            replayed.append(entry)
+        # Entry ids start with their creation time: replay oldest first so
+        # newer callbacks supersede older ones
+        for entry in sorted(replayed, key=lambda item: item["id"]):
+            self._supersede(entry)
+            self._schedule(entry, time.time())
+        if replayed:
+            print(f"[INFO] Replaying {len(replayed)} pending callbacks from outbox")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"callback-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop sender threads (pending callbacks stay in the outbox)."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def send(self,
+             url: str,
+             payload: Dict,
+             coalesce_key: Optional[str] = None,
+             batch_url: Optional[str] = None,
+             batch_fields: Optional[Dict] = None,
+             supersede_key: Optional[str] = None) -> str:
+        """
+        Persist a callback to the outbox and schedule delivery.
+
+        Args:
+            url: Callback URL
+            payload: JSON payload
+            coalesce_key: Callbacks with the same key may be merged into one POST
+            batch_url: URL receiving merged callbacks as {"results": [...]}
+            batch_fields: Extra fields identifying this item inside a batch
+            supersede_key: Pending callbacks with the same key are dropped,
+                and a failed one is not retried once a newer one exists
+
+        Returns:
+            Outbox entry id
+        """
+        entry = {
+            "id": f"{time.time():.6f}-{uuid.uuid4().hex[:8]}",
+            "url": url,
+            "payload": payload,
+            "attempts": 0,
+            "coalesce_key": coalesce_key if self.coalesce_window > 0 and batch_url else None,
+            "batch_url": batch_url,
+            "batch_fields": batch_fields or {},
+            "supersede_key": supersede_key,
+        }
+        self._persist(entry)
+        self._supersede(entry)
+        delay = self.coalesce_window if entry["coalesce_key"] else 0.0
+        self._schedule(entry, time.time() + delay)
+        return entry["id"]
+
+    def pending(self) -> int:
+        """Number of callbacks waiting for delivery."""
+        with self._cond:
+            return len(self._entries)
+
+    def _path(self, entry: Dict) -> Path:
+        return self.outbox_dir / f"{os.getpid()}_{entry['id']}.json"
+
+    def _persist(self, entry: Dict):
+        # Write-then-rename so a crash never leaves a truncated entry
+        path = self._path(entry)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _supersede(self, entry: Dict):
+        """Drop pending callbacks replaced by entry (same supersede key)."""
+        key = entry.get("supersede_key")
+        if not key:
+            return
+        with self._cond:
+            self._latest_by_key[key] = entry["id"]
+            dropped = [
+                other for other_id, other in self._entries.items()
+                if other.get("supersede_key") == key and other_id not in self._in_progress
+            ]
+            for other in dropped:
+                self._entries.pop(other["id"], None)
+                self._current_seq.pop(other["id"], None)
+        for other in dropped:
+            print(f"[INFO] Dropped callback to {other['url']}: superseded by a newer one")
+            try:
+                self._path(other).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _is_superseded(self, entry: Dict) -> bool:
+        key = entry.get("supersede_key")
+        with self._cond:
+            return bool(key) and self._latest_by_key.get(key, entry["id"]) != entry["id"]
+
+    def _schedule(self, entry: Dict, due_at: float):
+        with self._cond:
+            self._entries[entry["id"]] = entry
+            self._seq += 1
+            self._current_seq[entry["id"]] = self._seq
+            heapq.heappush(self._due, (due_at, self._seq, entry["id"]))
+            self._cond.notify()
+
+    def _next_batch(self) -> Optional[List[Dict]]:
+        """Wait for the next due entry; return it with any coalescable siblings."""
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                # Drop heap items superseded by a reschedule or already delivered
+                while self._due and (
+                    self._current_seq.get(self._due[0][2]) != self._due[0][1]
+                    or self._due[0][2] in self._in_progress
+                ):
+                    heapq.heappop(self._due)
+                if self._due and self._due[0][0] <= now:
+                    _, _, entry_id = heapq.heappop(self._due)
+                    entry = self._entries[entry_id]
+                    batch = [entry]
+                    key = entry.get("coalesce_key")
+                    if key:
+                        batch.extend(
+                            other for other_id, other in self._entries.items()
+                            if other_id != entry_id
+                            and other.get("coalesce_key") == key
+                            and other_id not in self._in_progress
+                        )
+                    self._in_progress.update(item["id"] for item in batch)
+                    return batch
+                timeout = self._due[0][0] - now if self._due else None
+                self._cond.wait(timeout)
+            return None
+
+    def _post(self, url: str, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", **self.headers}
+        if len(data) > self.gzip_threshold:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+
+    def _deliver(self, batch: List[Dict]):
+        if len(batch) == 1:
+            # Nothing to merge with: use the item's own endpoint
+            url, body = batch[0]["url"], batch[0]["payload"]
+        else:
+            url = batch[0]["batch_url"]
+            body = {"results": [{**item["batch_fields"], **item["payload"]} for item in batch]}
+
+        response = self._post(url, body)
+        if response.status_code >= 400:
+            retryable = response.status_code >= 500 or response.status_code in (408, 429)
+            raise _DeliveryError(f"HTTP {response.status_code} from {url}", retryable)
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._deliver(batch)
+                for entry in batch:
+                    self._finish(entry)
+                if len(batch) > 1:
+                    print(f"[OK] Delivered {len(batch)} coalesced callbacks")
+            except Exception as e:
+                retryable = getattr(e, "retryable", True)
+                for entry in batch:
+                    self._retry_or_bury(entry, str(e), retryable)
+
+    def _finish(self, entry: Dict):
+        with self._cond:
+            self._entries.pop(entry["id"], None)
+            self._current_seq.pop(entry["id"], None)
+            self._in_progress.discard(entry["id"])
+            key = entry.get("supersede_key")
+            if key and self._latest_by_key.get(key) == entry["id"]:
+                del self._latest_by_key[key]
+        try:
+            self._path(entry).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _retry_or_bury(self, entry: Dict, error: str, retryable: bool):
+        if self._is_superseded(entry):
+            # A newer callback replaces this one: sending it later would
+            # only overwrite the newer result
+            print(f"[INFO] Dropped failed callback to {entry['url']}: superseded by a newer one")
+            self._finish(entry)
+            return
+        entry["attempts"] += 1
+        entry["last_error"] = error
+        if not retryable or entry["attempts"] >= self.max_attempts:
+            print(f"[ERROR] Callback to {entry['url']} failed permanently "
+                  f"after {entry['attempts']} attempts: {error}")
+            self._persist(entry)
+            os.replace(self._path(entry), self.dead_dir / self._path(entry).name)
+            self._finish(entry)
+            return
+
+        # Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** entry["attempts"])))
+        print(f"[WARN] Callback to {entry['url']} failed ({error}); "
+              f"retry {entry['attempts']}/{self.max_attempts} in {delay:.1f}s")
+        self._persist(entry)
+        with self._cond:
+            self._in_progress.discard(entry["id"])
+        self._schedule(entry, time.time() + delay)
+
+
+def _owner_alive(pid: int) -> bool:
+    """Whether the process that wrote an outbox entry is still running."""
+    if pid == os.getpid():
+        return False  # leftover of a previous process that had our pid
+    if os.name == "nt":
+        # os.kill(pid, 0) is not a liveness probe on Windows
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class _DeliveryError(Exception):
+    """HTTP error response from the callback endpoint."""
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
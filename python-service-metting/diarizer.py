@@ -6,9 +6,13 @@ Identifies who is speaking and when.
 Features model caching for faster subsequent loads.
 """
 
+import numpy as np
 import torch
 from pyannote.audio import Pipeline
-from typing import Dict, Iterator, Tuple
+from pyannote.core import Annotation, Segment
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from model_cache import ModelCache, get_model_cache
+from quantization import load_or_quantize, resolve_mode
 
 
 class Diarizer:
@@ -16,7 +20,11 @@ class Diarizer:
     
     def __init__(self, 
                  huggingface_token: str,
-                 device: str = None):
+                 device: str = None,
+                 use_cache: bool = True,
+                 cache_dir: str = "./model_cache",
+                 replica: int = 0,
+                 quantization: str = "none"):
         """
         Initialize diarizer.
         
@@ -25,42 +33,163 @@ class Diarizer:
             device: "cuda" or "cpu" (auto-detect if None)
             use_cache: If True, use model caching to avoid reloading
             cache_dir: Directory for model cache
+            replica: Replica index; replicas > 0 load their own pipeline copy
+            quantization: "int8" to run the segmentation and embedding models
+                with dynamic int8 weights (CPU only), "none" for fp32
         """
         self.hf_token = huggingface_token
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.use_cache = use_cache
-        self.cache = get_model_cache(cache_dir) if use_cache else None
+        self.quantization = resolve_mode(quantization, self.device)
+        # Without the shared cache the pipeline is still kept, just not shared
+        self.cache = get_model_cache(cache_dir) if use_cache else ModelCache(cache_dir)
         
         # Cache key for this model
-        self.pipeline_cache_key = f"pyannote_diarization_{self.device}"
+        quantization_key = "" if self.quantization == "none" else f"{self.quantization}_"
+        self.pipeline_cache_key = (f"pyannote_diarization_{quantization_key}{self.device}"
+                                   + (f"_r{replica}" if replica else ""))
+        self.pipeline_metadata = {
+            "type": "pyannote_diarization",
+            "model_source": "pyannote/speaker-diarization-3.1",
+            "device": self.device,
+            "quantization": self.quantization,
+        }
         
-        print(f"[INFO] Loading Pyannote diarization pipeline, cache={'enabled' if use_cache else 'disabled'}...")
-        
-        self.pipeline = Pipeline.from_pretrained(
+        print(f"[INFO] Loading Pyannote diarization pipeline ({self.quantization}), "
+              f"cache={'enabled' if use_cache else 'disabled'}...")
+        self.cache.get_or_load(self.pipeline_cache_key, self._load_pipeline, self.pipeline_metadata)
+        print(f"[OK] Pyannote pipeline ready on device: {self.device}")
+    
+    def _load_pipeline(self) -> Pipeline:
+        pipeline = Pipeline.from_pretrained(
             "pyannote/speaker-diarization-3.1",
-            use_auth_token=huggingface_token
+            use_auth_token=self.hf_token
         )
-        # self.pipeline = Pipeline.from_pretrained('pretrained_models/diarization/config.yaml')
+        # pipeline = Pipeline.from_pretrained('pretrained_models/diarization/config.yaml')
         
+        if self.quantization == "int8":
+            self._quantize_pipeline(pipeline)
         if self.device == "cuda":
-            self.pipeline.to(torch.device("cuda"))
-        
-        print(f"[OK] Pyannote pipeline loaded on device: {self.device}")
+            pipeline.to(torch.device("cuda"))
+        return pipeline
+    
+    def _quantize_pipeline(self, pipeline: Pipeline):
+        """Convert the segmentation and embedding models to dynamic int8 in place."""
+        segmentation = pipeline._segmentation
+        segmentation.model = load_or_quantize(
+            segmentation.model,
+            "pyannote_segmentation",
+            str(getattr(pipeline, "segmentation_model", "segmentation")),
+            self.cache.cache_dir,
+        )
+        # Pretrained pyannote embeddings (WeSpeaker) keep their model in model_
+        embedding = pipeline._embedding
+        if isinstance(getattr(embedding, "model_", None), torch.nn.Module):
+            embedding.model_ = load_or_quantize(
+                embedding.model_,
+                "pyannote_embedding",
+                str(getattr(pipeline, "embedding", "embedding")),
+                self.cache.cache_dir,
+            )
+        else:
+            print(f"[WARN] Embedding model {type(embedding).__name__} is not quantized")
+    
+    def _use_pipeline(self):
+        """Hold the pipeline (reloaded if it was evicted) while it runs."""
+        return self.cache.use(self.pipeline_cache_key, self._load_pipeline, self.pipeline_metadata)
     
-    def diarize(self, audio_path: str) -> Dict:
+    @property
+    def pipeline(self) -> Pipeline:
+        """The diarization pipeline (loaded through the model cache)."""
+        return self.cache.get_or_load(self.pipeline_cache_key, self._load_pipeline, self.pipeline_metadata)
+    
+    def diarize(self,
+                audio_path: str,
+                return_embeddings: bool = False,
+                num_speakers: Optional[int] = None,
+                min_speakers: Optional[int] = None,
+                max_speakers: Optional[int] = None):
         """
         Perform speaker diarization on audio file.
         
+        Speaker-count hints narrow the clustering search; num_speakers
+        overrides the min/max bounds.
+        
         Args:
             audio_path: Path to audio file
+            return_embeddings: Also return the centroid embedding of each speaker
+            num_speakers: Exact number of speakers, if known
+            min_speakers: Lower bound on the number of speakers
+            max_speakers: Upper bound on the number of speakers
             
         Returns:
-            Diarization object with speaker segments
+            Diarization object with speaker segments, or a tuple of
+            (diarization, {speaker_label: centroid ndarray}) if return_embeddings
         """
-        print(f"[PROCESS] Performing diarization...")
-        diarization = self.pipeline(audio_path)
-        print(f"[OK] Diarization complete")
-        return diarization
+        hints = {
+            name: value
+            for name, value in (
+                ("num_speakers", num_speakers),
+                ("min_speakers", min_speakers),
+                ("max_speakers", max_speakers),
+            )
+            if value is not None
+        }
+        print(f"[PROCESS] Performing diarization..."
+              + (f" (hints: {hints})" if hints else ""))
+        if not return_embeddings:
+            with self._use_pipeline() as pipeline:
+                diarization = pipeline(audio_path, **hints)
+            print(f"[OK] Diarization complete")
+            return diarization
+        
+        with self._use_pipeline() as pipeline:
+            diarization, embeddings = pipeline(audio_path, return_embeddings=True, **hints)
+        # Row i belongs to diarization.labels()[i]; clusters without a usable
+        # embedding come back as NaN rows
+        centroids = {
+            label: embeddings[i]
+            for i, label in enumerate(diarization.labels())
+            if i < len(embeddings) and np.isfinite(embeddings[i]).all()
+        }
+        print(f"[OK] Diarization complete ({len(centroids)} speaker centroids)")
+        return diarization, centroids
+    
+    def embed_waveforms(self, waveforms: List[torch.Tensor]) -> np.ndarray:
+        """
+        Embed 16kHz mono waveforms with the pipeline's own speaker embedding model.
+        
+        Uses the same model that produces the diarization centroids, so the
+        results can be compared with them directly.
+        
+        Args:
+            waveforms: List of tensors shaped [samples] or [1, samples]
+            
+        Returns:
+            Array shaped [batch, embedding_dim]
+        """
+        signals = [w.reshape(-1) for w in waveforms]
+        batch = torch.nn.utils.rnn.pad_sequence(signals, batch_first=True)
+        masks = torch.zeros_like(batch)
+        for i, signal in enumerate(signals):
+            masks[i, :signal.shape[0]] = 1.0
+        # Padding is masked out of the statistics pooling
+        with self._use_pipeline() as pipeline:
+            return pipeline._embedding(batch.unsqueeze(1), masks=masks)
+    
+    def warmup(self, waveform: torch.Tensor, sample_rate: int = 16000):
+        """
+        Run the pipeline once on an in-memory waveform.
+        
+        Triggers first-call allocations and kernel selection for the
+        segmentation and embedding models before real traffic arrives.
+        
+        Args:
+            waveform: Mono tensor shaped [samples] (a few seconds is enough)
+            sample_rate: Sample rate of the waveform
+        """
+        with self._use_pipeline() as pipeline:
+            pipeline({"waveform": waveform.reshape(1, -1), "sample_rate": sample_rate})
     
     def get_speaker_at_time(self, 
                             diarization: Dict,
@@ -91,6 +220,22 @@ class Diarizer:
         
         return speaker, max_overlap
     
+    def remap(self, diarization: Annotation, to_original: Callable[[float], float]) -> Annotation:
+        """
+        Move diarization turns onto another timeline (e.g. after VAD compaction).
+        
+        Args:
+            diarization: Diarization object from diarize()
+            to_original: Function mapping a time in the diarized audio to the target timeline
+            
+        Returns:
+            New diarization object with remapped turns
+        """
+        remapped = Annotation(uri=diarization.uri)
+        for turn, track, spk in diarization.itertracks(yield_label=True):
+            remapped[Segment(to_original(turn.start), to_original(turn.end)), track] = spk
+        return remapped
+    
     def get_segments(self, diarization: Dict) -> list:
         """
         Get all speaker segments from diarization.
@@ -0,0 +1,370 @@
+"""
+ECAPA Export Module
+
+Exports the SpeechBrain ECAPA-TDNN speaker encoder (filterbank features,
+sentence mean normalization and the embedding model) as one TorchScript
+or ONNX graph with dynamic batch and length axes, and runs that graph
+without SpeechBrain's EncoderClassifier wrapper.
+
+SpeakerRecognizer(inference_backend="torchscript" | "onnx") loads the
+exported file instead of the SpeechBrain classifier; ECAPA_BACKEND selects
+it for the service.
+
+Usage:
+    python ecapa_export.py export --format onnx
+    python ecapa_export.py parity --format onnx [audio files...]
+    python ecapa_export.py benchmark --batch-size 16 --seconds 3
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+EXPORT_FORMATS = ("torchscript", "onnx")
+INFERENCE_BACKENDS = ("speechbrain",) + EXPORT_FORMATS
+DEFAULT_EXPORT_DIR = os.path.join("pretrained_models", "ecapa-export")
+EXPORT_FILES = {"torchscript": "ecapa_tdnn.ts.pt", "onnx": "ecapa_tdnn.onnx"}
+# STFT (used by the filterbank) is an ONNX operator from opset 17
+ONNX_OPSET = 17
+PARITY_MIN_COSINE = 0.999
+
+
+def export_path(fmt: str, export_dir: str = DEFAULT_EXPORT_DIR) -> str:
+    """Path of the exported graph for a format."""
+    return os.path.join(export_dir, EXPORT_FILES[fmt])
+
+
+class EcapaGraph(torch.nn.Module):
+    """EncoderClassifier.encode_batch() as one traceable module."""
+
+    def __init__(self, classifier):
+        """
+        Args:
+            classifier: Loaded SpeechBrain EncoderClassifier (ECAPA-TDNN)
+        """
+        super().__init__()
+        self.compute_features = classifier.mods.compute_features
+        self.embedding_model = classifier.mods.embedding_model
+        norm = classifier.mods.mean_var_norm
+        if norm.norm_type != "sentence":
+            raise ValueError(f"Unsupported feature normalization: {norm.norm_type}")
+        self.mean_norm = norm.mean_norm
+        self.std_norm = norm.std_norm
+        self.eps = norm.eps
+
+    def forward(self, wavs: torch.Tensor, wav_lens: torch.Tensor) -> torch.Tensor:
+        feats = self.compute_features(wavs)
+        # Sentence normalization, vectorized: statistics over each
+        # sentence's own frames (SpeechBrain loops over the batch, which a
+        # trace would freeze to one batch size)
+        frames = torch.arange(feats.shape[1], device=feats.device)
+        actual = torch.round(wav_lens * feats.shape[1])
+        mask = (frames.unsqueeze(0) < actual.unsqueeze(1)).unsqueeze(-1).to(feats.dtype)
+        count = mask.sum(dim=1, keepdim=True).clamp(min=1.0)
+        mean = (feats * mask).sum(dim=1, keepdim=True) / count
+        if self.std_norm:
+            variance = (((feats - mean) * mask) ** 2).sum(dim=1, keepdim=True) / (count - 1).clamp(min=1.0)
+            std = torch.sqrt(variance).clamp(min=self.eps)
+        else:
+            std = torch.ones_like(mean)
+        if not self.mean_norm:
+            mean = torch.zeros_like(mean)
+        feats = (feats - mean) / std
+        return self.embedding_model(feats, wav_lens)
+
+
+@contextmanager
+def _traceable_length_masks():
+    """
+    Swap SpeechBrain's length_to_mask while tracing.
+
+    The original expands to len(lengths) rows, which a trace records as a
+    constant batch size; broadcasting keeps the batch axis dynamic.
+    """
+    from speechbrain.lobes.models import ECAPA_TDNN as ecapa_module
+
+    def length_to_mask(length, max_len=None, dtype=None, device=None):
+        if max_len is None:
+            max_len = length.max()
+        mask = torch.arange(max_len, device=length.device, dtype=length.dtype).unsqueeze(0) < length.unsqueeze(1)
+        return mask.to(dtype=dtype or length.dtype, device=device or length.device)
+
+    original = ecapa_module.length_to_mask
+    ecapa_module.length_to_mask = length_to_mask
+    try:
+        yield
+    finally:
+        ecapa_module.length_to_mask = original
+
+
+def export_ecapa(fmt: str,
+                 output_path: str,
+                 model_source: str = "speechbrain/spkrec-ecapa-voxceleb") -> str:
+    """
+    Export the ECAPA encoder.
+
+    Args:
+        fmt: "torchscript" or "onnx"
+        output_path: Where to write the graph
+        model_source: SpeechBrain model source
+
+    Returns:
+        output_path
+    """
+    from speaker_recognition import load_speechbrain_classifier
+
+    classifier = load_speechbrain_classifier(model_source, "cpu")
+    graph = EcapaGraph(classifier).eval()
+    # Example input: two padded sentences of different lengths
+    wavs = 0.1 * torch.randn(2, 3 * 16000)
+    wav_lens = torch.tensor([1.0, 0.6])
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    print(f"[PROCESS] Exporting ECAPA-TDNN to {fmt}: {output_path}")
+    with torch.no_grad(), _traceable_length_masks():
+        if fmt == "torchscript":
+            traced = torch.jit.trace(graph, (wavs, wav_lens), check_trace=False)
+            traced.save(output_path)
+        elif fmt == "onnx":
+            torch.onnx.export(
+                graph,
+                (wavs, wav_lens),
+                output_path,
+                input_names=["wavs", "wav_lens"],
+                output_names=["embeddings"],
+                dynamic_axes={
+                    "wavs": {0: "batch", 1: "samples"},
+                    "wav_lens": {0: "batch"},
+                    "embeddings": {0: "batch"},
+                },
+                opset_version=ONNX_OPSET,
+            )
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+    print(f"[OK] Exported: {output_path}")
+    return output_path
+
+
+class TorchScriptEncoder:
+    """encode_batch() on an exported TorchScript graph."""
+
+    def __init__(self, path: str, device: str = "cpu"):
+        self.device = device
+        self.module = torch.jit.load(path, map_location=device).eval()
+
+    def encode_batch(self, wavs: torch.Tensor, wav_lens: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Embeddings shaped [batch, 1, embedding_dim], like EncoderClassifier."""
+        if wavs.dim() == 1:
+            wavs = wavs.unsqueeze(0)
+        if wav_lens is None:
+            wav_lens = torch.ones(wavs.shape[0])
+        with torch.no_grad():
+            return self.module(wavs.float().to(self.device), wav_lens.float().to(self.device))
+
+
+class OnnxEncoder:
+    """encode_batch() on an exported ONNX graph (ONNX Runtime)."""
+
+    def __init__(self, path: str, device: str = "cpu", threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.device = device
+        self.session = ort.InferenceSession(path, options, providers=providers)
+
+    def encode_batch(self, wavs: torch.Tensor, wav_lens: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Embeddings shaped [batch, 1, embedding_dim], like EncoderClassifier."""
+        if wavs.dim() == 1:
+            wavs = wavs.unsqueeze(0)
+        if wav_lens is None:
+            wav_lens = torch.ones(wavs.shape[0])
+        embeddings = self.session.run(None, {
+            "wavs": wavs.detach().cpu().numpy().astype(np.float32),
+            "wav_lens": wav_lens.detach().cpu().numpy().astype(np.float32),
+        })[0]
+        return torch.from_numpy(embeddings).to(self.device)
+
+
+def load_encoder(backend: str,
+                 model_source: str,
+                 device: str,
+                 export_dir: str = DEFAULT_EXPORT_DIR,
+                 threads: Optional[int] = None):
+    """
+    Load the ECAPA encoder for an inference backend.
+
+    Args:
+        backend: "speechbrain", "torchscript" or "onnx"
+        model_source: SpeechBrain model source
+        device: "cuda" or "cpu"
+        export_dir: Directory holding the exported graphs
+        threads: ONNX Runtime intra-op threads (the replica's thread share;
+            None = all cores). torch backends follow the checkout's limit.
+
+    Returns:
+        Object with EncoderClassifier's encode_batch(wavs, wav_lens)
+    """
+    if backend == "speechbrain":
+        from speaker_recognition import load_speechbrain_classifier
+        return load_speechbrain_classifier(model_source, device)
+    if backend not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown ECAPA backend: {backend}")
+    path = export_path(backend, export_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Exported ECAPA graph not found: {path} "
+            f"(run: python ecapa_export.py export --format {backend})"
+        )
+    if backend == "torchscript":
+        return TorchScriptEncoder(path, device)
+    return OnnxEncoder(path, device, threads=threads)
+
+
+def _parity_inputs(audio_files: List[str]) -> List[tuple]:
+    """(name, wavs, wav_lens) test batches: single, padded and real recordings."""
+    from integrated_meeting_system import synthetic_speech
+
+    rng = np.random.default_rng(0)
+    voiced = torch.from_numpy(synthetic_speech(6.0))
+    cases = [("single 2s", voiced[:2 * 16000].unsqueeze(0), None)]
+
+    signals = [voiced[:int(s * 16000)] + 0.01 * torch.from_numpy(rng.standard_normal(int(s * 16000)).astype(np.float32))
+               for s in (1.3, 2.7, 4.0, 6.0, 0.8)]
+    lengths = torch.tensor([s.shape[0] for s in signals], dtype=torch.float32)
+    cases.append(("padded batch of 5", torch.nn.utils.rnn.pad_sequence(signals, batch_first=True),
+                  lengths / lengths.max()))
+
+    for audio_path in audio_files:
+        import torchaudio
+        signal, fs = torchaudio.load(audio_path)
+        if fs != 16000:
+            signal = torchaudio.transforms.Resample(fs, 16000)(signal)
+        signal = signal.mean(dim=0)
+        chunks = [signal[i:i + 3 * 16000] for i in range(0, min(len(signal), 60 * 16000), 3 * 16000)]
+        chunks = [c for c in chunks if len(c) > 16000]
+        if chunks:
+            lengths = torch.tensor([c.shape[0] for c in chunks], dtype=torch.float32)
+            cases.append((os.path.basename(audio_path), torch.nn.utils.rnn.pad_sequence(chunks, batch_first=True),
+                          lengths / lengths.max()))
+    return cases
+
+
+def check_parity(fmt: str,
+                 audio_files: List[str],
+                 model_source: str = "speechbrain/spkrec-ecapa-voxceleb",
+                 export_dir: str = DEFAULT_EXPORT_DIR) -> bool:
+    """
+    Compare exported and SpeechBrain embeddings.
+
+    Returns:
+        True if every embedding has cosine similarity > PARITY_MIN_COSINE
+    """
+    reference = load_encoder("speechbrain", model_source, "cpu")
+    exported = load_encoder(fmt, model_source, "cpu", export_dir)
+    worst = 1.0
+    for name, wavs, wav_lens in _parity_inputs(audio_files):
+        with torch.no_grad():
+            expected = reference.encode_batch(wavs, wav_lens).reshape(wavs.shape[0], -1)
+            actual = exported.encode_batch(wavs, wav_lens).reshape(wavs.shape[0], -1).cpu()
+        cosine = torch.nn.functional.cosine_similarity(expected, actual, dim=-1)
+        worst = min(worst, float(cosine.min()))
+        print(f"  {name:24s} batch={wavs.shape[0]:3d} min cosine={float(cosine.min()):.6f}")
+    passed = worst > PARITY_MIN_COSINE
+    print(f"[{'OK' if passed else 'ERROR'}] {fmt} parity: min cosine {worst:.6f} "
+          f"(threshold {PARITY_MIN_COSINE})")
+    return passed
+
+
+def benchmark(backends: List[str],
+              batch_size: int,
+              seconds: float,
+              iterations: int,
+              model_source: str = "speechbrain/spkrec-ecapa-voxceleb",
+              export_dir: str = DEFAULT_EXPORT_DIR,
+              threads: Optional[int] = None) -> Dict[str, Dict]:
+    """Embedding throughput of each backend on one padded batch."""
+    from integrated_meeting_system import synthetic_speech
+
+    voiced = torch.from_numpy(synthetic_speech(seconds))
+    # Lengths from 50% to 100% of the clip, as after sorting real crops
+    lengths = torch.linspace(0.5, 1.0, batch_size)
+    wavs = torch.stack([torch.where(torch.arange(len(voiced)) < l * len(voiced), voiced, torch.zeros(1))
+                        for l in lengths])
+    results = {}
+    for backend in backends:
+        try:
+            encoder = load_encoder(backend, model_source, "cpu", export_dir, threads)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"[WARN] Skipping {backend}: {e}")
+            continue
+        with torch.no_grad():
+            encoder.encode_batch(wavs, lengths)  # warmup
+            start = time.perf_counter()
+            for _ in range(iterations):
+                encoder.encode_batch(wavs, lengths)
+            elapsed = time.perf_counter() - start
+        results[backend] = {
+            "ms_per_batch": round(1000 * elapsed / iterations, 2),
+            "embeddings_per_second": round(batch_size * iterations / elapsed, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and check the ECAPA speaker encoder")
+    parser.add_argument("--model-source", default="speechbrain/spkrec-ecapa-voxceleb")
+    parser.add_argument("--export-dir", default=os.getenv("ECAPA_EXPORT_DIR", DEFAULT_EXPORT_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Export the encoder graph")
+    export_cmd.add_argument("--format", choices=EXPORT_FORMATS, default="onnx")
+    export_cmd.add_argument("--skip-parity", action="store_true", help="Do not compare with SpeechBrain afterwards")
+
+    parity_cmd = commands.add_parser("parity", help="Compare exported and SpeechBrain embeddings")
+    parity_cmd.add_argument("--format", choices=EXPORT_FORMATS, default="onnx")
+    parity_cmd.add_argument("audio", nargs="*", help="Recordings to cut real test batches from")
+
+    bench_cmd = commands.add_parser("benchmark", help="Embedding throughput per backend")
+    bench_cmd.add_argument("--backends", default=",".join(INFERENCE_BACKENDS))
+    bench_cmd.add_argument("--batch-size", type=int, default=16)
+    bench_cmd.add_argument("--seconds", type=float, default=3.0, help="Longest waveform in the batch")
+    bench_cmd.add_argument("--iterations", type=int, default=20)
+    bench_cmd.add_argument("--threads", type=int, default=None, help="torch / ONNX Runtime threads")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_ecapa(args.format, export_path(args.format, args.export_dir), args.model_source)
+        if not args.skip_parity and not check_parity(args.format, [], args.model_source, args.export_dir):
+            sys.exit(1)
+    elif args.command == "parity":
+        if not check_parity(args.format, args.audio, args.model_source, args.export_dir):
+            sys.exit(1)
+    elif args.command == "benchmark":
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        results = benchmark(args.backends.split(","), args.batch_size, args.seconds,
+                            args.iterations, args.model_source, args.export_dir, args.threads)
+        print("\n" + "=" * 70)
+        print(f"ECAPA THROUGHPUT (batch {args.batch_size}, up to {args.seconds:.1f}s, "
+              f"{torch.get_num_threads()} threads)")
+        print("=" * 70)
+        baseline = results.get("speechbrain", {}).get("embeddings_per_second")
+        for backend, r in results.items():
+            speedup = f"  x{r['embeddings_per_second'] / baseline:.2f}" if baseline else ""
+            print(f"{backend:12s} {r['ms_per_batch']:9.1f} ms/batch {r['embeddings_per_second']:9.1f} emb/s{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ Combines multiple modules for end-to-end meeting processing:
   1. Audio preprocessing (audio_processor.py)
   2. Transcription (transcriber.py)
   3. Speaker diarization (diarizer.py)
-  4. Speaker identification (speaker_recognition.py)
+  4. Speaker identification (speaker_recognition.py, or
+     pyannote_recognition.py with SPEAKER_EMBEDDING_BACKEND=pyannote)
 
 Output: SpeakerName: Text (chronologically ordered)
 
@@ -20,36 +21,82 @@ Commands:
     clear-db
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import json
 import shutil
+import time
+import queue
+import threading
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 from datetime import datetime
-import torch
-import torchaudio
-from tqdm import tqdm
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from thread_budget import ThreadBudget, configure_process_threads, set_interop_threads, set_intra_op_threads
+
+# OpenMP / MKL / OpenBLAS size their pools when numpy and torch are imported
+load_dotenv()
+configure_process_threads()
+
+import numpy as np
+from tqdm import tqdm
 
 
-# Import custom modules
-from speaker_db import SpeakerDatabase
-from speaker_recognition import SpeakerRecognizer
-from audio_processor import AudioProcessor
-from transcriber import Transcriber
-from diarizer import Diarizer
+# Import custom modules. torch / torchaudio and every module that imports
+# them at load time (models, quantization, ECAPA export) are imported on
+# first use, so importing this module and the speaker database commands
+# stay light
+from speaker_db import DEFAULT_DB_NAME, PYANNOTE_DB_NAME, SpeakerDatabase
+from audio_processor import AudioProcessor, OffsetTable
+from overlap_cache import OverlapPlan
+from profiler import StageProfiler
+from model_cache import get_model_cache
+from model_pool import ReplicaPool, size_replicas
+from profiles import DRAFT_PROFILE, Profile, active_profiles, describe, get_profile, transcriber_key
+
+if TYPE_CHECKING:
+    import torch
+    from speaker_recognition import SpeakerRecognizer
 
 
 load_dotenv()
 
+# Length of the synthetic clip used by preload(warmup=True)
+WARMUP_SECONDS = float(os.getenv("WARMUP_SECONDS", "5"))
+
+
+def synthetic_speech(seconds: float, sr: int = 16000) -> np.ndarray:
+    """
+    Voice-like test signal: a harmonic tone with pitch drift and
+    syllable-rate amplitude modulation, plus a little noise.
+    
+    Args:
+        seconds: Duration of the clip
+        sr: Sample rate
+        
+    Returns:
+        float32 mono array shaped [samples]
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    pitch = 130.0 + 20.0 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4.0 * t), 0.0, None)
+    signal = 0.3 * envelope * voiced + 0.01 * rng.standard_normal(t.shape)
+    return signal.astype(np.float32)
+
+
 class IntegratedMeetingSystem:
     """Main orchestrator for meeting transcription and speaker identification."""
     
     def __init__(self, 
                  huggingface_token: str,
-                 google_api_key: str,
+                 google_api_key: Optional[str] = None,
                  device: str = None,
                  speaker_db_dir: str = "./speaker_db",
                  use_model_cache: bool = True,
@@ -57,48 +104,317 @@ class IntegratedMeetingSystem:
         """
         Initialize the integrated system.
         
+        No model is loaded here: the transcriber, diarizer, recognizer and
+        summarization model are built on first use (or by preload()), so
+        speaker database commands stay fast.
+        
         Args:
             huggingface_token: HuggingFace token for Pyannote
+            google_api_key: Gemini API key for summaries
             device: "cuda" or "cpu" (auto-detect if None)
             speaker_db_dir: Directory for speaker database
             use_model_cache: If True, use model caching to avoid reloading
             model_cache_dir: Directory for model cache
         """
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if device is None:
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
         self.hf_token = huggingface_token
+        self.google_api_key = google_api_key
+        self.use_model_cache = use_model_cache
+        self.model_cache_dir = model_cache_dir
         
         print(f"\n[INFO] Initializing IntegratedMeetingSystem on device: {self.device}")
         print(f"[INFO] Model cache: {'enabled' if use_model_cache else 'disabled'}")
         
-        # Initialize modules
-        self.speaker_db = SpeakerDatabase(db_dir=speaker_db_dir)
-        self.recognizer = SpeakerRecognizer(
-            device=self.device, 
-            speaker_db=self.speaker_db,
-            use_cache=use_model_cache,
-            cache_dir=model_cache_dir
+        # All models are loaded through one registry (shared across threads)
+        self.model_cache = get_model_cache(model_cache_dir) if use_model_cache else None
+        
+        # Load durations are exported by the API metrics
+        self.model_load_seconds: Dict[str, float] = {}
+        # "ecapa": SpeechBrain ECAPA embeddings per transcript entry
+        # "pyannote": match the diarization cluster centroids (no second model)
+        self.speaker_embedding_backend = os.getenv("SPEAKER_EMBEDDING_BACKEND", "ecapa").lower()
+        if self.speaker_embedding_backend not in ("ecapa", "pyannote"):
+            raise ValueError(f"Unknown SPEAKER_EMBEDDING_BACKEND: {self.speaker_embedding_backend}")
+        print(f"[INFO] Speaker embeddings: {self.speaker_embedding_backend}")
+        # "int8": dynamic int8 weights for the pyannote and ECAPA models (CPU)
+        from quantization import resolve_mode
+        self.quantization = resolve_mode(os.getenv("MODEL_QUANTIZATION", "none"), self.device)
+        if self.quantization != "none":
+            print(f"[INFO] Model quantization: {self.quantization}")
+        self.speaker_db = SpeakerDatabase(
+            db_dir=speaker_db_dir,
+            db_name=PYANNOTE_DB_NAME if self.speaker_embedding_backend == "pyannote" else DEFAULT_DB_NAME
         )
         self.audio_processor = AudioProcessor(target_sr=16000)
-        self.transcriber = Transcriber(device=self.device)
-        self.diarizer = Diarizer(huggingface_token=huggingface_token, device=self.device)
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        # Short transcript entries are merged (same speaker) up to the target
+        # before embedding; groups below the minimum inherit an identity
+        self.embedding_target_seconds = float(os.getenv("EMBEDDING_TARGET_SECONDS", "3.0"))
+        self.embedding_min_seconds = float(os.getenv("EMBEDDING_MIN_SECONDS", "1.0"))
+        # Speech per diarization cluster embedded by "cluster" identification
+        self.cluster_embedding_seconds = float(os.getenv("CLUSTER_EMBEDDING_SECONDS", "10.0"))
+        # Run the heavy stages on a speech-only buffer (timestamps are remapped)
+        self.vad_compaction = os.getenv("VAD_COMPACTION", "0") == "1"
+        # Guests allowed on top of the enrolled speakers when bounding the
+        # diarization speaker count (-1 = no gallery-derived bound)
+        self.diarization_extra_speakers = int(os.getenv("DIARIZATION_EXTRA_SPEAKERS", "2"))
         
-        genai.configure(api_key=google_api_key)
-        self.summarization_model = genai.GenerativeModel('gemini-2.5-flash')
-
+        # Model subsystems are replica pools: each job stage checks out its
+        # own Transcriber / Diarizer / SpeakerRecognizer instance
+        self.model_replicas, self.replica_threads = size_replicas(
+            int(os.getenv("JOB_MAX_CONCURRENCY", "1")), self.device
+        )
+        print(f"[INFO] Model replicas: {self.model_replicas} x {self.replica_threads} threads")
+        # On CPU every model stage reserves its threads from one budget, so
+        # concurrent stages never ask for more cores than the process has
+        self.thread_budget = None
+        if self.device == "cpu":
+            set_interop_threads(int(os.getenv("TORCH_INTEROP_THREADS", "1")))
+            # torch's intra-op count is process-wide: every torch stage runs
+            # with the per-replica share it reserves
+            set_intra_op_threads(self.replica_threads)
+            self.thread_budget = ThreadBudget(max_stages=int(os.getenv("MAX_CONCURRENT_STAGES", "0")) or None)
+        # One transcriber pool per Whisper model of the active profiles; the
+        # default profile's pool keeps the name "transcriber"
+        self.profiles = [get_profile(name) for name in active_profiles()]
+        self.default_profile = get_profile()
+        print("[INFO] Profiles: " + ", ".join(describe(profile) for profile in self.profiles))
+        self.transcriber_pools: Dict[str, str] = {}
+        self.pools = {}
+        for profile in [self.default_profile] + self.profiles:
+            key = transcriber_key(profile, self.device)
+            if key in self.transcriber_pools:
+                continue
+            pool_name = "transcriber" if not self.pools else f"transcriber_{key}"
+            self.transcriber_pools[key] = pool_name
+            self.pools[pool_name] = ReplicaPool(
+                pool_name, lambda replica, profile=profile: self._build_transcriber(replica, profile),
+                self.model_replicas, self.replica_threads, self.thread_budget
+            )
+        self.pools.update({
+            "diarizer": ReplicaPool("diarizer", self._build_diarizer,
+                                    self.model_replicas, self.replica_threads, self.thread_budget),
+        })
+        if self.speaker_embedding_backend == "pyannote":
+            # The pyannote backend embeds on a checked-out diarizer replica
+            # (which reserves the threads) and only matches centroids per
+            # request, so one thread-less recognizer is enough
+            self.pools["recognizer"] = ReplicaPool("recognizer", self._build_recognizer, 1)
+        else:
+            self.pools["recognizer"] = ReplicaPool("recognizer", self._build_recognizer, self.model_replicas,
+                                                   self.replica_threads, self.thread_budget)
+        self._subsystem_lock = threading.RLock()
+        self._summarization_model = None
+    
+    def preload(self,
+                language: str = "vi",
+                warmup: bool = False,
+                progress: Optional[Callable[[str, str, Optional[float]], None]] = None):
+        """
+        Build every subsystem replica (and load its models) now instead of on first use.
+        
+        Args:
+            language: Language whose alignment model is loaded
+            warmup: Also run each replica once on a few seconds of synthetic
+                speech, so the first real request skips first-call
+                allocations and kernel selection
+            progress: Called as progress(model, status, seconds) with status
+                "loading", "warming", "ready" or "failed"; seconds is the
+                duration of the step that just finished
+        """
+        import torch
+        notify = progress or (lambda model, status, seconds: None)
+        audio = synthetic_speech(WARMUP_SECONDS) if warmup else None
+        steps = [
+            ("pyannote", "diarizer", None,
+             lambda diarizer: diarizer.warmup(torch.from_numpy(audio))),
+            ("speaker_embedding", "recognizer", None,
+             lambda recognizer: recognizer.compute_embeddings_batch([torch.from_numpy(audio)])),
+        ]
+        # Whisper models of every active profile stay resident
+        for pool_name in self.transcriber_pools.values():
+            steps.append((
+                "whisperx" + pool_name[len("transcriber"):], pool_name,
+                lambda transcriber: transcriber.load_models(language),
+                lambda transcriber: transcriber.warmup(audio, language),
+            ))
+        for name, pool_name, load, warm in steps:
+            pool = self.pools[pool_name]
+            notify(name, "loading", None)
+            try:
+                step_start = time.perf_counter()
+                for index in range(pool.size):
+                    with pool.checkout(index) as replica:
+                        if load is not None:
+                            load(replica)
+                if warmup:
+                    notify(name, "warming", time.perf_counter() - step_start)
+                    step_start = time.perf_counter()
+                    for index in range(pool.size):
+                        with pool.checkout(index) as replica, torch.inference_mode():
+                            warm(replica)
+                    print(f"[OK] Warmed up {name} in {time.perf_counter() - step_start:.1f}s")
+            except Exception:
+                notify(name, "failed", time.perf_counter() - step_start)
+                raise
+            notify(name, "ready", time.perf_counter() - step_start)
+        
+        notify("gemini", "loading", None)
+        step_start = time.perf_counter()
+        self.summarization_model
+        notify("gemini", "ready", time.perf_counter() - step_start)
+    
+    @property
+    def models_loaded(self) -> bool:
+        """Whether every subsystem replica has been built."""
+        return all(len(pool.replicas()) == pool.size for pool in self.pools.values())
+    
+    def all_model_load_seconds(self) -> Dict[str, float]:
+        """Load durations of the models built so far (builds nothing)."""
+        load_seconds = dict(self.model_load_seconds)
+        for pool_name in self.transcriber_pools.values():
+            for transcriber in self.pools[pool_name].replicas():
+                load_seconds.update(transcriber.model_load_seconds)
+        return load_seconds
+    
+    def checkout(self, subsystem: str, profile: Optional[Profile] = None):
+        """
+        Hold a replica of a subsystem for one stage of a job.
+        
+        Args:
+            subsystem: "transcriber", "diarizer" or "recognizer"
+            profile: Profile whose Whisper model a transcriber should run
+                (default profile if None)
+            
+        Returns:
+            Context manager yielding the replica
+        """
+        if subsystem == "transcriber" and profile is not None:
+            return self.pools[self.transcriber_pools[transcriber_key(profile, self.device)]].checkout()
+        return self.pools[subsystem].checkout()
+    
+    def resolve_profile(self, profile=None) -> Profile:
+        """
+        The Profile for a request's profile name (default profile if None).
+        
+        Raises:
+            ValueError: If the profile is unknown or not in ACTIVE_PROFILES
+        """
+        profile = get_profile(profile or self.default_profile)
+        if transcriber_key(profile, self.device) not in self.transcriber_pools:
+            raise ValueError(f"Profile '{profile.name}' needs Whisper {profile.whisper_model}, "
+                             f"which this service does not load (add it to ACTIVE_PROFILES)")
+        return profile
+    
+    @property
+    def transcriber(self):
+        """First WhisperX transcriber replica (use checkout() around inference)."""
+        return self.pools["transcriber"].primary()
+    
+    @property
+    def diarizer(self):
+        """First pyannote diarizer replica (use checkout() around inference)."""
+        return self.pools["diarizer"].primary()
+    
+    @property
+    def recognizer(self) -> SpeakerRecognizer:
+        """First speaker recognizer replica (use checkout() around inference)."""
+        return self.pools["recognizer"].primary()
+    
+    def _build_transcriber(self, replica: int, profile: Profile):
+        from transcriber import Transcriber
+        return Transcriber(
+            model_size=profile.whisper_model,
+            device=self.device,
+            compute_type=profile.compute_type(self.device),
+            use_cache=self.use_model_cache,
+            cache_dir=self.model_cache_dir,
+            replica=replica,
+            threads=self.replica_threads
+        )
+    
+    def _build_diarizer(self, replica: int):
+        from diarizer import Diarizer
+        load_start = time.perf_counter()
+        diarizer = Diarizer(
+            huggingface_token=self.hf_token,
+            device=self.device,
+            use_cache=self.use_model_cache,
+            cache_dir=self.model_cache_dir,
+            replica=replica,
+            quantization=self.quantization
+        )
+        self.model_load_seconds["pyannote"] = time.perf_counter() - load_start
+        return diarizer
+    
+    def _build_recognizer(self, replica: int) -> SpeakerRecognizer:
+        """Speaker recognizer for the configured embedding backend."""
+        from ecapa_export import DEFAULT_EXPORT_DIR
+        from speaker_recognition import SpeakerRecognizer
+        if self.speaker_embedding_backend == "pyannote":
+            from pyannote_recognition import PyannoteSpeakerRecognizer
+            return PyannoteSpeakerRecognizer(
+                diarizers=self.pools["diarizer"],
+                speaker_db=self.speaker_db,
+                threshold=float(os.getenv("PYANNOTE_MATCH_THRESHOLD", "0.5"))
+            )
+        load_start = time.perf_counter()
+        recognizer = SpeakerRecognizer(
+            device=self.device, 
+            speaker_db=self.speaker_db,
+            use_cache=self.use_model_cache,
+            cache_dir=self.model_cache_dir,
+            replica=replica,
+            # "torchscript" / "onnx": graph exported by ecapa_export.py
+            inference_backend=os.getenv("ECAPA_BACKEND", "speechbrain").lower(),
+            export_dir=os.getenv("ECAPA_EXPORT_DIR", DEFAULT_EXPORT_DIR),
+            quantization=self.quantization,
+            # ONNX Runtime sizes its own pool: keep it to the replica's share
+            threads=self.replica_threads
+        )
+        self.model_load_seconds["ecapa"] = time.perf_counter() - load_start
+        return recognizer
+    
+    @property
+    def summarization_model(self):
+        """Gemini model used for meeting summaries."""
+        with self._subsystem_lock:
+            if self._summarization_model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.google_api_key)
+                self._summarization_model = genai.GenerativeModel('gemini-2.5-flash')
+            return self._summarization_model
     
     def process_meeting(self,
                        audio_path: str,
                        enroll_dir: str,
                        output_dir: str = "./meeting_output",
-                       language: str = "vi") -> Dict:
+                       language: str = "vi",
+                       profiler: Optional[StageProfiler] = None,
+                       speaker_hints: Optional[Dict[str, int]] = None,
+                       profile=None,
+                       on_draft: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
         Full pipeline: normalize -> transcribe -> diarize -> identify -> output.
         
+        With on_draft the meeting is processed in two passes: diarization runs
+        first, then the TWO_PASS_DRAFT_PROFILE model transcribes the decoded
+        audio and on_draft receives that transcript with diarization labels
+        (no identification, no summary). The full pass then reuses the
+        decoded audio and the diarization.
+        
         Args:
             audio_path: Path to meeting audio file
             enroll_dir: Directory with speaker enrollment files
             output_dir: Output directory for results
             language: Language code (e.g., "vi", "en")
+            profiler: StageProfiler collecting per-stage metrics (new one if None)
+            speaker_hints: num_speakers / min_speakers / max_speakers for diarization
+            profile: Profile or profile name (default profile if None)
+            on_draft: Called with the draft result (enables two-pass mode)
             
         Returns:
             Dictionary with transcription results
@@ -107,6 +423,11 @@ class IntegratedMeetingSystem:
         print("INTEGRATED MEETING TRANSCRIPTION & SPEAKER IDENTIFICATION")
         print("=" * 70)
         
+        profiler = profiler or StageProfiler()
+        profile = self.resolve_profile(profile)
+        print(f"[INFO] Profile: {describe(profile)}")
+        draft_profile = self.resolve_profile(DRAFT_PROFILE) if on_draft is not None else None
+        
         # Create output directory
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         temp_dir = os.path.join(output_dir, ".temp")
@@ -115,47 +436,85 @@ class IntegratedMeetingSystem:
         try:
             # Step 1: Normalize audio
             print("\n[STEP 1] Normalizing audio...")
-            normalized_audio = self.audio_processor.normalize_audio(
-                audio_path,
-                os.path.join(output_dir, "normalized_audio.wav")
-            )
+            with profiler.stage("normalize"):
+                normalized_audio = self.audio_processor.normalize_audio(
+                    audio_path,
+                    os.path.join(output_dir, "normalized_audio.wav")
+                )
+                profiler.audio_seconds = self.audio_processor.get_audio_duration(normalized_audio)
             
             # Step 2: Enroll speakers
             print("\n[STEP 2] Enrolling speakers...")
-            self.recognizer.enroll_speakers_from_directory(enroll_dir, force=False)
+            with profiler.stage("enroll", audio_seconds=0.0), self.checkout("recognizer") as recognizer:
+                recognizer.enroll_speakers_from_directory(enroll_dir, force=False)
+            
+            speech_audio, offsets = self._compact_speech(
+                normalized_audio, os.path.join(temp_dir, "speech_only.wav"), profiler
+            )
+            
+            audio = None
+            diarization = centroids = None
+            if draft_profile is not None:
+                print("\n[STEP 3] Diarizing speakers...")
+                with profiler.stage("diarize"):
+                    diarization, centroids = self._diarize(
+                        speech_audio, offsets, self._resolve_speaker_hints(enroll_dir, speaker_hints)
+                    )
+                print(f"\n[DRAFT] Transcribing with {describe(draft_profile)}...")
+                with self.checkout("transcriber", draft_profile) as transcriber:
+                    with profiler.stage("draft_transcribe") as record:
+                        record["profile"] = draft_profile.name
+                        audio = transcriber.load_audio(speech_audio)
+                        draft_transcript = transcriber.transcribe_audio(
+                            audio, language=language, batch_size=draft_profile.batch_size
+                        )
+                offsets.remap_transcript(draft_transcript)
+                self._emit_draft(
+                    draft_transcript, diarization, audio_path, language, draft_profile, profiler, on_draft
+                )
             
             # Step 3: Transcribe
             print("\n[STEP 3] Transcribing audio...")
-            transcript_result = self.transcriber.transcribe(normalized_audio, language=language)
+            with self.checkout("transcriber", profile) as transcriber:
+                with profiler.stage("transcribe") as record:
+                    record["profile"] = profile.name
+                    if audio is None:
+                        audio = transcriber.load_audio(speech_audio)
+                    transcript_result = transcriber.transcribe_audio(
+                        audio, language=language, batch_size=profile.batch_size
+                    )
+                if profile.align:
+                    with profiler.stage("align"):
+                        transcript_result = transcriber.align(
+                            transcript_result["segments"], audio, language=language
+                        )
+                offsets.remap_transcript(transcript_result)
             
-            # Step 4: Diarize
-            print("\n[STEP 4] Diarizing speakers...")
-            diarization = self.diarizer.diarize(normalized_audio)
+            # Step 4: Diarize (already done in two-pass mode)
+            if diarization is None:
+                print("\n[STEP 4] Diarizing speakers...")
+                with profiler.stage("diarize"):
+                    diarization, centroids = self._diarize(
+                        speech_audio, offsets, self._resolve_speaker_hints(enroll_dir, speaker_hints)
+                    )
             
             # Step 5: Merge and identify
             print("\n[STEP 5] Merging and identifying speakers...")
-            merged = self._merge_transcript_diarization_and_identify(
-                transcript_result, diarization, normalized_audio, temp_dir
-            )
+            with profiler.stage("identify"):
+                merged = self._merge_transcript_diarization_and_identify(
+                    transcript_result, diarization, normalized_audio, profiler, centroids,
+                    profile.identification
+                )
             
             # Step 6: Generate summary 
             print("\n[STEP 6] Generating meeting summary...")
-            summary = self.generate_meeting_summary(merged)
+            with profiler.stage("summarize"):
+                summary = self.generate_meeting_summary(merged)
             
             # Step 7: Format output
             print("\n[STEP 7] Formatting output...")
             formatted_lines = self._format_output(merged)
-            raw_transcript = [
-                {
-                    "speaker": item["identified_speaker"],
-                    "text": item["text"],
-                    "timestamp": item["timestamp"],
-                    "start": item["start"],
-                    "end": item["end"],
-                    "confidence": item["confidence"],
-                }
-                for item in merged
-            ]
+            raw_transcript = self._raw_transcript(merged)
             
             # Print to console
             print("\n" + "=" * 70)
@@ -177,7 +536,9 @@ class IntegratedMeetingSystem:
                     "enrollment_dir": enroll_dir,
                     "language": language,
                     "timestamp": datetime.now().isoformat(),
-                    "device": self.device
+                    "device": self.device,
+                    "profile": profile.as_dict(),
+                    "pass": "final" if draft_profile is not None else "single"
                 },
                 "summary": summary,
                 "transcript": formatted_lines,
@@ -185,11 +546,16 @@ class IntegratedMeetingSystem:
                 "statistics": {
                     "total_speakers": len(self.speaker_db),
                     "total_segments": len(formatted_lines),
-                    "enrolled_speakers": self.recognizer.get_enrolled_speakers()
+                    "enrolled_speakers": self.speaker_db.list_speakers()
                 }
             }
             
-            self._save_results(result, output_dir)
+            with profiler.stage("save", audio_seconds=0.0):
+                self._save_results(result, output_dir)
+            profiler.mark("first_transcript")
+            profiler.mark("final_transcript")
+            # Stage metrics are attached after saving so the "save" probe is included
+            result["metadata"]["metrics"] = profiler.summary()
             
             print("\n" + "=" * 70)
             print(f"[OK] Processing complete!")
@@ -204,6 +570,417 @@ class IntegratedMeetingSystem:
             except:
                 pass
     
+    def process_segment(self,
+                        segment_path: str,
+                        enroll_dir: str,
+                        temp_dir: str,
+                        language: str = "vi",
+                        profiler: Optional[StageProfiler] = None,
+                        overlap: Optional[OverlapPlan] = None,
+                        speaker_hints: Optional[Dict[str, int]] = None,
+                        profile=None) -> List[Dict]:
+        """
+        Segment pipeline used by the API: normalize -> transcribe -> diarize -> identify.
+        
+        No summary is generated and nothing is saved; the merged entries are
+        returned so the caller can shift them onto the meeting timeline.
+        
+        With an overlap plan only the uncovered part of the segment is
+        transcribed and embedded; the neighbours' cached entries are merged
+        back (flagged "reused") with labels from this segment's diarization.
+        
+        Args:
+            segment_path: Path to segment audio file
+            enroll_dir: Directory with speaker enrollment files
+            temp_dir: Scratch directory (caller is responsible for cleanup)
+            language: Language code
+            profiler: StageProfiler collecting per-stage metrics (new one if None)
+            overlap: Plan from OverlapCache (process everything if None)
+            speaker_hints: Meeting-level speaker counts (used as an upper bound)
+            profile: Profile or profile name (default profile if None)
+            
+        Returns:
+            List of merged transcript entries
+        """
+        profiler = profiler or StageProfiler()
+        overlap = overlap or OverlapPlan()
+        profile = self.resolve_profile(profile)
+        Path(temp_dir).mkdir(parents=True, exist_ok=True)
+        
+        with profiler.stage("enroll", audio_seconds=0.0), self.checkout("recognizer") as recognizer:
+            recognizer.enroll_speakers_from_directory(enroll_dir, force=False)
+        with profiler.stage("normalize"):
+            normalized_audio = self.audio_processor.normalize_audio(
+                segment_path, os.path.join(temp_dir, "normalized.wav")
+            )
+            profiler.audio_seconds = self.audio_processor.get_audio_duration(normalized_audio)
+        
+        speech_audio, offsets = self._compact_speech(
+            normalized_audio, os.path.join(temp_dir, "speech_only.wav"), profiler
+        )
+        
+        # The overlap plan is in original time; clip the (possibly compacted) buffer
+        clip_from = offsets.to_compact(overlap.transcribe_from)
+        clip_to = None if overlap.transcribe_to is None else offsets.to_compact(overlap.transcribe_to)
+        skipped = overlap.skipped_seconds(profiler.audio_seconds)
+        with self.checkout("transcriber", profile) as transcriber:
+            with profiler.stage("transcribe", audio_seconds=profiler.audio_seconds - skipped) as record:
+                record["skipped_audio_seconds"] = round(skipped, 3)
+                record["profile"] = profile.name
+                audio = transcriber.load_audio(speech_audio)
+                clip = self._clip_audio(audio, clip_from, clip_to)
+                transcript_result = (
+                    transcriber.transcribe_audio(clip, language=language, batch_size=profile.batch_size)
+                    if len(clip) else {"segments": []}
+                )
+            if profile.align:
+                with profiler.stage("align", audio_seconds=profiler.audio_seconds - skipped):
+                    if transcript_result["segments"]:
+                        transcript_result = transcriber.align(
+                            transcript_result["segments"], clip, language=language
+                        )
+            self._shift_transcript(transcript_result, clip_from)
+            offsets.remap_transcript(transcript_result)
+        with profiler.stage("diarize"):
+            diarization, centroids = self._diarize(
+                speech_audio, offsets,
+                self._resolve_speaker_hints(enroll_dir, speaker_hints, segment=True)
+            )
+        with profiler.stage("identify") as record:
+            merged = self._merge_transcript_diarization_and_identify(
+                transcript_result, diarization, normalized_audio, profiler, centroids,
+                profile.identification
+            )
+            reused = self._reuse_entries(overlap.reused, diarization)
+            record["reused_entries"] = len(reused)
+        return sorted(merged + reused, key=lambda entry: entry["start"])
+    
+    def _compact_speech(self,
+                        normalized_audio: str,
+                        output_path: str,
+                        profiler: StageProfiler):
+        """
+        Optionally cut long silences before the heavy stages.
+        
+        Returns:
+            Tuple of (audio path for transcription/diarization, OffsetTable)
+        """
+        if not self.vad_compaction:
+            return normalized_audio, OffsetTable.identity(profiler.audio_seconds)
+        with profiler.stage("vad") as record:
+            speech_audio, offsets = self.audio_processor.compact_speech(
+                normalized_audio, output_path
+            )
+            record["speech_seconds"] = round(offsets.compact_seconds, 3)
+            record["compression_ratio"] = round(offsets.compression_ratio, 3)
+        return speech_audio, offsets
+    
+    def _resolve_speaker_hints(self,
+                               enroll_dir: str,
+                               speaker_hints: Optional[Dict[str, int]],
+                               segment: bool = False) -> Dict[str, int]:
+        """
+        Turn request speaker counts into pyannote clustering hints.
+        
+        Meeting-level counts only bound a segment from above (a segment may
+        hear fewer people). Without an upper bound, the enrollment gallery
+        plus diarization_extra_speakers guests is used.
+        
+        Returns:
+            Keyword arguments for Diarizer.diarize
+        """
+        hints = {k: v for k, v in (speaker_hints or {}).items() if v is not None}
+        if segment:
+            if "num_speakers" in hints:
+                hints["max_speakers"] = hints.pop("num_speakers")
+            hints.pop("min_speakers", None)
+        
+        if "num_speakers" not in hints and "max_speakers" not in hints \
+                and self.diarization_extra_speakers >= 0 and os.path.isdir(enroll_dir):
+            from speaker_recognition import SpeakerRecognizer
+            gallery = len(SpeakerRecognizer.list_enrollment_files(enroll_dir))
+            if gallery:
+                hints["max_speakers"] = max(
+                    gallery + self.diarization_extra_speakers, hints.get("min_speakers", 1)
+                )
+        return hints
+    
+    def _diarize(self, audio_path: str, offsets: OffsetTable, hints: Optional[Dict[str, int]] = None):
+        """
+        Diarize audio_path and move the turns onto the original timeline.
+        
+        Returns:
+            Tuple of (diarization, {label: centroid} or None); centroids are
+            only requested with the pyannote embedding backend
+        """
+        hints = hints or {}
+        centroids = None
+        with self.checkout("diarizer") as diarizer:
+            if self.speaker_embedding_backend == "pyannote":
+                diarization, centroids = diarizer.diarize(audio_path, return_embeddings=True, **hints)
+            else:
+                diarization = diarizer.diarize(audio_path, **hints)
+        if len(offsets.regions) > 1:
+            diarization = self.diarizer.remap(diarization, offsets.to_original)
+        return diarization, centroids
+    
+    @staticmethod
+    def _clip_audio(audio, start: float, end: Optional[float], sr: int = 16000):
+        """Cut [start, end) seconds out of a 16kHz whisperx audio array."""
+        return audio[int(start * sr):None if end is None else int(end * sr)]
+    
+    @staticmethod
+    def _shift_transcript(transcript_result: Dict, offset: float):
+        """Move transcript (and word) timestamps of a clipped transcription by offset."""
+        if not offset:
+            return
+        for segment in transcript_result["segments"]:
+            segment["start"] += offset
+            segment["end"] += offset
+            for word in segment.get("words", []):
+                if "start" in word:
+                    word["start"] += offset
+                if "end" in word:
+                    word["end"] += offset
+    
+    def _reuse_entries(self, cached: List[Dict], diarization) -> List[Dict]:
+        """Turn cached neighbour entries into merged entries of this segment."""
+        import torch
+        entries = []
+        for item in cached:
+            diar_speaker, _ = self.diarizer.get_speaker_at_time(
+                diarization, max(0.0, item["start"]), item["end"]
+            )
+            embedding = item.get("embedding")
+            entries.append({
+                "text": item["text"],
+                "start": item["start"],
+                "end": item["end"],
+                "diarization_speaker": diar_speaker,
+                "identified_speaker": item.get("identified_speaker", "Unknown"),
+                "confidence": item.get("confidence", 0.0),
+                "timestamp": self._format_timestamp(max(0.0, item["start"])),
+                "embedding": None if embedding is None else torch.tensor(embedding),
+                "reused": True,
+            })
+        return entries
+    
+    def process_segments(self,
+                         segments: List[Dict],
+                         enroll_dir: str,
+                         temp_dir: str,
+                         language: str = "vi",
+                         profiler: Optional[StageProfiler] = None,
+                         on_result: Optional[Callable[[Dict], None]] = None,
+                         speaker_hints: Optional[Dict[str, int]] = None,
+                         profile=None) -> List[Dict]:
+        """
+        Pipelined version of process_segment for all segments of a meeting.
+        
+        Three threads share the resident models:
+          - decode: normalizes and loads segment N+1 while N is being inferred
+          - main: transcribe -> align -> diarize, then cuts speaker crops
+          - identify: embeds the crops of every segment that is ready in
+            shared ECAPA batches (across segment boundaries) and emits the
+            results in segment order
+        
+        A failing segment is reported through its own result and does not
+        stop the others.
+        
+        Args:
+            segments: Dicts with at least "segment_path" (other keys are passed through)
+            enroll_dir: Directory with speaker enrollment files
+            temp_dir: Scratch directory (caller is responsible for cleanup)
+            language: Language code
+            profiler: Batch-level StageProfiler; its listener sees per-segment progress
+            on_result: Called with each segment result as soon as it is ready
+            speaker_hints: Meeting-level speaker counts (used as an upper bound)
+            profile: Profile or profile name for every segment (default profile if None)
+            
+        Returns:
+            One dict per segment: {"segment", "entries", "metrics", "error"}
+        """
+        import torchaudio
+        profiler = profiler or StageProfiler()
+        profile = self.resolve_profile(profile)
+        Path(temp_dir).mkdir(parents=True, exist_ok=True)
+        
+        with profiler.stage("enroll", audio_seconds=0.0), self.checkout("recognizer") as recognizer:
+            recognizer.enroll_speakers_from_directory(enroll_dir, force=False)
+        hints = self._resolve_speaker_hints(enroll_dir, speaker_hints, segment=True)
+        
+        decoded: "queue.Queue" = queue.Queue(maxsize=1)
+        inferred: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        aborted = threading.Event()
+        results: List[Dict] = []
+        
+        def put_decoded(item) -> bool:
+            while not stop.is_set():
+                try:
+                    decoded.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def decode_loop():
+            for index, segment in enumerate(segments):
+                item = {"segment": segment, "profiler": StageProfiler(), "error": None}
+                try:
+                    seg_profiler = item["profiler"]
+                    with seg_profiler.stage("normalize"):
+                        item["path"] = self.audio_processor.normalize_audio(
+                            segment["segment_path"],
+                            os.path.join(temp_dir, f"segment_{index}.wav"),
+                        )
+                        seg_profiler.audio_seconds = self.audio_processor.get_audio_duration(item["path"])
+                    item["speech_path"], item["offsets"] = self._compact_speech(
+                        item["path"], os.path.join(temp_dir, f"segment_{index}_speech.wav"), seg_profiler
+                    )
+                    with seg_profiler.stage("decode", audio_seconds=0.0):
+                        item["audio"] = self.transcriber.load_audio(item["speech_path"])
+                        item["waveform"], item["sr"] = torchaudio.load(item["path"])
+                except Exception as e:
+                    item["error"] = e
+                if not put_decoded(item):
+                    return
+            put_decoded(None)
+        
+        def identify_loop():
+            finished = False
+            while not finished:
+                ready = [inferred.get()]
+                # Drain everything already inferred so it shares embedding batches
+                while True:
+                    try:
+                        ready.append(inferred.get_nowait())
+                    except queue.Empty:
+                        break
+                if ready[-1] is None:
+                    ready.pop()
+                    finished = True
+                
+                ok = []
+                for item in ready:
+                    if item["error"] is not None:
+                        continue
+                    if item.get("centroids") is None:
+                        ok.append(item)
+                        continue
+                    with item["profiler"].stage("identify"):
+                        try:
+                            self._identify_from_centroids(
+                                item["entries"], item["centroids"], item["profiler"]
+                            )
+                        except Exception as e:
+                            item["error"] = e
+                if ok:
+                    with ExitStack() as stack:
+                        for item in ok:
+                            stack.enter_context(item["profiler"].stage("identify"))
+                        try:
+                            # Groups are formed per segment (labels are segment-local),
+                            # but all groups share the embedding batches
+                            plans = [
+                                self._identification_groups(item["entries"], item["crops"], profile.identification)
+                                for item in ok
+                            ]
+                            embeddings = self._embed_crops([crop for plan in plans for _, crop in plan])
+                            offset = 0
+                            for item, plan in zip(ok, plans):
+                                stats = self._apply_group_identities(
+                                    item["entries"], plan, embeddings[offset:offset + len(plan)]
+                                )
+                                offset += len(plan)
+                                item["profiler"].annotate(**stats)
+                        except Exception as e:
+                            for item in ok:
+                                item["error"] = e
+                
+                if aborted.is_set():
+                    continue  # cancelled: nobody expects the remaining results
+                for item in ready:
+                    self._emit_segment_result(item, results, on_result)
+        
+        decoder = threading.Thread(target=decode_loop, name="segment-decode", daemon=True)
+        identifier = threading.Thread(target=identify_loop, name="segment-identify", daemon=True)
+        decoder.start()
+        identifier.start()
+        
+        try:
+            with profiler.stage("segments", audio_seconds=0.0):
+                for done in range(len(segments)):
+                    # Progress hook; the job listener may cancel between segments
+                    profiler.progress(done, len(segments))
+                    item = decoded.get()
+                    if item is None:
+                        break
+                    seg_profiler = item["profiler"]
+                    profiler.audio_seconds += seg_profiler.audio_seconds
+                    if item["error"] is None:
+                        try:
+                            with self.checkout("transcriber", profile) as transcriber:
+                                with seg_profiler.stage("transcribe") as record:
+                                    record["profile"] = profile.name
+                                    transcript_result = transcriber.transcribe_audio(
+                                        item["audio"], language=language, batch_size=profile.batch_size
+                                    )
+                                if profile.align:
+                                    with seg_profiler.stage("align"):
+                                        transcript_result = transcriber.align(
+                                            transcript_result["segments"], item["audio"], language=language
+                                        )
+                                item["offsets"].remap_transcript(transcript_result)
+                            with seg_profiler.stage("diarize"):
+                                diarization, item["centroids"] = self._diarize(
+                                    item["speech_path"], item["offsets"], hints
+                                )
+                            item["entries"], item["crops"] = self._collect_merge_entries(
+                                transcript_result, diarization,
+                                # Centroid identification needs no audio crops
+                                item["waveform"] if item["centroids"] is None else None,
+                                item["sr"]
+                            )
+                        except Exception as e:
+                            item["error"] = e
+                    # Decoded audio is no longer needed once crops are cut
+                    item.pop("audio", None)
+                    item.pop("waveform", None)
+                    inferred.put(item)
+                profiler.progress(len(segments), len(segments))
+        except BaseException:
+            aborted.set()
+            raise
+        finally:
+            stop.set()
+            inferred.put(None)
+            identifier.join()
+            decoder.join()
+        
+        return results
+    
+    def _emit_segment_result(self,
+                             item: Dict,
+                             results: List[Dict],
+                             on_result: Optional[Callable[[Dict], None]]):
+        """Build the public result of one pipelined segment and hand it out."""
+        error = item["error"]
+        if error is not None:
+            print(f"[ERROR] Segment {item['segment'].get('segment_path')} failed: {error}")
+        result = {
+            "segment": item["segment"],
+            "entries": item.get("entries", []) if error is None else [],
+            "metrics": item["profiler"].summary(),
+            "error": error,
+        }
+        results.append(result)
+        if on_result is not None:
+            try:
+                on_result(result)
+            except Exception as e:
+                print(f"[WARN] Segment result handler failed: {e}")
+    
     def show_cache_info(self):
         """Display model cache information."""
         if self.model_cache:
@@ -228,14 +1005,45 @@ class IntegratedMeetingSystem:
                                                    transcript_result: Dict,
                                                    diarization,
                                                    audio_path: str,
-                                                   temp_dir: str) -> List[Dict]:
+                                                   profiler: Optional[StageProfiler] = None,
+                                                   centroids: Optional[Dict] = None,
+                                                   identification: str = "segment") -> List[Dict]:
         """Merge transcript, diarization, and speaker identification."""
+        if centroids is not None:
+            merged_output, _ = self._collect_merge_entries(transcript_result, diarization)
+            self._identify_from_centroids(merged_output, centroids, profiler)
+            return merged_output
+        
         # Load full audio
+        import torchaudio
         full_audio, sr = torchaudio.load(audio_path)
         
-        merged_output = []
+        merged_output, crops = self._collect_merge_entries(
+            transcript_result, diarization, full_audio, sr
+        )
+        self._identify_entries(merged_output, crops, profiler, identification)
+        return merged_output
+    
+    def _collect_merge_entries(self,
+                               transcript_result: Dict,
+                               diarization,
+                               full_audio: Optional[torch.Tensor] = None,
+                               sr: int = 16000):
+        """
+        Pair transcript segments with diarization labels and cut their audio.
         
-        for seg_idx, segment in enumerate(tqdm(transcript_result["segments"], desc="Processing segments")):
+        Returns:
+            Tuple of (entries without identification, 16kHz audio crop per entry);
+            no crops are cut when full_audio is None
+        """
+        if full_audio is not None and sr != 16000:
+            import torchaudio
+            full_audio = torchaudio.transforms.Resample(sr, 16000)(full_audio)
+            sr = 16000
+        
+        entries = []
+        crops = []
+        for segment in transcript_result["segments"]:
             start = segment["start"]
             end = segment["end"]
             text = segment["text"].strip()
@@ -246,32 +1054,275 @@ class IntegratedMeetingSystem:
             # Get diarization speaker
             diar_speaker, _ = self.diarizer.get_speaker_at_time(diarization, start, end)
             
-            # Extract and identify speaker
-            start_sample = int(start * sr)
-            end_sample = int(end * sr)
-            segment_audio = full_audio[:, start_sample:end_sample]
-            
-            seg_file = os.path.join(temp_dir, f"seg_{seg_idx}.wav")
-            torchaudio.save(seg_file, segment_audio, sr)
-            
-            identified_speaker, confidence = self.recognizer.identify(seg_file)
-            
-            try:
-                os.remove(seg_file)
-            except:
-                pass
-            
-            merged_output.append({
+            entries.append({
                 "text": text,
                 "start": start,
                 "end": end,
                 "diarization_speaker": diar_speaker,
-                "identified_speaker": identified_speaker,
-                "confidence": float(confidence),
+                "identified_speaker": "Unknown",
+                "confidence": 0.0,
                 "timestamp": self._format_timestamp(start)
             })
+            if full_audio is not None:
+                crops.append(full_audio[0, int(start * sr):int(end * sr)])
         
-        return merged_output
+        return entries, crops
+    
+    def _identify_entries(self,
+                          entries: List[Dict],
+                          crops: List[torch.Tensor],
+                          profiler: Optional[StageProfiler] = None,
+                          identification: str = "segment") -> Dict:
+        """
+        Identify speakers of merged entries of one segment (in place).
+        
+        Each entry also keeps its ECAPA embedding under "embedding" (None if
+        it was not embedded) for meeting-level reconciliation.
+        
+        Args:
+            identification: "segment" or "cluster" (see profiles.py)
+        
+        Returns:
+            Embedding statistics (see _apply_group_identities)
+        """
+        groups = self._identification_groups(entries, crops, identification)
+        embeddings = self._embed_crops([crop for _, crop in groups], profiler)
+        stats = self._apply_group_identities(entries, groups, embeddings)
+        if profiler is not None:
+            profiler.annotate(**stats)
+        return stats
+    
+    def _identify_from_centroids(self,
+                                 entries: List[Dict],
+                                 centroids: Dict,
+                                 profiler: Optional[StageProfiler] = None) -> Dict:
+        """
+        Identify entries by matching their diarization cluster centroid (in place).
+        
+        Used with the pyannote embedding backend: every cluster is matched
+        once and its centroid is kept as the entry embedding.
+        
+        Returns:
+            Embedding statistics (no embedding inference runs)
+        """
+        import torch
+        matches = self.recognizer.identify_centroids(centroids)
+        for entry in entries:
+            label = entry["diarization_speaker"]
+            speaker, confidence = matches.get(label, ("Unknown", 0.0))
+            entry.update({
+                "embedding": torch.as_tensor(centroids[label], dtype=torch.float32) if label in centroids else None,
+                "identified_speaker": speaker,
+                "confidence": float(confidence),
+                "identity_source": "centroid",
+            })
+        stats = {"embedding_calls": 0, "embedding_calls_avoided": len(entries)}
+        if profiler is not None:
+            profiler.annotate(**stats)
+        return stats
+    
+    def _identification_groups(self,
+                               entries: List[Dict],
+                               crops: List[torch.Tensor],
+                               identification: str = "segment") -> List[tuple]:
+        """Embedding groups for an identification strategy ("segment" or "cluster")."""
+        if identification == "cluster":
+            return self._cluster_groups(entries, crops)
+        return self._embedding_groups(entries, crops)
+    
+    def _cluster_groups(self,
+                        entries: List[Dict],
+                        crops: List[torch.Tensor]) -> List[tuple]:
+        """
+        One embedding group per diarization cluster.
+        
+        The crop joins the cluster's longest entries (in time order) until it
+        holds cluster_embedding_seconds of speech, and every entry of the
+        cluster takes the resulting identity. Clusters with less than
+        embedding_min_seconds of speech are not embedded.
+        
+        Returns:
+            List of (entry indices, concatenated crop) per cluster to embed
+        """
+        import torch
+        clusters: Dict[str, List[int]] = {}
+        for idx, entry in enumerate(entries):
+            clusters.setdefault(entry["diarization_speaker"], []).append(idx)
+        
+        groups = []
+        for members in clusters.values():
+            chosen: List[int] = []
+            seconds = 0.0
+            for idx in sorted(members, key=lambda i: entries[i]["end"] - entries[i]["start"], reverse=True):
+                if seconds >= self.cluster_embedding_seconds:
+                    break
+                chosen.append(idx)
+                seconds += entries[idx]["end"] - entries[idx]["start"]
+            if seconds >= self.embedding_min_seconds:
+                groups.append((members, torch.cat([crops[i] for i in sorted(chosen)])))
+        return groups
+    
+    def _embedding_groups(self,
+                          entries: List[Dict],
+                          crops: List[torch.Tensor]) -> List[tuple]:
+        """
+        Merge adjacent short entries of the same diarization speaker for embedding.
+        
+        Consecutive entries with the same label (at most 2 seconds apart) are
+        joined until the group reaches embedding_target_seconds. Groups still
+        shorter than embedding_min_seconds are dropped: their entries inherit
+        an identity instead of getting an unreliable embedding.
+        
+        Returns:
+            List of (entry indices, concatenated crop) per group to embed
+        """
+        import torch
+        groups = []
+        current: List[int] = []
+        
+        def close():
+            duration = sum(entries[i]["end"] - entries[i]["start"] for i in current)
+            if current and duration >= self.embedding_min_seconds:
+                groups.append((list(current), torch.cat([crops[i] for i in current])))
+        
+        for idx, entry in enumerate(entries):
+            if current:
+                last = entries[current[-1]]
+                duration = sum(entries[i]["end"] - entries[i]["start"] for i in current)
+                if (entry["diarization_speaker"] != last["diarization_speaker"]
+                        or entry["start"] - last["end"] > 2.0
+                        or duration >= self.embedding_target_seconds):
+                    close()
+                    current = []
+            current.append(idx)
+        close()
+        return groups
+    
+    def _embed_crops(self,
+                     crops: List[torch.Tensor],
+                     profiler: Optional[StageProfiler] = None) -> List[Optional[torch.Tensor]]:
+        """Embed crops in batches, reporting progress between batches."""
+        batch_size = self.embedding_batch_size
+        embeddings: List[Optional[torch.Tensor]] = []
+        with self.checkout("recognizer") as recognizer:
+            for start in tqdm(range(0, len(crops), batch_size), desc="Identifying speakers"):
+                # Progress hook; the job listener may cancel between batches
+                if profiler is not None:
+                    profiler.progress(start, len(crops))
+                embeddings.extend(recognizer.embed_waveforms(
+                    crops[start:start + batch_size], batch_size=batch_size
+                ))
+        return embeddings
+    
+    def _apply_group_identities(self,
+                                entries: List[Dict],
+                                groups: List[tuple],
+                                embeddings: List[Optional[torch.Tensor]]) -> Dict:
+        """
+        Give every entry an identity from its group, cluster or neighbours.
+        
+        Entries that were not embedded take the identity that covers most
+        speaking time in their diarization cluster; if the cluster has no
+        embedded entry, they take the identity of the nearest embedded entry.
+        
+        Returns:
+            Dictionary with embedding_calls and embedding_calls_avoided
+        """
+        matches = self.recognizer.identify_embeddings(embeddings)
+        for (members, _), embedding, (speaker, confidence) in zip(groups, embeddings, matches):
+            for idx in members:
+                entries[idx].update({
+                    "embedding": embedding,
+                    "identified_speaker": speaker,
+                    "confidence": float(confidence),
+                    "identity_source": "embedding",
+                })
+        
+        # Duration-weighted identity votes per diarization cluster
+        votes: Dict[str, Dict[str, List[float]]] = {}
+        for entry in entries:
+            if entry.get("identity_source") != "embedding":
+                continue
+            duration = entry["end"] - entry["start"]
+            tally = votes.setdefault(entry["diarization_speaker"], {}).setdefault(
+                entry["identified_speaker"], [0.0, 0.0]
+            )
+            tally[0] += duration
+            tally[1] += duration * entry["confidence"]
+        
+        embedded = [i for i, e in enumerate(entries) if e.get("identity_source") == "embedding"]
+        for idx, entry in enumerate(entries):
+            if entry.get("identity_source") == "embedding":
+                continue
+            entry["embedding"] = None
+            cluster = votes.get(entry["diarization_speaker"])
+            if cluster:
+                speaker, (duration, weighted) = max(cluster.items(), key=lambda kv: kv[1][0])
+                entry.update({
+                    "identified_speaker": speaker,
+                    "confidence": weighted / duration if duration > 0 else 0.0,
+                    "identity_source": "cluster",
+                })
+            elif embedded:
+                nearest = min(embedded, key=lambda i: abs(entries[i]["start"] - entry["start"]))
+                entry.update({
+                    "identified_speaker": entries[nearest]["identified_speaker"],
+                    "confidence": entries[nearest]["confidence"],
+                    "identity_source": "neighbour",
+                })
+        
+        return {
+            "embedding_calls": len(groups),
+            "embedding_calls_avoided": len(entries) - len(groups),
+        }
+    
+    def _emit_draft(self,
+                    transcript_result: Dict,
+                    diarization,
+                    audio_path: str,
+                    language: str,
+                    profile: Profile,
+                    profiler: StageProfiler,
+                    on_draft: Callable[[Dict], None]):
+        """Hand out the first-pass transcript, labelled with diarization speakers only."""
+        entries, _ = self._collect_merge_entries(transcript_result, diarization)
+        for entry in entries:
+            entry["identified_speaker"] = entry["diarization_speaker"]
+        profiler.mark("first_transcript")
+        draft = {
+            "metadata": {
+                "audio_file": audio_path,
+                "language": language,
+                "timestamp": datetime.now().isoformat(),
+                "device": self.device,
+                "profile": profile.as_dict(),
+                "pass": "draft",
+                "metrics": profiler.summary()
+            },
+            "summary": None,
+            "transcript": self._format_output(entries),
+            "raw_transcript": self._raw_transcript(entries)
+        }
+        print(f"[OK] Draft transcript ready: {len(entries)} lines "
+              f"after {profiler.milestones['first_transcript']:.1f}s")
+        try:
+            on_draft(draft)
+        except Exception as e:
+            print(f"[WARN] Draft result handler failed: {e}")
+    
+    def _raw_transcript(self, merged: List[Dict]) -> List[Dict]:
+        """Entries with timing, as sent in the raw_transcript field."""
+        return [
+            {
+                "speaker": item["identified_speaker"],
+                "text": item["text"],
+                "timestamp": item["timestamp"],
+                "start": item["start"],
+                "end": item["end"],
+                "confidence": item["confidence"],
+            }
+            for item in merged
+        ]
     
     def _format_output(self, merged: List[Dict]) -> List[Dict]:
         """Format merged results for output."""
@@ -377,6 +1428,12 @@ Hãy tạo biên bản họp theo đúng format yêu cầu.
         return summary_text
 
 
+def _speaker_database() -> SpeakerDatabase:
+    """Speaker database of the configured embedding backend, without a system."""
+    backend = os.getenv("SPEAKER_EMBEDDING_BACKEND", "ecapa").lower()
+    return SpeakerDatabase(db_name=PYANNOTE_DB_NAME if backend == "pyannote" else DEFAULT_DB_NAME)
+
+
 def main():
     """Command-line entry point."""
     if len(sys.argv) < 2:
@@ -436,8 +1493,8 @@ def main():
             print(f"\n[OK] Enrollment saved to: {system.speaker_db.db_path}")
         
         elif command == "list-speakers":
-            system = IntegratedMeetingSystem(huggingface_token="dummy_token")
-            speakers = system.recognizer.get_enrolled_speakers()
+            # Database only: neither models nor torch are loaded up front
+            speakers = _speaker_database().list_speakers()
             if speakers:
                 print(f"\nEnrolled speakers ({len(speakers)}):")
                 for spk in speakers:
@@ -451,14 +1508,16 @@ def main():
                 sys.exit(1)
             
             speaker_name = sys.argv[2]
-            system = IntegratedMeetingSystem(huggingface_token="dummy_token", google_api_key="dummy_token")
-            system.recognizer.remove_speaker(speaker_name)
+            speaker_db = _speaker_database()
+            if speaker_db.remove_speaker(speaker_name):
+                speaker_db.save()
         
         elif command == "clear-db":
             confirm = input("[WARNING] Delete all speakers? (y/n): ")
             if confirm.lower() == 'y':
-                system = IntegratedMeetingSystem(huggingface_token="dummy_token", google_api_key="dummy_token")
-                system.recognizer.clear_database()
+                speaker_db = _speaker_database()
+                speaker_db.clear()
+                speaker_db.delete_file()
                 print("[OK] Database cleared")
             else:
                 print("[INFO] Cancelled")
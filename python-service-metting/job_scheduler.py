@@ -0,0 +1,480 @@
+"""
+Job Scheduler Module
+
+Runs heavy pipeline jobs on a fixed pool of worker threads.
+Supports:
+  - Configurable concurrency limit (jobs running at once)
+  - Bounded queue: submit() raises QueueFullError with a Retry-After hint
+  - Per-job state (queued, running, completed, failed, cancelled)
+  - Progress (current stage, segment loop position), a monotonic job
+    percent weighting each stage by its share of run time (learned per job
+    kind from completed jobs) and ETA from the measured real-time factor of
+    earlier jobs
+  - Projected queue wait (work ahead of a new job) from the same estimates
+  - Cooperative cancellation between stages and segment batches
+  - Priority classes (interactive > normal > bulk) with aging, so a waiting
+    low-priority job gains one class every `aging_seconds` and cannot starve
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import metrics
+
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+# Priority classes, lower value runs first
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "normal": 1,
+    "bulk": 2,
+}
+
+
+def _normalized(weights: Dict[str, float]) -> Dict[str, float]:
+    """Scale weights to sum to 1 (empty if they sum to 0)."""
+    total = sum(weights.values())
+    if total <= 0:
+        return {}
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation was requested."""
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """A unit of work tracked by the scheduler."""
+
+    job_id: str
+    kind: str
+    func: Callable[..., Any]
+    args: Tuple = ()
+    priority: str = "normal"
+    state: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    stage: Optional[str] = None
+    stage_done: int = 0
+    stage_total: int = 0
+    # Expected share of run time per stage (set when the job starts)
+    stage_weights: Dict[str, float] = field(default_factory=dict)
+    stages_started: List[str] = field(default_factory=list)
+    percent: float = 0.0
+    # StageProfiler of the running pipeline (gives audio duration)
+    profiler: Any = None
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def request_cancel(self):
+        """Ask the job to stop at its next checkpoint."""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested."""
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def on_stage(self, name: str):
+        """StageProfiler listener hook: a new stage starts."""
+        self.check_cancelled()
+        self.stage = name
+        self.stage_done = 0
+        self.stage_total = 0
+        self._update_percent()
+        if name not in self.stages_started:
+            self.stages_started.append(name)
+
+    def on_progress(self, name: str, done: int, total: int):
+        """StageProfiler listener hook: segment loop progress."""
+        self.check_cancelled()
+        self.stage_done = done
+        self.stage_total = total
+        self._update_percent()
+
+    def _update_percent(self):
+        """Advance the job percent from the stage weights and loop progress."""
+        total = sum(self.stage_weights.values())
+        if total <= 0:
+            return
+        done = sum(
+            self.stage_weights.get(name, 0.0)
+            for name in self.stages_started if name != self.stage
+        )
+        if self.stage_total:
+            done += self.stage_weights.get(self.stage, 0.0) * min(1.0, self.stage_done / self.stage_total)
+        # Weights are estimates: the percent never goes back, and only
+        # completion reports 100
+        self.percent = max(self.percent, min(99.0, 100.0 * done / total))
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.profiler.audio_seconds if self.profiler is not None else 0.0
+
+    def to_dict(self, rtf_estimate: Optional[float] = None) -> Dict:
+        """
+        Serializable view of the job state.
+
+        Args:
+            rtf_estimate: Expected real-time factor for this job kind
+
+        Returns:
+            Dictionary with state, progress and ETA
+        """
+        percent = None
+        stage_percent = None
+        eta_seconds = None
+        if self.state in FINISHED_STATES:
+            percent = 100.0 if self.state == COMPLETED else None
+            eta_seconds = 0.0 if self.state == COMPLETED else None
+        elif self.state == RUNNING:
+            # Percent comes from stage weights and the segment loop; the
+            # measured real-time factor only predicts the remaining time
+            if self.stage_weights:
+                percent = self.percent
+            if self.stage_total:
+                stage_percent = 100.0 * self.stage_done / self.stage_total
+            if rtf_estimate and self.audio_seconds > 0:
+                expected = self.audio_seconds * rtf_estimate
+                eta_seconds = max(0.0, expected - (time.time() - self.started_at))
+
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "state": self.state,
+            "stage": self.stage,
+            "stage_progress": {"done": self.stage_done, "total": self.stage_total},
+            "stage_percent": round(stage_percent, 1) if stage_percent is not None else None,
+            "percent": round(percent, 1) if percent is not None else None,
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "audio_seconds": self.audio_seconds,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """Bounded job queue drained by a fixed number of worker threads."""
+
+    def __init__(self,
+                 max_concurrency: int = 1,
+                 max_queue_size: int = 16,
+                 history_size: int = 256,
+                 aging_seconds: float = 300.0,
+                 stage_weights: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Initialize scheduler and start worker threads.
+
+        Args:
+            max_concurrency: Number of jobs allowed to run at once
+            max_queue_size: Maximum number of jobs waiting to run
+            history_size: Number of finished jobs kept for status queries
+            aging_seconds: Waiting time after which a job is promoted one priority class
+            stage_weights: Relative run time of each stage per job kind, used
+                for the job percent until a job of that kind has completed
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_size = max(0, max_queue_size)
+        self.history_size = history_size
+        self.aging_seconds = aging_seconds
+
+        self._queue: Deque[Job] = deque()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running = 0
+        self._cond = threading.Condition()
+        self._shutdown = False
+        # Exponential moving average of job run time, for Retry-After hints
+        self._avg_run_seconds: Optional[float] = None
+        # Exponential moving average of job real-time factor per kind, for ETAs
+        self._rtf_by_kind: Dict[str, float] = {}
+        # Exponential moving average of job audio duration per kind, for
+        # queued jobs whose audio has not been decoded yet
+        self._audio_by_kind: Dict[str, float] = {}
+        # Exponential moving average of each stage's share of job run time
+        # per kind, for the job percent
+        self._stage_shares_by_kind: Dict[str, Dict[str, float]] = {
+            kind: _normalized(weights) for kind, weights in (stage_weights or {}).items()
+        }
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        print(f"[INFO] Job scheduler started: concurrency={self.max_concurrency}, "
+              f"queue={self.max_queue_size}")
+
+    def submit(self, kind: str, func: Callable[..., Any], *args,
+               priority: str = "normal",
+               job_id: Optional[str] = None) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            kind: Job category (e.g. the endpoint name), used for metrics
+            func: Callable run on a worker thread as func(job, *args)
+            *args: Positional arguments for func
+            priority: Priority class name (see PRIORITY_CLASSES)
+            job_id: Explicit job id (random if None)
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+            RuntimeError: If the scheduler is shut down
+            ValueError: If the priority class is unknown
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Job scheduler is shut down")
+            if len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(self._retry_after())
+
+            job = Job(
+                job_id=job_id or uuid.uuid4().hex,
+                kind=kind,
+                func=func,
+                args=args,
+                priority=priority,
+            )
+            self._queue.append(job)
+            self._remember(job)
+            metrics.JOBS_QUEUED.labels(kind).inc()
+            metrics.QUEUE_DEPTH.inc()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by id (None if unknown or evicted from history)."""
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Get a job's state, progress and ETA (None if unknown)."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return job.to_dict(self._rtf_by_kind.get(job.kind))
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job.
+
+        Queued jobs are removed immediately; running jobs stop at their next
+        stage or segment-batch checkpoint.
+
+        Args:
+            job_id: Job to cancel
+
+        Returns:
+            The job (None if unknown)
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return job
+            job.request_cancel()
+            if job.state == QUEUED:
+                self._queue.remove(job)
+                job.state = CANCELLED
+                job.finished_at = time.time()
+                metrics.QUEUE_DEPTH.dec()
+            print(f"[INFO] Cancellation requested for job {job_id} ({job.state})")
+            return job
+
+    def stats(self) -> Dict:
+        """Get queue statistics."""
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue_size": self.max_queue_size,
+                "queued": len(self._queue),
+                "running": self._running,
+                "avg_run_seconds": self._avg_run_seconds,
+                "projected_wait_seconds": self._projected_wait(),
+            }
+
+    def projected_wait(self) -> Optional[float]:
+        """
+        Seconds a job submitted now is expected to wait before it starts.
+
+        Sums the expected remaining run time of running jobs and the expected
+        run time of queued jobs (audio duration x measured real-time factor of
+        their kind, falling back to the average run time), spread over the
+        workers.
+
+        Returns:
+            Projected wait in seconds (None until a job has finished)
+        """
+        with self._cond:
+            return self._projected_wait()
+
+    def _expected_run_seconds(self, job: Job) -> Optional[float]:
+        rtf = self._rtf_by_kind.get(job.kind)
+        audio = job.audio_seconds or self._audio_by_kind.get(job.kind, 0.0)
+        if rtf is not None and audio > 0:
+            return audio * rtf
+        return self._avg_run_seconds
+
+    def _projected_wait(self) -> Optional[float]:
+        if self._avg_run_seconds is None:
+            return None
+        now = time.time()
+        work = 0.0
+        for job in self._jobs.values():
+            if job.state not in (QUEUED, RUNNING):
+                continue
+            expected = self._expected_run_seconds(job) or 0.0
+            if job.state == RUNNING:
+                expected = max(0.0, expected - (now - job.started_at))
+            work += expected
+        return round(work / self.max_concurrency, 1)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs; workers exit once the queue is drained."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        if self._avg_run_seconds is None:
+            return 30
+        return max(1, int(self._avg_run_seconds / self.max_concurrency))
+
+    def _remember(self, job: Job):
+        self._jobs[job.job_id] = job
+        # Keep only the most recent finished jobs
+        finished = [
+            job_id for job_id, known in self._jobs.items()
+            if known.state in FINISHED_STATES
+        ]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def _next_job(self) -> Optional[Job]:
+        with self._cond:
+            while not self._queue and not self._shutdown:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            job = self._pick_next(time.time())
+            self._queue.remove(job)
+            job.state = RUNNING
+            job.started_at = time.time()
+            job.stage_weights = dict(self._stage_shares_by_kind.get(job.kind, {}))
+            self._running += 1
+            metrics.QUEUE_DEPTH.dec()
+            metrics.QUEUE_WAIT_SECONDS.labels(job.priority).observe(
+                job.started_at - job.created_at
+            )
+            return job
+
+    def _pick_next(self, now: float) -> Job:
+        """
+        Choose the queued job with the best aged priority (FIFO within ties).
+
+        The queue is bounded by max_queue_size, so a linear scan is cheap and
+        lets the effective priority change continuously with waiting time.
+        """
+        def effective_priority(job: Job) -> Tuple[float, float]:
+            aged = (now - job.created_at) / self.aging_seconds if self.aging_seconds > 0 else 0.0
+            return PRIORITY_CLASSES[job.priority] - aged, job.created_at
+
+        return min(self._queue, key=effective_priority)
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            in_flight = metrics.JOBS_IN_FLIGHT.labels(job.kind)
+            in_flight.inc()
+            try:
+                job.func(job, *job.args)
+                job.state = COMPLETED
+                metrics.JOBS_COMPLETED.labels(job.kind).inc()
+            except JobCancelled:
+                job.state = CANCELLED
+                print(f"[INFO] Job {job.job_id} ({job.kind}) cancelled")
+            except Exception as e:
+                job.state = FAILED
+                job.error = str(e)
+                metrics.JOBS_FAILED.labels(job.kind).inc()
+                print(f"[WARN] Job {job.job_id} ({job.kind}) failed: {e}")
+            finally:
+                in_flight.dec()
+                job.finished_at = time.time()
+                run_seconds = job.finished_at - job.started_at
+                with self._cond:
+                    self._running -= 1
+                    if self._avg_run_seconds is None:
+                        self._avg_run_seconds = run_seconds
+                    else:
+                        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+                    if job.state == COMPLETED and job.audio_seconds > 0:
+                        rtf = run_seconds / job.audio_seconds
+                        previous = self._rtf_by_kind.get(job.kind)
+                        self._rtf_by_kind[job.kind] = (
+                            rtf if previous is None else 0.8 * previous + 0.2 * rtf
+                        )
+                        previous = self._audio_by_kind.get(job.kind)
+                        self._audio_by_kind[job.kind] = (
+                            job.audio_seconds if previous is None
+                            else 0.8 * previous + 0.2 * job.audio_seconds
+                        )
+                    if job.state == COMPLETED and job.profiler is not None:
+                        self._learn_stage_shares(job)
+
+    def _learn_stage_shares(self, job: Job):
+        """Blend the stage shares of a completed job into its kind's estimate (caller holds the lock)."""
+        shares = _normalized({
+            name: record.get("wall_seconds", 0.0) for name, record in job.profiler.stages.items()
+        })
+        if not shares:
+            return
+        previous = self._stage_shares_by_kind.get(job.kind)
+        if previous is not None:
+            shares = {
+                name: 0.8 * previous.get(name, 0.0) + 0.2 * shares.get(name, 0.0)
+                for name in set(previous) | set(shares)
+            }
+        self._stage_shares_by_kind[job.kind] = shares
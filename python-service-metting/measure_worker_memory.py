@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory report for the API server processes
+
+Reads /proc/<pid>/smaps_rollup (Linux) for a server process and its
+children and reports, per process:
+  - RSS: resident memory, counting shared pages in full
+  - USS: unique memory (private pages), what the process would free on exit
+  - PSS: shared pages divided among the processes sharing them
+  - Shared: resident pages also mapped by another process
+
+With serve_prefork.py the model weights should show up as Shared and the
+USS of each worker should stay well below its RSS; with
+`uvicorn --workers N` every worker has its own copy in USS.
+
+Usage:
+    python measure_worker_memory.py <server pid>
+    python measure_worker_memory.py <pid> <pid> ... --json memory.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "uss_mb",
+    "Private_Dirty": "uss_mb",
+}
+
+
+def read_memory(pid: int) -> Dict[str, float]:
+    """Memory totals of one process in MB."""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0, "shared_mb": 0.0, "uss_mb": 0.0}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(":")
+            if key in FIELDS and len(parts) >= 2:
+                totals[FIELDS[key]] += int(parts[1]) / 1024
+    return {k: round(v, 1) for k, v in totals.items()}
+
+
+def children_of(pid: int) -> List[int]:
+    """Direct children of a process."""
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/children", "r") as f:
+                children.extend(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return sorted(set(children))
+
+
+def command_line(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+    except OSError:
+        return "?"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report RSS / USS / PSS of server workers")
+    parser.add_argument("pids", nargs="+", type=int, help="Server process id(s); children are included")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("[ERROR] /proc/<pid>/smaps_rollup is not available (Linux 4.14+ required)")
+        sys.exit(1)
+
+    pids = []
+    for pid in args.pids:
+        pids.append(pid)
+        pids.extend(children_of(pid))
+
+    report = []
+    for pid in dict.fromkeys(pids):
+        try:
+            memory = read_memory(pid)
+        except OSError as e:
+            print(f"[WARN] Cannot read process {pid}: {e}")
+            continue
+        report.append({"pid": pid, "command": command_line(pid), **memory})
+
+    print("\n" + "=" * 70)
+    print("WORKER MEMORY")
+    print("=" * 70)
+    print(f"{'pid':>8} {'RSS MB':>9} {'USS MB':>9} {'PSS MB':>9} {'Shared MB':>10}  command")
+    for row in report:
+        print(f"{row['pid']:>8} {row['rss_mb']:>9.0f} {row['uss_mb']:>9.0f} "
+              f"{row['pss_mb']:>9.0f} {row['shared_mb']:>10.0f}  {row['command'][:40]}")
+    total_rss = sum(r["rss_mb"] for r in report)
+    total_pss = sum(r["pss_mb"] for r in report)
+    print(f"\nSum of RSS: {total_rss:.0f} MB (counts shared pages once per process)")
+    print(f"Sum of PSS: {total_pss:.0f} MB (actual memory used by these processes)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"processes": report, "total_rss_mb": total_rss, "total_pss_mb": total_pss}, f, indent=2)
+        print(f"\n[OK] Report saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
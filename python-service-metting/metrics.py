@@ -0,0 +1,572 @@
+"""
+Metrics Module
+
+Minimal Prometheus-style metrics (text exposition format 0.0.4) for the API.
+Supports:
+  - Counters, gauges and histograms with labels
+  - Pre-bound label children (no allocation per observation)
+  - Multi-process mode for several uvicorn workers: each process writes its
+    samples to a file-backed mmap in PROMETHEUS_MULTIPROC_DIR and /metrics
+    aggregates every file in that directory
+
+Usage:
+    from metrics import JOBS_QUEUED
+    JOBS_QUEUED.labels("process").inc()
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+_INITIAL_MMAP_SIZE = 1024 * 1024
+_HEADER = struct.Struct("<I4x")
+_KEY_LEN = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+DEFAULT_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, float("inf"))
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, float("inf"))
+
+
+class _MemoryStore:
+    """Per-process sample store backed by a plain dict."""
+
+    def __init__(self):
+        self._values: Dict[str, float] = {}
+        self.lock = threading.RLock()
+
+    def slot(self, key: str) -> str:
+        self._values.setdefault(key, 0.0)
+        return key
+
+    def read(self, slot: str) -> float:
+        return self._values[slot]
+
+    def write(self, slot: str, value: float):
+        self._values[slot] = value
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        return [(key, value, os.getpid()) for key, value in self._values.items()]
+
+
+class _MmapStore:
+    """
+    Per-process sample store backed by a file-backed mmap.
+
+    File layout: header (used bytes) followed by entries of
+    [key length][utf-8 key padded to 8 bytes][float64 value].
+    Slots are byte offsets of the value, so writes never re-encode keys.
+
+    One re-entrant lock guards appending (which may remap the file),
+    re-opening after a fork, reads and writes, so no access ever sees a
+    closed mmap.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.RLock()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self.pid = os.getpid()
+        self.path = os.path.join(self.directory, f"metrics_{self.pid}.db")
+        self._file = open(self.path, "a+b")
+        if os.path.getsize(self.path) == 0:
+            self._file.truncate(_INITIAL_MMAP_SIZE)
+        self._capacity = os.path.getsize(self.path)
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        self._offsets = {key: offset for key, _, offset in _read_entries(self._mmap)}
+
+    def _check_fork(self):
+        # A forked child must not write into its parent's file
+        if os.getpid() != self.pid:
+            self._open()
+
+    def slot(self, key: str) -> Tuple[str, int]:
+        with self.lock:
+            self._check_fork()
+            self._append(key)
+            return key, self.pid
+
+    def _append(self, key: str):
+        if key not in self._offsets:
+            encoded = key.encode("utf-8")
+            padded = len(encoded) + (-(_KEY_LEN.size + len(encoded)) % 8)
+            entry_size = _KEY_LEN.size + padded + _VALUE.size
+            while self._used + entry_size > self._capacity:
+                self._capacity *= 2
+                self._mmap.close()
+                self._file.truncate(self._capacity)
+                self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+            _KEY_LEN.pack_into(self._mmap, self._used, len(encoded))
+            self._mmap[self._used + _KEY_LEN.size:self._used + _KEY_LEN.size + len(encoded)] = encoded
+            offset = self._used + _KEY_LEN.size + padded
+            _VALUE.pack_into(self._mmap, offset, 0.0)
+            self._used += entry_size
+            _HEADER.pack_into(self._mmap, 0, self._used)
+            self._offsets[key] = offset
+
+    def _offset(self, slot: Tuple[str, int]) -> int:
+        self._check_fork()
+        key, pid = slot
+        if pid != self.pid:
+            self.slot(key)
+        return self._offsets[key]
+
+    def read(self, slot: Tuple[str, int]) -> float:
+        with self.lock:
+            # Resolve the offset first: it may re-open the mmap after a fork
+            offset = self._offset(slot)
+            return _VALUE.unpack_from(self._mmap, offset)[0]
+
+    def write(self, slot: Tuple[str, int], value: float):
+        with self.lock:
+            offset = self._offset(slot)
+            _VALUE.pack_into(self._mmap, offset, value)
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        """Read samples from every process file in the directory."""
+        samples = []
+        for fname in os.listdir(self.directory):
+            if not (fname.startswith("metrics_") and fname.endswith(".db")):
+                continue
+            pid = int(fname[len("metrics_"):-len(".db")])
+            try:
+                with open(os.path.join(self.directory, fname), "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            for key, value, _ in _read_entries(data):
+                samples.append((key, value, pid))
+        return samples
+
+
+def _read_entries(data) -> List[Tuple[str, float, int]]:
+    """Parse (key, value, value_offset) entries from an mmap file image."""
+    entries = []
+    if len(data) < _HEADER.size:
+        return entries
+    used = _HEADER.unpack_from(data, 0)[0]
+    pos = _HEADER.size
+    while pos < used:
+        key_len = _KEY_LEN.unpack_from(data, pos)[0]
+        key = bytes(data[pos + _KEY_LEN.size:pos + _KEY_LEN.size + key_len]).decode("utf-8")
+        padded = key_len + (-(_KEY_LEN.size + key_len) % 8)
+        offset = pos + _KEY_LEN.size + padded
+        entries.append((key, _VALUE.unpack_from(data, offset)[0], offset))
+        pos = offset + _VALUE.size
+    return entries
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base class for labelled metrics."""
+
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues: str):
+        """Get (creating once) the child for the given label values."""
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._make_child(key)
+                    self._children[key] = child
+        return child
+
+    def _key(self, suffix: str, labelvalues: Sequence[str], extra: str = "") -> str:
+        return f"{self.name}{suffix}\t{chr(31).join(labelvalues)}\t{extra}"
+
+    def _make_child(self, labelvalues: Tuple[str, ...]):
+        raise NotImplementedError
+
+
+class _ValueChild:
+    """Single float sample (counter or gauge child)."""
+
+    def __init__(self, metric: _Metric, labelvalues: Tuple[str, ...]):
+        self._store = metric.registry.store
+        self._lock = metric.registry.write_lock
+        self._slot = self._store.slot(metric._key("", labelvalues))
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._store.write(self._slot, self._store.read(self._slot) + amount)
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self._store.write(self._slot, float(value))
+
+    def get(self) -> float:
+        return self._store.read(self._slot)
+
+
+class Counter(_Metric):
+    """Monotonic counter (summed across processes)."""
+
+    kind = "counter"
+
+    def _make_child(self, labelvalues):
+        return _ValueChild(self, labelvalues)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    Gauge. In multi-process mode values are combined with `mode`:
+    "livesum" (sum over live processes) or "max".
+    """
+
+    kind = "gauge"
+
+    def __init__(self, *args, mode: str = "livesum", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mode = mode
+
+    def _make_child(self, labelvalues):
+        return _ValueChild(self, labelvalues)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+
+class _HistogramChild:
+    """Histogram child holding one slot per bucket plus sum and count."""
+
+    def __init__(self, metric: "Histogram", labelvalues: Tuple[str, ...]):
+        self._store = metric.registry.store
+        self._lock = metric.registry.write_lock
+        self._upper_bounds = metric.buckets
+        self._bucket_slots = [
+            self._store.slot(metric._key("_bucket", labelvalues, _format_value(bound)))
+            for bound in metric.buckets
+        ]
+        self._sum_slot = self._store.slot(metric._key("_sum", labelvalues))
+        self._count_slot = self._store.slot(metric._key("_count", labelvalues))
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        slot = self._bucket_slots[min(index, len(self._bucket_slots) - 1)]
+        with self._lock:
+            self._store.write(slot, self._store.read(slot) + 1)
+            self._store.write(self._sum_slot, self._store.read(self._sum_slot) + value)
+            self._store.write(self._count_slot, self._store.read(self._count_slot) + 1)
+
+
+class Histogram(_Metric):
+    """Histogram with fixed buckets (summed across processes)."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        buckets = sorted(float(b) for b in buckets)
+        if buckets[-1] != float("inf"):
+            buckets.append(float("inf"))
+        self.buckets = tuple(buckets)
+
+    def _make_child(self, labelvalues):
+        return _HistogramChild(self, labelvalues)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """Holds metric definitions and renders the exposition text."""
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        """
+        Initialize registry.
+
+        Args:
+            multiprocess_dir: Directory for per-process mmap files (in-memory if None)
+        """
+        self.multiprocess_dir = multiprocess_dir
+        self.store = _MmapStore(multiprocess_dir) if multiprocess_dir else _MemoryStore()
+        # The store's lock: read-modify-write updates and remaps never interleave
+        self.write_lock = self.store.lock
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._derived: List[Callable[[Dict[str, Dict[Tuple[str, ...], float]]], List[str]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              mode: str = "livesum") -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, mode=mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets=buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback run before each render (e.g. to refresh gauges)."""
+        self._collectors.append(collector)
+
+    def add_derived(self, renderer: Callable[[Dict], List[str]]):
+        """Register a renderer producing extra lines from aggregated samples."""
+        self._derived.append(renderer)
+
+    def _aggregate(self) -> Dict[str, Dict[Tuple[str, str], float]]:
+        """Combine samples of all processes: {sample_name: {(labels, extra): value}}."""
+        combined: Dict[str, Dict[Tuple[str, str], float]] = {}
+        gauge_modes = {
+            name: metric.mode for name, metric in self._metrics.items() if isinstance(metric, Gauge)
+        }
+        alive: Dict[int, bool] = {}
+        for key, value, pid in self.store.items():
+            sample_name, labels, extra = key.split("\t")
+            mode = gauge_modes.get(sample_name)
+            if mode == "livesum":
+                if pid not in alive:
+                    alive[pid] = _pid_alive(pid)
+                if not alive[pid]:
+                    continue
+            bucket = combined.setdefault(sample_name, {})
+            label_key = (labels, extra)
+            if mode == "max":
+                bucket[label_key] = max(bucket.get(label_key, value), value)
+            else:
+                bucket[label_key] = bucket.get(label_key, 0.0) + value
+        return combined
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[WARN] Metrics collector failed: {e}")
+
+        combined = self._aggregate()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                self._render_histogram(metric, combined, lines)
+                continue
+            for (labels, _), value in sorted(combined.get(metric.name, {}).items()):
+                labelvalues = labels.split(chr(31)) if labels else []
+                lines.append(
+                    f"{metric.name}{_format_labels(metric.labelnames, labelvalues)} {_format_value(value)}"
+                )
+        for renderer in self._derived:
+            lines.extend(renderer(combined))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(metric: Histogram, combined: Dict, lines: List[str]):
+        buckets = combined.get(f"{metric.name}_bucket", {})
+        series = sorted({labels for labels, _ in buckets})
+        for labels in series:
+            labelvalues = labels.split(chr(31)) if labels else []
+            cumulative = 0.0
+            for bound in metric.buckets:
+                cumulative += buckets.get((labels, _format_value(bound)), 0.0)
+                label_str = _format_labels(
+                    metric.labelnames + ("le",), list(labelvalues) + [_format_value(bound)]
+                )
+                lines.append(f"{metric.name}_bucket{label_str} {_format_value(cumulative)}")
+            label_str = _format_labels(metric.labelnames, labelvalues)
+            total = combined.get(f"{metric.name}_sum", {}).get((labels, ""), 0.0)
+            count = combined.get(f"{metric.name}_count", {}).get((labels, ""), 0.0)
+            lines.append(f"{metric.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{label_str} {_format_value(count)}")
+
+
+REGISTRY = MetricsRegistry(os.getenv("PROMETHEUS_MULTIPROC_DIR") or None)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "meeting_stage_duration_seconds", "Wall time per pipeline stage", ["stage"]
+)
+STAGE_RTF = REGISTRY.histogram(
+    "meeting_stage_real_time_factor", "Real-time factor per pipeline stage", ["stage"],
+    buckets=RTF_BUCKETS,
+)
+JOBS_QUEUED = REGISTRY.counter(
+    "meeting_jobs_queued_total", "Jobs accepted per endpoint", ["endpoint"]
+)
+JOBS_COMPLETED = REGISTRY.counter(
+    "meeting_jobs_completed_total", "Jobs completed per endpoint", ["endpoint"]
+)
+JOBS_FAILED = REGISTRY.counter(
+    "meeting_jobs_failed_total", "Jobs failed per endpoint", ["endpoint"]
+)
+JOBS_IN_FLIGHT = REGISTRY.gauge(
+    "meeting_jobs_in_flight", "Jobs currently running per endpoint", ["endpoint"]
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "meeting_queue_depth", "Jobs accepted but not yet started"
+)
+TIME_TO_FIRST_TRANSCRIPT = REGISTRY.histogram(
+    "meeting_time_to_first_transcript_seconds",
+    "Time from accepting a /process job to handing out its first transcript", ["mode"],
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, float("inf")),
+)
+QUALITY_SHEDDING = REGISTRY.gauge(
+    "meeting_quality_shedding", "1 while new low-priority jobs are downgraded", mode="max"
+)
+JOBS_DEGRADED = REGISTRY.counter(
+    "meeting_jobs_degraded_total", "Jobs run with a cheaper profile because of queue load", ["endpoint"]
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "meeting_queue_wait_seconds", "Time jobs spent queued per priority class", ["priority"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200),
+)
+CALLBACK_OUTBOX_PENDING = REGISTRY.gauge(
+    "meeting_callback_outbox_pending", "Callbacks waiting in the delivery outbox"
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "meeting_model_load_seconds", "Duration of the last load per model", ["model"], mode="max"
+)
+MODEL_WARMUP_SECONDS = REGISTRY.gauge(
+    "meeting_model_warmup_seconds", "Duration of the startup warmup inference per model", ["model"], mode="max"
+)
+SERVICE_READY = REGISTRY.gauge(
+    "meeting_service_ready", "Worker processes whose models are loaded and warmed up"
+)
+SPEAKER_DB_SIZE = REGISTRY.gauge(
+    "meeting_speaker_db_size", "Number of enrolled speakers", mode="max"
+)
+VAD_COMPRESSION = REGISTRY.histogram(
+    "meeting_vad_compression_ratio", "Original / speech-only duration when VAD compaction is on",
+    buckets=(1, 1.1, 1.25, 1.5, 2, 3, 5, 10),
+)
+EMBEDDING_CALLS = REGISTRY.counter(
+    "meeting_embedding_calls_total",
+    "Speaker embedding calls made or avoided by merging/gating short segments",
+    ["result"],
+)
+MODEL_CACHE_BYTES = REGISTRY.gauge(
+    "meeting_model_cache_bytes", "Parameter bytes of the models held by the model cache"
+)
+MODEL_EVICTIONS = REGISTRY.counter(
+    "meeting_model_evictions_total", "Idle models evicted to stay within the memory budget"
+)
+REPLICA_WAIT_SECONDS = REGISTRY.histogram(
+    "meeting_replica_wait_seconds", "Time spent waiting to check out a model replica", ["pool"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600),
+)
+REPLICAS_IN_USE = REGISTRY.gauge(
+    "meeting_replicas_in_use", "Model replicas currently checked out", ["pool"]
+)
+THREAD_BUDGET_WAIT_SECONDS = REGISTRY.histogram(
+    "meeting_thread_budget_wait_seconds", "Time a stage waited for CPU threads to be free", ["stage"],
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600),
+)
+THREADS_RESERVED = REGISTRY.gauge(
+    "meeting_threads_reserved", "CPU threads reserved by running model stages"
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "meeting_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+
+def _render_cache_hit_ratio(combined: Dict) -> List[str]:
+    requests_by_cache: Dict[str, Dict[str, float]] = {}
+    for (labels, _), value in combined.get(CACHE_REQUESTS.name, {}).items():
+        cache, result = labels.split(chr(31))
+        requests_by_cache.setdefault(cache, {})[result] = value
+    lines = [
+        "# HELP meeting_cache_hit_ratio Hits / lookups per cache",
+        "# TYPE meeting_cache_hit_ratio gauge",
+    ]
+    for cache, counts in sorted(requests_by_cache.items()):
+        total = counts.get("hit", 0.0) + counts.get("miss", 0.0)
+        if total:
+            lines.append(
+                f'meeting_cache_hit_ratio{{cache="{cache}"}} {_format_value(counts.get("hit", 0.0) / total)}'
+            )
+    return lines
+
+
+REGISTRY.add_derived(_render_cache_hit_ratio)
+
+
+def observe_pipeline(summary: Dict):
+    """
+    Record stage latency and real-time factor from a StageProfiler summary.
+
+    Args:
+        summary: Output of StageProfiler.summary()
+    """
+    for stage, record in summary.get("stages", {}).items():
+        STAGE_SECONDS.labels(stage).observe(record["wall_seconds"])
+        if record.get("real_time_factor") is not None:
+            STAGE_RTF.labels(stage).observe(record["real_time_factor"])
+    identify = summary.get("stages", {}).get("identify", {})
+    if "embedding_calls" in identify:
+        EMBEDDING_CALLS.labels("computed").inc(identify["embedding_calls"])
+        EMBEDDING_CALLS.labels("avoided").inc(identify["embedding_calls_avoided"])
+    vad = summary.get("stages", {}).get("vad", {})
+    if vad.get("compression_ratio") is not None:
+        VAD_COMPRESSION.observe(vad["compression_ratio"])
@@ -1,54 +1,151 @@
 """
 Model Cache Manager
 
-Handles caching of pre-trained models to avoid reloading them on each use.
-Supports saving/loading models from disk cache with optional memory cache.
+Process-wide registry of loaded models, so each model is loaded once and
+shared by every component (and thread) that needs it.
 
 Features:
-  - Persistent disk-based cache
-  - Memory cache for currently loaded models
-  - Auto-detection of model changes
-  - Thread-safe operations
+  - Locked get-or-load with single-flight loading: concurrent requests for
+    a model that is still loading wait for that one load
+  - Reference counting: models in use are never evicted
+  - Size accounting from parameter and buffer bytes
+  - Least-recently-used eviction of idle models above a memory budget
+  - metadata.json on disk recording what was loaded (source, load time,
+    size); model objects themselves are never pickled
+
+torch is only imported once a model is sized, so the cache commands stay
+light.
 """
 
-import os
-import pickle
-import hashlib
+from __future__ import annotations
+
 import json
-from pathlib import Path
-from typing import Any, Optional, Dict
-import torch
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional
+
+from metrics import CACHE_REQUESTS, MODEL_CACHE_BYTES, MODEL_EVICTIONS
+
+if TYPE_CHECKING:
+    import torch
+
+
+@dataclass
+class _Entry:
+    """A loaded model and its bookkeeping."""
+
+    model: Any
+    size_bytes: int
+    load_seconds: float
+    refs: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def iter_modules(model: Any, max_depth: int = 3) -> Iterator[torch.nn.Module]:
+    """
+    Yield the top-level torch modules inside a model object.
+
+    Wrapper objects (pyannote pipelines, SpeechBrain classifiers, WhisperX
+    pipelines) are searched up to max_depth attributes deep; each object is
+    visited once.
+
+    Args:
+        model: Model object
+        max_depth: How many attribute levels to search for modules
+    """
+    import torch
+    seen_objects = set()
+
+    def visit(obj: Any, depth: int) -> Iterator[torch.nn.Module]:
+        if id(obj) in seen_objects:
+            return
+        seen_objects.add(id(obj))
+        if isinstance(obj, torch.nn.Module):
+            yield obj
+            return
+        if depth <= 0:
+            return
+        if isinstance(obj, dict):
+            children = obj.values()
+        elif isinstance(obj, (list, tuple)):
+            children = obj  # e.g. (align model, metadata)
+        else:
+            children = getattr(obj, "__dict__", {}).values()
+        for child in list(children):
+            if isinstance(child, (str, bytes, int, float, bool)) or child is None:
+                continue
+            yield from visit(child, depth - 1)
+
+    return visit(model, max_depth)
+
+
+def model_size_bytes(model: Any, max_depth: int = 3) -> int:
+    """
+    Estimate the memory held by a model from its parameters and buffers.
+
+    Shared tensors are counted once. Models whose weights are not torch
+    tensors (CTranslate2 Whisper) declare their size in a `resident_bytes`
+    attribute, which is used instead.
+
+    Args:
+        model: Model object
+        max_depth: How many attribute levels to search for modules
+
+    Returns:
+        Size in bytes (0 if no torch module was found)
+    """
+    declared = getattr(model, "resident_bytes", None)
+    if declared is not None:
+        return int(declared)
+    seen_tensors = set()
+    total = 0
+    for module in iter_modules(model, max_depth):
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            key = (tensor.device, tensor.data_ptr())
+            if key in seen_tensors:
+                continue
+            seen_tensors.add(key)
+            total += tensor.numel() * tensor.element_size()
+    return total
 
 
 class ModelCache:
-    """Manages caching of machine learning models."""
-    
-    def __init__(self, cache_dir: str = "./model_cache"):
+    """Thread-safe, reference-counted registry of loaded models."""
+
+    def __init__(self,
+                 cache_dir: str = "./model_cache",
+                 memory_budget_mb: Optional[float] = None):
         """
         Initialize model cache.
-        
+
         Args:
-            cache_dir: Directory to store cached models
+            cache_dir: Directory for the metadata of loaded models
+            memory_budget_mb: Evict idle models above this size (None/0 = unlimited)
         """
         self.cache_dir = cache_dir
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
         Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Memory cache for currently loaded models
-        self._memory_cache: Dict[str, Any] = {}
-        self._metadata: Dict[str, Dict] = {}
-        
-        print(f"[INFO] Model cache initialized at: {self.cache_dir}")
-    
-    def _get_cache_path(self, model_name: str) -> str:
-        """Get cache file path for a model."""
-        safe_name = hashlib.md5(model_name.encode()).hexdigest()
-        return os.path.join(self.cache_dir, f"{safe_name}.pkl")
-    
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        # Loads in progress: waiters block on the event instead of loading again
+        self._loading: Dict[str, threading.Event] = {}
+        self._load_errors: Dict[str, BaseException] = {}
+        self._metadata: Dict[str, Dict] = self._load_metadata()
+
+        budget = f"{memory_budget_mb:.0f} MB" if memory_budget_mb else "unlimited"
+        print(f"[INFO] Model cache initialized at: {self.cache_dir} (budget: {budget})")
+
     def _get_metadata_path(self) -> str:
         """Get path to metadata file."""
         return os.path.join(self.cache_dir, "metadata.json")
-    
+
     def _load_metadata(self) -> Dict:
         """Load metadata from disk."""
         metadata_path = self._get_metadata_path()
@@ -56,154 +153,310 @@ class ModelCache:
             try:
                 with open(metadata_path, 'r') as f:
                     return json.load(f)
-            except:
+            except (OSError, ValueError):
                 return {}
         return {}
-    
+
     def _save_metadata(self):
-        """Save metadata to disk."""
+        """Save metadata to disk (caller holds the lock)."""
         metadata_path = self._get_metadata_path()
-        with open(metadata_path, 'w') as f:
-            json.dump(self._metadata, f, indent=2)
-    
-    def get(self, model_name: str, use_memory_only: bool = False) -> Optional[Any]:
+        tmp_path = metadata_path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._metadata, f, indent=2)
+            os.replace(tmp_path, metadata_path)
+        except OSError as e:
+            print(f"[WARN] Could not write model cache metadata: {e}")
+
+    def get_or_load(self,
+                    model_name: str,
+                    loader: Callable[[], Any],
+                    metadata: Dict = None) -> Any:
+        """
+        Return a loaded model, loading it (once) if needed.
+
+        The model is not marked as in use; prefer use() around inference so
+        the model cannot be evicted while it runs.
+
+        Args:
+            model_name: Unique identifier for the model (include device/precision)
+            loader: Function that loads the model
+            metadata: Optional metadata recorded on disk when the model is loaded
+
+        Returns:
+            Loaded model
+        """
+        return self._obtain(model_name, loader, metadata, acquire=False)
+
+    def acquire(self,
+                model_name: str,
+                loader: Callable[[], Any],
+                metadata: Dict = None) -> Any:
+        """
+        Like get_or_load, but also take a reference (pair with release()).
+
+        Args:
+            model_name: Unique identifier for the model
+            loader: Function that loads the model
+            metadata: Optional metadata recorded on disk when the model is loaded
+
+        Returns:
+            Loaded model
         """
-        Get model from cache (memory or disk).
-        
+        return self._obtain(model_name, loader, metadata, acquire=True)
+
+    def release(self, model_name: str):
+        """Drop a reference taken by acquire(); idle models become evictable."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.monotonic()
+            self._evict_over_budget()
+
+    @contextmanager
+    def use(self,
+            model_name: str,
+            loader: Callable[[], Any],
+            metadata: Dict = None) -> Iterator[Any]:
+        """
+        Context manager holding a reference to a model while it is used.
+
+        Args:
+            model_name: Unique identifier for the model
+            loader: Function that loads the model
+            metadata: Optional metadata recorded on disk when the model is loaded
+
+        Yields:
+            Loaded model
+        """
+        model = self.acquire(model_name, loader, metadata)
+        try:
+            yield model
+        finally:
+            self.release(model_name)
+
+    def _obtain(self,
+                model_name: str,
+                loader: Callable[[], Any],
+                metadata: Optional[Dict],
+                acquire: bool) -> Any:
+        while True:
+            with self._lock:
+                entry = self._entries.get(model_name)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    if acquire:
+                        entry.refs += 1
+                    CACHE_REQUESTS.labels("model", "hit").inc()
+                    return entry.model
+                loading = self._loading.get(model_name)
+                if loading is None:
+                    # This thread loads; others wait on the event
+                    loading = threading.Event()
+                    self._loading[model_name] = loading
+                    self._load_errors.pop(model_name, None)
+                    break
+            loading.wait()
+            with self._lock:
+                error = self._load_errors.get(model_name)
+                if error is not None and model_name not in self._entries:
+                    raise error
+
+        CACHE_REQUESTS.labels("model", "miss").inc()
+        print(f"[CACHE] Loading model '{model_name}'...")
+        load_start = time.perf_counter()
+        try:
+            model = loader()
+        except BaseException as e:
+            with self._lock:
+                self._load_errors[model_name] = e
+                self._loading.pop(model_name).set()
+            raise
+        load_seconds = time.perf_counter() - load_start
+        size_bytes = model_size_bytes(model)
+
+        with self._lock:
+            self._entries[model_name] = _Entry(
+                model=model,
+                size_bytes=size_bytes,
+                load_seconds=load_seconds,
+                refs=1 if acquire else 0,
+            )
+            self._metadata[model_name] = {
+                "loaded_at": datetime.now().isoformat(),
+                "load_seconds": round(load_seconds, 3),
+                "size_mb": round(size_bytes / (1024 * 1024), 1),
+                **(metadata or {})
+            }
+            self._save_metadata()
+            self._loading.pop(model_name).set()
+            self._evict_over_budget(keep=model_name)
+            MODEL_CACHE_BYTES.set(self._total_bytes())
+
+        print(f"[OK] Model '{model_name}' loaded in {load_seconds:.1f}s "
+              f"({size_bytes / (1024 * 1024):.0f} MB)")
+        return model
+
+    def _total_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _evict_over_budget(self, keep: Optional[str] = None):
+        """Evict idle models, least recently used first (caller holds the lock)."""
+        if self.memory_budget_bytes is None:
+            return
+        idle = sorted(
+            (entry.last_used, name)
+            for name, entry in self._entries.items()
+            if entry.refs == 0 and name != keep
+        )
+        for _, name in idle:
+            if self._total_bytes() <= self.memory_budget_bytes:
+                break
+            self._drop(name)
+            MODEL_EVICTIONS.inc()
+            print(f"[CACHE] Evicted idle model '{name}' (memory budget exceeded)")
+        if keep is not None and self._total_bytes() > self.memory_budget_bytes:
+            print(f"[WARN] Loaded models use {self._total_bytes() / (1024 * 1024):.0f} MB, "
+                  f"above the {self.memory_budget_bytes / (1024 * 1024):.0f} MB budget "
+                  f"(remaining models are in use)")
+        MODEL_CACHE_BYTES.set(self._total_bytes())
+
+    def _drop(self, model_name: str):
+        """Forget a loaded model (caller holds the lock)."""
+        del self._entries[model_name]
+        # Without torch loaded there is no CUDA cache to release
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def share_memory(self) -> int:
+        """
+        Move the tensors of every loaded CPU model into shared memory.
+
+        Used before forking workers: shared-memory pages stay shared even
+        if a process writes to them, so the weights exist once in RAM.
+
+        Returns:
+            Bytes of parameters and buffers now in shared memory
+        """
+        shared = 0
+        with self._lock:
+            for entry in self._entries.values():
+                for module in iter_modules(entry.model):
+                    if any(t.device.type != "cpu" for t in module.parameters()):
+                        continue
+                    module.share_memory()
+                    shared += model_size_bytes(module)
+        return shared
+
+    def get(self, model_name: str) -> Optional[Any]:
+        """
+        Get an already loaded model without loading it.
+
         Args:
             model_name: Unique identifier for the model
-            use_memory_only: If True, only check memory cache
-            
+
         Returns:
-            Cached model or None if not found
-        """
-        # Check memory cache first
-        if model_name in self._memory_cache:
-            print(f"[CACHE] Model '{model_name}' loaded from memory")
-            return self._memory_cache[model_name]
-
-        if use_memory_only:
-            return None
-
-        # Do NOT attempt to unpickle arbitrary objects from disk.
-        # Instead return stored metadata if present so callers can
-        # re-create the model safely using library loaders.
-        self._metadata = self._load_metadata()
-        if model_name in self._metadata:
-            print(f"[CACHE] Metadata for model '{model_name}' found on disk")
-            return self._metadata[model_name]
-
-        return None
-    
+            Loaded model or None
+        """
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                return None
+            entry.last_used = time.monotonic()
+            return entry.model
+
     def set(self, model_name: str, model: Any, metadata: Dict = None) -> bool:
         """
-        Save model to cache (both memory and disk).
-        
+        Register a model that was loaded elsewhere.
+
         Args:
             model_name: Unique identifier for the model
-            model: Model object to cache
+            model: Loaded model object
             metadata: Optional metadata about the model
-            
+
         Returns:
-            True if successful, False otherwise
+            True if successful
         """
-        try:
-            # Save to memory cache
-            self._memory_cache[model_name] = model
-
-            # Don't unconditionally pickle complex model objects to disk
-            # since unpickling across PyTorch versions can be unsafe.
-            # Instead store metadata that allows re-creating the model
-            # using the original library loaders (e.g. savedir, model id).
-            cache_path = self._get_cache_path(model_name)
-            print(f"[CACHE] Saving metadata for '{model_name}' to cache...")
-
-            # Update metadata
-            self._metadata = self._load_metadata()
+        size_bytes = model_size_bytes(model)
+        with self._lock:
+            previous = self._entries.get(model_name)
+            self._entries[model_name] = _Entry(
+                model=model,
+                size_bytes=size_bytes,
+                load_seconds=0.0,
+                refs=previous.refs if previous else 0,
+            )
             self._metadata[model_name] = {
-                "cached_at": datetime.now().isoformat(),
-                "cache_path": cache_path,
+                "loaded_at": datetime.now().isoformat(),
+                "size_mb": round(size_bytes / (1024 * 1024), 1),
                 **(metadata or {})
             }
             self._save_metadata()
+            self._evict_over_budget(keep=model_name)
+        return True
 
-            # Try to pickle as best-effort but do not fail if it doesn't work
-            try:
-                with open(cache_path, 'wb') as f:
-                    pickle.dump(model, f)
-                print(f"[OK] Model object for '{model_name}' also written to disk (pickle)")
-            except Exception:
-                print(f"[WARN] Skipped pickling model object for '{model_name}' (unsafe to unpickle across processes)")
-
-            print(f"[OK] Metadata for '{model_name}' cached successfully")
-            return True
-        except Exception as e:
-            print(f"[ERROR] Failed to cache metadata for '{model_name}': {e}")
-            return False
-    
     def clear(self, model_name: str = None) -> bool:
         """
-        Clear cached model(s).
-        
+        Unload idle model(s) and forget their metadata.
+
+        Models that are in use stay loaded.
+
         Args:
             model_name: Name of model to clear (all if None)
-            
+
         Returns:
-            True if successful
+            True if every requested model was cleared
         """
-        try:
-            if model_name is None:
-                # Clear all
-                self._memory_cache.clear()
-                import shutil
-                shutil.rmtree(self.cache_dir)
-                Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
-                self._metadata.clear()
-                print(f"[OK] All cached models cleared")
-            else:
-                # Clear specific model
-                if model_name in self._memory_cache:
-                    del self._memory_cache[model_name]
-                
-                cache_path = self._get_cache_path(model_name)
-                if os.path.exists(cache_path):
-                    os.remove(cache_path)
-                
-                if model_name in self._metadata:
-                    del self._metadata[model_name]
-                
-                self._save_metadata()
-                print(f"[OK] Model '{model_name}' cache cleared")
-            
-            return True
-        except Exception as e:
-            print(f"[ERROR] Failed to clear cache: {e}")
-            return False
-    
+        with self._lock:
+            names = list(self._metadata) + list(self._entries) if model_name is None else [model_name]
+            cleared = True
+            for name in dict.fromkeys(names):
+                entry = self._entries.get(name)
+                if entry is not None and entry.refs > 0:
+                    print(f"[WARN] Model '{name}' is in use; not cleared")
+                    cleared = False
+                    continue
+                if entry is not None:
+                    self._drop(name)
+                self._metadata.pop(name, None)
+            self._save_metadata()
+            MODEL_CACHE_BYTES.set(self._total_bytes())
+        print(f"[OK] Model cache cleared: {model_name or 'all'}")
+        return cleared
+
     def info(self) -> Dict:
         """
         Get cache information.
-        
+
         Returns:
             Dictionary with cache stats
         """
-        memory_cached = len(self._memory_cache)
-        disk_cached = len(self._metadata)
-        
-        cache_size = 0
-        for root, dirs, files in os.walk(self.cache_dir):
-            for file in files:
-                if file.endswith('.pkl'):
-                    cache_size += os.path.getsize(os.path.join(root, file))
-        
+        with self._lock:
+            loaded = {
+                name: {
+                    "size_mb": round(entry.size_bytes / (1024 * 1024), 1),
+                    "refs": entry.refs,
+                    "load_seconds": round(entry.load_seconds, 3),
+                }
+                for name, entry in self._entries.items()
+            }
+            total_bytes = self._total_bytes()
+            known = list(self._metadata.keys())
+
         return {
             "cache_dir": self.cache_dir,
-            "memory_cached_models": memory_cached,
-            "disk_cached_models": disk_cached,
-            "cache_size_mb": cache_size / (1024 * 1024),
-            "cached_models": list(self._metadata.keys())
+            "memory_cached_models": len(loaded),
+            "memory_mb": total_bytes / (1024 * 1024),
+            "memory_budget_mb": (
+                self.memory_budget_bytes / (1024 * 1024) if self.memory_budget_bytes else None
+            ),
+            "loaded_models": loaded,
+            "cached_models": known
         }
-    
+
     def print_info(self):
         """Print cache information."""
         info = self.info()
@@ -211,29 +464,36 @@ class ModelCache:
         print("MODEL CACHE INFORMATION")
         print("=" * 70)
         print(f"Cache Directory: {info['cache_dir']}")
-        print(f"Memory Cached Models: {info['memory_cached_models']}")
-        print(f"Disk Cached Models: {info['disk_cached_models']}")
-        print(f"Cache Size: {info['cache_size_mb']:.2f} MB")
+        budget = info['memory_budget_mb']
+        print(f"Loaded Models: {info['memory_cached_models']} "
+              f"({info['memory_mb']:.0f} MB, budget: {f'{budget:.0f} MB' if budget else 'unlimited'})")
+        for name, entry in info['loaded_models'].items():
+            print(f"  - {name}: {entry['size_mb']:.0f} MB, {entry['refs']} in use")
         if info['cached_models']:
-            print(f"Cached Models: {', '.join(info['cached_models'])}")
+            print(f"Previously Loaded: {', '.join(info['cached_models'])}")
         print("=" * 70 + "\n")
 
 
 # Global model cache instance
 _global_cache: Optional[ModelCache] = None
+_global_cache_lock = threading.Lock()
 
 
 def get_model_cache(cache_dir: str = "./model_cache") -> ModelCache:
     """
     Get or create global model cache instance (singleton).
-    
+
+    The memory budget comes from MODEL_MEMORY_BUDGET_MB (unset/0 = unlimited).
+
     Args:
         cache_dir: Directory for model cache
-        
+
     Returns:
         ModelCache instance
     """
     global _global_cache
-    if _global_cache is None:
-        _global_cache = ModelCache(cache_dir=cache_dir)
-    return _global_cache
+    with _global_cache_lock:
+        if _global_cache is None:
+            budget = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+            _global_cache = ModelCache(cache_dir=cache_dir, memory_budget_mb=budget or None)
+        return _global_cache
@@ -0,0 +1,178 @@
+"""
+Model Replica Pool
+
+Concurrent jobs used to call one Transcriber / Diarizer / SpeakerRecognizer
+from several threads at once: unsafe for stateful models, and the calls
+contended for the same intra-op thread pool anyway. A ReplicaPool holds N
+independent instances of one subsystem (each with its own model copy in
+the model cache) and hands them out one job stage at a time:
+
+    with pool.checkout() as transcriber:
+        transcriber.transcribe_audio(...)
+
+Replicas are built on demand, up to the pool size. Every replica runs with
+the pool's per-replica thread count (CTranslate2 / ONNX Runtime per
+instance, torch once per process, see thread_budget.py); with a
+ThreadBudget a checkout first waits until that many cores are free, so
+replicas running in parallel share the cores instead of oversubscribing
+them.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple
+
+from metrics import REPLICA_WAIT_SECONDS, REPLICAS_IN_USE
+from thread_budget import ThreadBudget, process_thread_budget
+
+# Below this many threads per replica, more replicas stop paying off
+MIN_THREADS_PER_REPLICA = 2
+
+
+def size_replicas(concurrency: int,
+                  device: str,
+                  cores: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Pick the number of replicas per model and the threads of each.
+
+    MODEL_REPLICAS and REPLICA_THREADS override the sizing. By default
+    there is one replica per concurrent job, capped so every replica gets
+    MIN_THREADS_PER_REPLICA cores; on CUDA the default is one replica,
+    since every replica is another copy of the weights in GPU memory.
+
+    Args:
+        concurrency: Number of jobs that may run at once
+        device: "cuda" or "cpu"
+        cores: Available cores (the process thread budget if None)
+
+    Returns:
+        Tuple of (replicas, threads per replica)
+    """
+    cores = cores or process_thread_budget()
+    if os.getenv("MODEL_REPLICAS"):
+        replicas = max(1, int(os.getenv("MODEL_REPLICAS")))
+    elif device == "cuda":
+        replicas = 1
+    else:
+        replicas = max(1, min(concurrency, cores // MIN_THREADS_PER_REPLICA))
+    threads = int(os.getenv("REPLICA_THREADS", "0")) or max(1, cores // replicas)
+    return replicas, threads
+
+
+class ReplicaPool:
+    """Fixed-size pool of interchangeable model replicas with checkout/return."""
+
+    def __init__(self,
+                 name: str,
+                 factory: Callable[[int], Any],
+                 size: int = 1,
+                 threads: Optional[int] = None,
+                 budget: Optional[ThreadBudget] = None):
+        """
+        Initialize pool (no replica is built yet).
+
+        Args:
+            name: Pool name, used in logs and metrics
+            factory: Builds replica i (0-based)
+            size: Maximum number of replicas
+            threads: Threads each replica runs with (reserved per checkout)
+            budget: Shared thread budget a checkout reserves `threads` from
+                (None = no admission control)
+        """
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self.threads = threads
+        self.budget = budget
+
+        self._cond = threading.Condition()
+        self._replicas: List[Optional[Any]] = [None] * self.size
+        self._free: List[int] = []
+        # Slots whose replica is being built (built outside the lock)
+        self._building: Set[int] = set()
+
+    def primary(self) -> Any:
+        """
+        Replica 0 (built if needed), for calls that run no inference.
+
+        Not checked out: use checkout() around model inference.
+        """
+        with self._cond:
+            if self._replicas[0] is not None:
+                return self._replicas[0]
+        with self.checkout(0) as replica:
+            return replica
+
+    def replicas(self) -> List[Any]:
+        """Replicas built so far, in index order (builds nothing)."""
+        with self._cond:
+            return [replica for replica in self._replicas if replica is not None]
+
+    @contextmanager
+    def checkout(self, index: Optional[int] = None) -> Iterator[Any]:
+        """
+        Hold a replica for the duration of the block.
+
+        Waits for a free replica, building a new one while the pool is
+        below its size.
+
+        Args:
+            index: Hold this particular replica (built if needed)
+        """
+        wait_start = time.perf_counter()
+        index, replica = self._take(index)
+        REPLICA_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - wait_start)
+        REPLICAS_IN_USE.labels(self.name).inc()
+        # The replica is held while waiting for cores: the reservation is
+        # taken last and released first, so the two never deadlock
+        threads = (
+            self.budget.reserve(self.name, self.threads)
+            if self.budget is not None and self.threads else nullcontext()
+        )
+        try:
+            with threads:
+                yield replica
+        finally:
+            REPLICAS_IN_USE.labels(self.name).dec()
+            with self._cond:
+                self._free.append(index)
+                self._cond.notify_all()
+
+    def _take(self, index: Optional[int]) -> Tuple[int, Any]:
+        with self._cond:
+            while True:
+                if index is None:
+                    if self._free:
+                        taken = self._free.pop()
+                        return taken, self._replicas[taken]
+                    unbuilt = [
+                        i for i, replica in enumerate(self._replicas)
+                        if replica is None and i not in self._building
+                    ]
+                    if unbuilt:
+                        slot = unbuilt[0]
+                        break
+                else:
+                    if index in self._free:
+                        self._free.remove(index)
+                        return index, self._replicas[index]
+                    if self._replicas[index] is None and index not in self._building:
+                        slot = index
+                        break
+                self._cond.wait()
+            self._building.add(slot)
+
+        # Build outside the lock so other replicas stay available meanwhile
+        replica = None
+        try:
+            if slot:
+                print(f"[INFO] Building {self.name} replica {slot + 1}/{self.size}...")
+            replica = self.factory(slot)
+        finally:
+            with self._cond:
+                self._replicas[slot] = replica
+                self._building.discard(slot)
+                self._cond.notify_all()
+        return slot, replica
@@ -0,0 +1,263 @@
+"""
+Overlap Cache Module
+
+The backend cuts meetings into segments that overlap by AUDIO_SEGMENT_OVERLAP
+seconds, so without help every overlap is transcribed, diarized and embedded
+twice and appears twice in the merged transcript. This module keeps, per
+meeting, the delivered transcript entries near the edges of each processed
+segment (absolute times, text, identity and ECAPA embedding). When a
+neighbouring segment arrives it gets a plan:
+
+  - transcribe only the part of the segment not already covered by a
+    neighbour (cut at the edge of the last complete cached entry)
+  - reuse the cached entries of the overlap (for speaker anchors) instead of
+    re-embedding them; they are not delivered again
+
+Entries within `edge_margin` seconds of their own segment edge may contain
+words cut in half and are never reused, but they were delivered: the
+neighbour transcribes that stretch again for context, and store() drops its
+entries that reach into time a neighbour already delivered, so no range of
+the meeting is delivered twice.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class OverlapPlan:
+    """What part of a segment still needs processing (segment-relative seconds)."""
+
+    transcribe_from: float = 0.0
+    transcribe_to: Optional[float] = None  # None = until the end
+    # Cached entries of neighbours inside this segment (segment-relative times)
+    reused: List[Dict] = field(default_factory=list)
+
+    def skipped_seconds(self, duration: float) -> float:
+        end = duration if self.transcribe_to is None else self.transcribe_to
+        return max(0.0, duration - max(0.0, end - self.transcribe_from))
+
+
+class OverlapCache:
+    """Per-meeting store of segment edge results keyed by absolute time."""
+
+    def __init__(self,
+                 store_dir: str,
+                 keep_seconds: float = 60.0,
+                 edge_margin: float = 1.0,
+                 max_age_seconds: float = 2 * 24 * 3600):
+        """
+        Initialize cache.
+
+        Args:
+            store_dir: Directory holding one JSON store per meeting
+            keep_seconds: Entries this close to a segment edge are kept (>= overlap)
+            edge_margin: Entries this close to their own segment edge are not reused
+            max_age_seconds: Stores untouched for longer than this are deleted
+        """
+        self.store_dir = Path(store_dir)
+        self.keep_seconds = keep_seconds
+        self.edge_margin = edge_margin
+        self.max_age_seconds = max_age_seconds
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def plan(self,
+             meeting_id: str,
+             segment_index: int,
+             segment_start: float,
+             segment_end: float) -> OverlapPlan:
+        """
+        Plan processing of a segment from the cached results of its neighbours.
+
+        Args:
+            meeting_id: Meeting the segment belongs to
+            segment_index: Segment position in the meeting
+            segment_start: Segment start on the meeting timeline (seconds)
+            segment_end: Segment end on the meeting timeline (seconds)
+
+        Returns:
+            OverlapPlan (empty plan if no neighbour is cached)
+        """
+        with self._lock_for(meeting_id):
+            state = self._load(meeting_id)
+
+        head_cut = segment_start
+        tail_cut = segment_end
+        reused = []
+        for index, other in state["segments"].items():
+            if index == str(segment_index):
+                continue
+            if other["end"] <= segment_start or other["start"] >= segment_end:
+                continue
+            if other["start"] < segment_start:
+                # Earlier neighbour: its complete entries cover our head
+                usable = [
+                    e for e in other["entries"]
+                    if e["end"] <= other["end"] - self.edge_margin and e["end"] > segment_start
+                ]
+                if usable:
+                    head_cut = max(head_cut, max(e["end"] for e in usable))
+            else:
+                # Later neighbour (processed first): its entries cover our tail
+                usable = [
+                    e for e in other["entries"]
+                    if e["start"] >= other["start"] + self.edge_margin and e["start"] < segment_end
+                ]
+                if usable:
+                    tail_cut = min(tail_cut, min(e["start"] for e in usable))
+            reused.extend(usable)
+
+        if tail_cut <= head_cut:
+            # Fully covered by neighbours; nothing left to transcribe
+            tail_cut = head_cut
+
+        return OverlapPlan(
+            transcribe_from=head_cut - segment_start,
+            transcribe_to=None if tail_cut >= segment_end else tail_cut - segment_start,
+            reused=[
+                {**e, "start": e["start"] - segment_start, "end": e["end"] - segment_start}
+                for e in sorted(reused, key=lambda e: e["start"])
+            ],
+        )
+
+    def store(self,
+              meeting_id: str,
+              segment_index: int,
+              segment_start: float,
+              segment_end: float,
+              entries: List[Dict]) -> List[Dict]:
+        """
+        Claim the entries of a processed segment that are still to deliver.
+
+        Entries reaching into time a neighbour segment already delivered are
+        dropped; the rest near the segment edges are remembered. Both happen
+        under the meeting lock, so two neighbours finishing at once cannot
+        deliver the same stretch.
+
+        Args:
+            meeting_id: Meeting the segment belongs to
+            segment_index: Segment position in the meeting
+            segment_start: Segment start on the meeting timeline (seconds)
+            segment_end: Segment end on the meeting timeline (seconds)
+            entries: Fresh (non-reused) entries with segment-relative times
+
+        Returns:
+            The entries to deliver (same objects, in order)
+        """
+        with self._lock_for(meeting_id):
+            state = self._load(meeting_id)
+            delivered_to, delivered_from = self._delivered_edges(
+                state, segment_index, segment_start, segment_end
+            )
+
+            deliver = []
+            kept = []
+            for entry in entries:
+                start = segment_start + float(entry["start"])
+                end = segment_start + float(entry["end"])
+                if start < delivered_to or end > delivered_from:
+                    continue
+                deliver.append(entry)
+                if start > segment_start + self.keep_seconds and end < segment_end - self.keep_seconds:
+                    continue
+                embedding = entry.get("embedding")
+                kept.append({
+                    "text": entry["text"],
+                    "start": start,
+                    "end": end,
+                    "identified_speaker": entry.get("identified_speaker", "Unknown"),
+                    "confidence": float(entry.get("confidence", 0.0)),
+                    "embedding": None if embedding is None else [float(v) for v in embedding.reshape(-1)],
+                })
+
+            state["segments"][str(segment_index)] = {
+                "start": segment_start,
+                "end": segment_end,
+                "entries": kept,
+            }
+            self._save(meeting_id, state)
+
+        dropped = len(entries) - len(deliver)
+        if dropped:
+            print(f"[CACHE] Segment {segment_index}: dropped {dropped} entries a neighbour already delivered")
+        return deliver
+
+    def forget(self, meeting_id: str):
+        """Delete the store of a finished meeting."""
+        with self._lock_for(meeting_id):
+            try:
+                self._path(meeting_id).unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _delivered_edges(state: Dict,
+                         segment_index: int,
+                         segment_start: float,
+                         segment_end: float) -> Tuple[float, float]:
+        """
+        Where neighbours' delivered entries end at our head and start at our tail.
+
+        Returns:
+            (delivered_to, delivered_from) in absolute seconds; fresh entries
+            must start at or after the first and end at or before the second
+        """
+        delivered_to = float("-inf")
+        delivered_from = float("inf")
+        for index, other in state["segments"].items():
+            if index == str(segment_index):
+                continue
+            if other["end"] <= segment_start or other["start"] >= segment_end:
+                continue
+            if other["start"] < segment_start:
+                ends = [e["end"] for e in other["entries"] if e["end"] > segment_start]
+                if ends:
+                    delivered_to = max(delivered_to, max(ends))
+            else:
+                starts = [e["start"] for e in other["entries"] if e["start"] < segment_end]
+                if starts:
+                    delivered_from = min(delivered_from, min(starts))
+        return delivered_to, delivered_from
+
+    def _lock_for(self, meeting_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(meeting_id, threading.Lock())
+
+    def _path(self, meeting_id: str) -> Path:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in meeting_id)
+        return self.store_dir / f"{safe_id}.json"
+
+    def _load(self, meeting_id: str) -> Dict:
+        path = self._path(meeting_id)
+        if path.exists():
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Unreadable overlap cache {path.name}, starting over: {e}")
+        return {"meeting_id": meeting_id, "segments": {}}
+
+    def _save(self, meeting_id: str, state: Dict):
+        state["updated_at"] = time.time()
+        path = self._path(meeting_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        """Remove stores of meetings that have not been touched for a while."""
+        cutoff = time.time() - self.max_age_seconds
+        for path in self.store_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
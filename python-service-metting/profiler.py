@@ -0,0 +1,162 @@
+"""
+Stage Profiler Module
+
+Records per-stage timing and resource usage for the meeting pipeline.
+Each stage reports:
+  - Wall time (seconds)
+  - CPU time of the thread running the stage (seconds; excludes the
+    model's intra-op worker threads)
+  - Process CPU time (seconds, all threads of the process)
+  - Peak RSS delta (MB, growth of the process high-water mark)
+  - Audio seconds processed and real-time factor (wall / audio)
+
+Process CPU time and peak RSS are process-wide: while jobs run
+concurrently (scheduler workers, replica pools) they include the other
+jobs' usage. Summaries list these fields under "process_wide_fields".
+
+Milestones (e.g. "first_transcript") record when the pipeline reached a
+point, in seconds since the profiler was created.
+
+An optional listener (e.g. a scheduler Job) is told when each stage starts
+and how far the segment loop has progressed; it may raise from either hook
+to cancel the pipeline cooperatively.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Fields measured for the whole process, not per job
+PROCESS_WIDE_FIELDS = ("cpu_seconds", "peak_rss_delta_mb", "peak_rss_mb")
+
+
+def _peak_rss_mb() -> float:
+    """Return the process peak RSS in MB (0.0 if unavailable)."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class StageProfiler:
+    """Collects timing/resource probes for named pipeline stages."""
+
+    def __init__(self, audio_seconds: float = 0.0, listener=None):
+        """
+        Initialize profiler.
+
+        Args:
+            audio_seconds: Default audio duration used for real-time factor
+            listener: Object with on_stage(name) and on_progress(name, done, total)
+        """
+        self.audio_seconds = audio_seconds
+        self.listener = listener
+        self.current_stage: Optional[str] = None
+        self._current_record: Optional[Dict] = None
+        self.stages: Dict[str, Dict] = {}
+        self.milestones: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, audio_seconds: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Context manager wrapping a pipeline stage.
+
+        Args:
+            name: Stage name (e.g. "transcribe")
+            audio_seconds: Audio processed by this stage (defaults to profiler value)
+
+        Yields:
+            The mutable stage record, so callers can attach extra counters
+        """
+        self.current_stage = name
+        if self.listener is not None:
+            self.listener.on_stage(name)
+        record: Dict = {}
+        self._current_record = record
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        thread_cpu_start = time.thread_time()
+        rss_start = _peak_rss_mb()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            audio = self.audio_seconds if audio_seconds is None else audio_seconds
+            record.update({
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(time.process_time() - cpu_start, 4),
+                "thread_cpu_seconds": round(time.thread_time() - thread_cpu_start, 4),
+                "peak_rss_delta_mb": round(_peak_rss_mb() - rss_start, 2),
+                "audio_seconds": round(audio, 3),
+                "real_time_factor": round(wall / audio, 4) if audio > 0 else None,
+            })
+            self.stages[name] = record
+            self._current_record = None
+            print(f"[PROFILE] {name}: {record['wall_seconds']:.2f}s wall, "
+                  f"{record['cpu_seconds']:.2f}s cpu")
+
+    def progress(self, done: int, total: int):
+        """
+        Report loop progress inside the current stage.
+
+        Args:
+            done: Items processed so far
+            total: Total items in the loop
+        """
+        if self.listener is not None:
+            self.listener.on_progress(self.current_stage, done, total)
+
+    def annotate(self, **fields):
+        """
+        Attach extra counters to the record of the current stage.
+
+        Args:
+            **fields: Values stored next to the timing fields
+        """
+        if self._current_record is not None:
+            self._current_record.update(fields)
+
+    def mark(self, name: str):
+        """
+        Record a milestone at the current time (the first mark of a name wins).
+
+        Args:
+            name: Milestone name (e.g. "first_transcript")
+        """
+        self.milestones.setdefault(name, round(time.perf_counter() - self._started, 4))
+
+    def summary(self) -> Dict:
+        """
+        Get all stage records plus pipeline totals.
+
+        Returns:
+            Dictionary with "stages", "milestones", "total" and
+            "process_wide_fields" entries
+        """
+        wall = time.perf_counter() - self._started
+        return {
+            "stages": dict(self.stages),
+            "milestones": dict(self.milestones),
+            "total": {
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(time.process_time() - self._cpu_started, 4),
+                "peak_rss_mb": round(_peak_rss_mb(), 2),
+                "audio_seconds": round(self.audio_seconds, 3),
+                "real_time_factor": (
+                    round(wall / self.audio_seconds, 4) if self.audio_seconds > 0 else None
+                ),
+            },
+            "process_wide_fields": list(PROCESS_WIDE_FIELDS),
+        }
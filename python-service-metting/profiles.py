@@ -0,0 +1,115 @@
+"""
+Quality / Speed Profiles
+
+A profile picks how much work a request pays for:
+
+  - draft:    small Whisper model, no word alignment, one speaker
+              embedding per diarization cluster (live-meeting previews)
+  - balanced: medium Whisper model with alignment, per-segment identification
+  - accurate: large-v2 with alignment and per-segment identification
+              (the behaviour before profiles existed)
+
+Identification strategies:
+  - "segment": embed adjacent transcript entries of a speaker in groups of
+    EMBEDDING_TARGET_SECONDS and identify every group
+  - "cluster": embed a few seconds of each diarization cluster once and give
+    all of its entries that identity
+
+Requests choose a profile with the `profile` field; DEFAULT_PROFILE applies
+otherwise. Two-pass /process jobs send a first transcript made with
+TWO_PASS_DRAFT_PROFILE before the result of the requested profile.
+Only ACTIVE_PROFILES are accepted: their Whisper models are built into the
+model pool (and preloaded) next to each other, so switching profiles never
+loads a model mid-request.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Union
+
+IDENTIFICATION_STRATEGIES = ("segment", "cluster")
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Model sizes and optional stages for one quality level."""
+
+    name: str
+    whisper_model: str
+    # CTranslate2 compute types per device
+    cuda_compute_type: str = "float16"
+    cpu_compute_type: str = "int8"
+    batch_size: int = 16
+    align: bool = True
+    identification: str = "segment"
+
+    def __post_init__(self):
+        if self.identification not in IDENTIFICATION_STRATEGIES:
+            raise ValueError(f"Unknown identification strategy: {self.identification}")
+
+    def compute_type(self, device: str) -> str:
+        return self.cuda_compute_type if device == "cuda" else self.cpu_compute_type
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+# Ordered from cheapest to most accurate
+PROFILES: Dict[str, Profile] = {
+    profile.name: profile
+    for profile in (
+        Profile("draft", "small", cuda_compute_type="int8_float16", batch_size=32,
+                align=False, identification="cluster"),
+        Profile("balanced", "medium"),
+        Profile("accurate", "large-v2"),
+    )
+}
+
+DEFAULT_PROFILE = os.getenv("DEFAULT_PROFILE", "accurate").lower()
+DRAFT_PROFILE = os.getenv("TWO_PASS_DRAFT_PROFILE", "draft").lower()
+
+
+def active_profiles() -> List[str]:
+    """
+    Profiles this service accepts (ACTIVE_PROFILES, comma-separated).
+
+    Defaults to DEFAULT_PROFILE only, so no extra Whisper model is loaded
+    unless asked for. The default profile is always active.
+    """
+    names = [name.strip().lower() for name in os.getenv("ACTIVE_PROFILES", "").split(",") if name.strip()]
+    if DEFAULT_PROFILE not in names:
+        names.insert(0, DEFAULT_PROFILE)
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        raise ValueError(f"Unknown profiles in ACTIVE_PROFILES / DEFAULT_PROFILE: {', '.join(unknown)}")
+    return names
+
+
+def get_profile(profile: Union[str, Profile, None] = None) -> Profile:
+    """
+    Resolve a profile name (None = DEFAULT_PROFILE).
+
+    Raises:
+        ValueError: If the name is not a known profile
+    """
+    if isinstance(profile, Profile):
+        return profile
+    name = (profile or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile: {name} (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def profile_rank(profile: Union[str, Profile, None]) -> int:
+    """Position in PROFILES (0 = cheapest)."""
+    return list(PROFILES).index(get_profile(profile).name)
+
+
+def transcriber_key(profile: Profile, device: str) -> str:
+    """Profiles with the same Whisper model and compute type share transcriber replicas."""
+    return f"{profile.whisper_model}_{profile.compute_type(device)}"
+
+
+def describe(profile: Profile) -> str:
+    return (f"{profile.name} (whisper {profile.whisper_model}, "
+            f"{'aligned' if profile.align else 'no alignment'}, {profile.identification} identification)")
@@ -0,0 +1,95 @@
+"""
+Pyannote Speaker Recognition Module
+
+Speaker identification in the embedding space of the pyannote diarization
+pipeline (WeSpeaker ResNet34 for speaker-diarization-3.1).
+The diarization pipeline already computes one centroid embedding per
+speaker cluster; enrolling speakers with the same model lets those
+centroids be matched directly, so no second (ECAPA) model is loaded and
+no per-segment embedding inference runs.
+
+Enrolled embeddings live in their own database file, because vectors from
+different models cannot be compared.
+"""
+
+import numpy as np
+import torch
+import torchaudio
+from typing import Dict, List, Optional, Tuple
+from torch.nn import CosineSimilarity
+
+from model_pool import ReplicaPool
+from speaker_db import PYANNOTE_DB_NAME, SpeakerDatabase
+from speaker_recognition import SpeakerRecognizer
+
+
+class PyannoteSpeakerRecognizer(SpeakerRecognizer):
+    """Enrolls and identifies speakers with the diarization pipeline's embedding model."""
+
+    def __init__(self,
+                 diarizers: ReplicaPool,
+                 speaker_db: SpeakerDatabase = None,
+                 threshold: float = 0.5):
+        """
+        Initialize recognizer (no model is loaded; the diarizers' are reused).
+
+        Args:
+            diarizers: Diarizer replica pool whose pipelines provide the embedding
+                model; a replica is checked out for every embedding batch
+            speaker_db: SpeakerDatabase for pyannote-space embeddings
+            threshold: Cosine similarity threshold for cluster matches
+        """
+        self.diarizers = diarizers
+        self.device = diarizers.primary().device
+        self.model_source = "pyannote"
+        self.threshold = threshold
+        self.cosine_sim = CosineSimilarity(dim=-1)
+        self.db = speaker_db if speaker_db is not None else SpeakerDatabase(db_name=PYANNOTE_DB_NAME)
+
+        print(f"[OK] Pyannote speaker embeddings ready. Database has {len(self.db)} speakers")
+
+    def compute_embedding(self, audio_path: str) -> torch.Tensor:
+        """
+        Compute a pyannote speaker embedding for an audio file.
+
+        Args:
+            audio_path: Path to audio file
+
+        Returns:
+            Embedding tensor (shape: [embedding_dim])
+        """
+        signal, fs = torchaudio.load(audio_path)
+        if fs != 16000:
+            signal = torchaudio.transforms.Resample(fs, 16000)(signal)
+        return self.compute_embeddings_batch([signal.mean(dim=0)])[0]
+
+    def compute_embeddings_batch(self, waveforms: List[torch.Tensor]) -> torch.Tensor:
+        """
+        Compute pyannote embeddings for several 16kHz mono waveforms.
+
+        Args:
+            waveforms: List of tensors shaped [samples] or [1, samples]
+
+        Returns:
+            Embedding tensor (shape: [batch, embedding_dim])
+        """
+        with self.diarizers.checkout() as diarizer, torch.no_grad():
+            embeddings = diarizer.embed_waveforms(waveforms)
+        return torch.as_tensor(embeddings, dtype=torch.float32)
+
+    def identify_centroids(self, centroids: Dict[str, np.ndarray]) -> Dict[str, Tuple[str, float]]:
+        """
+        Match diarization cluster centroids against the enrolled speakers.
+
+        Args:
+            centroids: {diarization label: centroid} from Diarizer.diarize(return_embeddings=True)
+
+        Returns:
+            {diarization label: (speaker_name, similarity_score)}
+        """
+        labels = list(centroids)
+        embeddings: List[Optional[torch.Tensor]] = [
+            torch.as_tensor(centroids[label], dtype=torch.float32) for label in labels
+        ]
+        matches = self.identify_embeddings(embeddings, threshold=self.threshold)
+        return dict(zip(labels, matches))
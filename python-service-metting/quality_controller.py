@@ -0,0 +1,115 @@
+"""
+Quality Controller Module
+
+Load shedding for the job queue: when the projected wait of a new job
+exceeds an SLO, new low-priority jobs run with a cheaper profile instead
+of making the queue grow faster than it drains.
+Supports:
+  - Projected wait from the scheduler (queue depth x measured real-time factor)
+  - Downgrading jobs of selected priority classes to a cheaper profile
+    (by default "draft": Whisper small, no alignment, cluster identification)
+  - Hysteresis: full quality is restored once the projected wait falls
+    below a fraction of the SLO, so the mode does not flap
+  - A decision record per job (requested / applied profile, projected wait)
+    for the result metadata
+
+Only jobs submitted while shedding are downgraded; queued and running jobs
+keep the profile they were accepted with.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional
+
+import metrics
+from profiles import active_profiles, get_profile, profile_rank
+
+
+class QualityController:
+    """Chooses the profile of new jobs from the projected queue wait."""
+
+    def __init__(self,
+                 scheduler,
+                 slo_seconds: float = 0.0,
+                 degraded_profile: str = "draft",
+                 priorities: Iterable[str] = ("bulk",),
+                 restore_fraction: float = 0.5):
+        """
+        Initialize controller.
+
+        Args:
+            scheduler: JobScheduler whose projected wait is watched
+            slo_seconds: Projected wait that starts shedding (0 = never shed)
+            degraded_profile: Profile given to downgraded jobs
+            priorities: Priority classes that may be downgraded
+            restore_fraction: Full quality returns below slo_seconds x this
+        """
+        self.scheduler = scheduler
+        self.slo_seconds = max(0.0, slo_seconds)
+        self.degraded_profile = get_profile(degraded_profile)
+        self.priorities = set(priorities)
+        self.restore_fraction = min(max(restore_fraction, 0.0), 1.0)
+        self.shedding = False
+        self._lock = threading.Lock()
+
+        self.enabled = self.slo_seconds > 0
+        if self.enabled and self.degraded_profile.name not in active_profiles():
+            print(f"[WARN] Quality shedding disabled: profile '{self.degraded_profile.name}' "
+                  f"is not in ACTIVE_PROFILES")
+            self.enabled = False
+        if self.enabled:
+            print(f"[INFO] Quality shedding: {', '.join(sorted(self.priorities))} jobs run as "
+                  f"'{self.degraded_profile.name}' while the projected wait exceeds {self.slo_seconds:.0f}s")
+        metrics.QUALITY_SHEDDING.set(0)
+
+    def decide(self, priority: str, profile: Optional[str] = None) -> Dict:
+        """
+        Choose the profile of a job being submitted.
+
+        Args:
+            priority: Priority class of the job
+            profile: Profile requested by the client (None = DEFAULT_PROFILE)
+
+        Returns:
+            Decision with requested_profile, applied_profile, degraded,
+            projected_wait_seconds and slo_seconds
+        """
+        requested = get_profile(profile)
+        wait = self.scheduler.projected_wait() if self.enabled else None
+        shedding = self._update(wait)
+        degraded = (
+            shedding
+            and priority in self.priorities
+            and profile_rank(requested) > profile_rank(self.degraded_profile)
+        )
+        return {
+            "requested_profile": requested.name,
+            "applied_profile": self.degraded_profile.name if degraded else requested.name,
+            "degraded": degraded,
+            "projected_wait_seconds": wait,
+            "slo_seconds": self.slo_seconds if self.enabled else None,
+        }
+
+    def _update(self, wait: Optional[float]) -> bool:
+        """Enter or leave shedding mode for a new projected wait."""
+        with self._lock:
+            if wait is None:
+                return self.shedding
+            if not self.shedding and wait > self.slo_seconds:
+                self.shedding = True
+                print(f"[WARN] Projected queue wait {wait:.0f}s exceeds the {self.slo_seconds:.0f}s SLO; "
+                      f"new {', '.join(sorted(self.priorities))} jobs run as '{self.degraded_profile.name}'")
+            elif self.shedding and wait < self.slo_seconds * self.restore_fraction:
+                self.shedding = False
+                print(f"[INFO] Projected queue wait down to {wait:.0f}s; restoring full quality")
+            metrics.QUALITY_SHEDDING.set(1 if self.shedding else 0)
+            return self.shedding
+
+    def stats(self) -> Dict:
+        """Get controller state."""
+        return {
+            "enabled": self.enabled,
+            "shedding": self.shedding,
+            "slo_seconds": self.slo_seconds,
+            "degraded_profile": self.degraded_profile.name,
+            "priorities": sorted(self.priorities),
+        }
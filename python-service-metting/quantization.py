@@ -0,0 +1,231 @@
+"""
+Dynamic int8 Quantization
+
+Opt-in int8 weights for the CPU speaker and diarization models
+(MODEL_QUANTIZATION=int8). WhisperX already runs int8 on CPU through
+CTranslate2; the ECAPA encoder and pyannote's segmentation and embedding
+models otherwise run in fp32.
+
+Dynamic quantization stores the weights of eligible layers as int8 and
+quantizes activations on the fly, so no calibration data is needed:
+  - nn.Linear, nn.LSTM and nn.GRU are converted by torch's quantize_dynamic
+  - pointwise nn.Conv1d layers (kernel 1: most of ECAPA-TDNN's weights) are
+    first rewritten as the equivalent nn.Linear, since torch has no dynamic
+    quantized convolution
+  - every other layer stays fp32
+
+The converted layers are saved under <model cache>/quantized/ together
+with a fingerprint of the fp32 model; later startups swap them in instead
+of converting again. The files are pickled modules written by this
+service, so only keep them in a directory the service owns.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import torch
+from torch import nn
+
+QUANTIZATION_MODES = ("none", "int8")
+DYNAMIC_LAYERS = {nn.Linear, nn.LSTM, nn.GRU}
+# Bump when the conversion changes, so cached layers are rebuilt
+QUANTIZED_FORMAT = 2
+
+
+class PointwiseConv1d(nn.Module):
+    """nn.Conv1d with kernel size 1, computed as an nn.Linear over channels."""
+
+    def __init__(self, conv: nn.Conv1d):
+        super().__init__()
+        self.linear = nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+        with torch.no_grad():
+            self.linear.weight.copy_(conv.weight[:, :, 0])
+            if conv.bias is not None:
+                self.linear.bias.copy_(conv.bias)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        # [batch, channels, time] -> [batch, time, channels] and back
+        return self.linear(x.transpose(1, 2)).transpose(1, 2)
+
+
+def _is_pointwise(module: nn.Module) -> bool:
+    return (
+        type(module) is nn.Conv1d
+        and module.kernel_size == (1,)
+        and module.stride == (1,)
+        and module.groups == 1
+        and module.padding in ((0,), "valid", "same")
+    )
+
+
+def _rewrite_pointwise_convs(module: nn.Module) -> int:
+    """Replace pointwise Conv1d children (recursively) in place; returns the count."""
+    rewritten = 0
+    for name, child in module.named_children():
+        if _is_pointwise(child):
+            setattr(module, name, PointwiseConv1d(child))
+            rewritten += 1
+        else:
+            rewritten += _rewrite_pointwise_convs(child)
+    return rewritten
+
+
+def _quantized_layers(module: nn.Module) -> Dict[str, nn.Module]:
+    """Outermost converted layers of a quantized module, by qualified name."""
+    from torch.ao.nn.quantized import dynamic as qdynamic
+
+    layers = {}
+    for name, child in module.named_modules():
+        if any(name.startswith(prefix + ".") for prefix in layers):
+            continue
+        if isinstance(child, (PointwiseConv1d, qdynamic.Linear, qdynamic.LSTM, qdynamic.GRU)):
+            layers[name] = child
+    return layers
+
+
+def _select_engine():
+    """Pick a quantized kernel backend this CPU supports (x86 / fbgemm / qnnpack)."""
+    supported = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine in supported and torch.backends.quantized.engine != "none":
+        return
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return
+
+
+def quantize_module(module: nn.Module) -> Dict[str, nn.Module]:
+    """
+    Convert the eligible layers of a CPU module to dynamic int8, in place.
+
+    Args:
+        module: fp32 module
+
+    Returns:
+        {qualified name: converted layer} of the layers that were replaced
+    """
+    _select_engine()
+    _rewrite_pointwise_convs(module)
+    torch.ao.quantization.quantize_dynamic(module, DYNAMIC_LAYERS, dtype=torch.qint8, inplace=True)
+    return _quantized_layers(module)
+
+
+def fingerprint(module: nn.Module, source: str) -> str:
+    """
+    Identify an fp32 model by source, weights, torch version and kernel backend.
+
+    The weights are hashed byte for byte (a few hundred MB at most here), so
+    a re-downloaded or fine-tuned checkpoint under the same source is
+    converted again instead of reusing stale int8 layers.
+    """
+    digest = hashlib.sha256()
+    for part in (source, type(module).__qualname__, torch.__version__,
+                 torch.backends.quantized.engine, str(QUANTIZED_FORMAT)):
+        digest.update(part.encode() + b"\0")
+    for name, tensor in module.state_dict().items():
+        digest.update(f"{name}:{tuple(tensor.shape)}:{tensor.dtype}".encode() + b"\0")
+        digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+def quantized_path(cache_dir: str, name: str) -> str:
+    """Where the converted layers of a model are cached."""
+    return os.path.join(cache_dir, "quantized", f"{name}.int8.pt")
+
+
+def _swap_layers(module: nn.Module, layers: Dict[str, nn.Module]) -> bool:
+    """Put cached converted layers into an fp32 module; False if the structure differs."""
+    for name in layers:
+        try:
+            module.get_submodule(name)
+        except AttributeError:
+            return False
+    for name, layer in layers.items():
+        parent_name, _, attribute = name.rpartition(".")
+        parent = module.get_submodule(parent_name) if parent_name else module
+        setattr(parent, attribute, layer)
+    return True
+
+
+def load_or_quantize(module: nn.Module,
+                     name: str,
+                     source: str,
+                     cache_dir: str) -> nn.Module:
+    """
+    Dynamic int8 version of a freshly loaded fp32 CPU module.
+
+    Uses the converted layers cached on disk when they were made from the
+    same model; otherwise converts and caches them.
+
+    Args:
+        module: fp32 module (modified in place)
+        name: Cache file name (e.g. "ecapa_tdnn_embedding")
+        source: Model source identifier, part of the fingerprint
+        cache_dir: Model cache directory
+
+    Returns:
+        The quantized module
+    """
+    _select_engine()
+    key = fingerprint(module, source)
+    path = quantized_path(cache_dir, name)
+    module.eval()
+
+    if os.path.exists(path):
+        try:
+            cached = torch.load(path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            print(f"[WARN] Could not read quantized cache {path}: {e}")
+            cached = None
+        if cached and cached.get("fingerprint") == key and _swap_layers(module, cached["layers"]):
+            print(f"[CACHE] Loaded int8 layers for '{name}' ({len(cached['layers'])} layers)")
+            return module
+        print(f"[INFO] Quantized cache for '{name}' is stale; converting again")
+
+    start = time.perf_counter()
+    fp32_bytes = sum(p.numel() * p.element_size() for p in module.parameters())
+    layers = quantize_module(module)
+    int8_bytes = sum(p.numel() * p.element_size() for p in module.parameters())
+    counts: Dict[str, int] = {}
+    for layer in layers.values():
+        kind = type(layer).__name__
+        counts[kind] = counts.get(kind, 0) + 1
+    print(f"[OK] Quantized '{name}' to int8 in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+          + f" ({(fp32_bytes - int8_bytes) / (1024 * 1024):.0f} MB of fp32 weights converted)")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        torch.save({"fingerprint": key, "source": source, "layers": layers}, tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, RuntimeError) as e:
+        print(f"[WARN] Could not cache quantized layers for '{name}': {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return module
+
+
+def resolve_mode(mode: Optional[str], device: str) -> str:
+    """
+    Validate a quantization mode for a device.
+
+    Dynamic int8 kernels are CPU only, so "int8" falls back to "none" on CUDA.
+
+    Args:
+        mode: "none" / "int8" (None = "none")
+        device: "cuda" or "cpu"
+
+    Returns:
+        The mode to use
+    """
+    mode = (mode or "none").lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    if mode != "none" and device != "cpu":
+        print(f"[WARN] {mode} dynamic quantization is CPU only; running fp32 on {device}")
+        return "none"
+    return mode
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server: load the models once, then fork the API workers
+
+`uvicorn api:app --workers N` starts N independent interpreters, each
+loading its own copy of every model. This launcher loads the PyTorch models
+(pyannote diarization and, with the ECAPA backend, the speaker embedding
+model) in the parent, moves their tensors into shared memory, freezes the
+garbage collector and forks N workers that all serve one listening socket.
+The weights then exist once in RAM:
+
+  - Tensor storages live in shared memory, so writes by any worker never
+    trigger a copy-on-write of the weight pages
+  - gc.freeze() moves every object loaded so far out of the collector's
+    generations, so collections in the workers don't write to (and
+    un-share) the pages holding those objects
+
+WhisperX is still loaded per worker: its CTranslate2 model starts native
+worker threads when it is created, and threads do not survive fork().
+Warmup also runs in each worker (see MODEL_WARMUP), since the intra-op
+thread pools it initializes are per process.
+
+CPU only: CUDA cannot be used in a process forked after CUDA was
+initialized. With a GPU, run a single uvicorn worker instead.
+
+Jobs are tracked per worker, so poll GET /jobs/{job_id} through a single
+worker or rely on the callbacks.
+
+Usage:
+    python serve_prefork.py --workers 4
+    python serve_prefork.py --workers 2 --port 5000 --threads 4
+    python measure_worker_memory.py <parent pid>   # verify the sharing
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+from integrated_meeting_system import IntegratedMeetingSystem
+from thread_budget import set_intra_op_threads
+
+import torch
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def build_system() -> IntegratedMeetingSystem:
+    """Build the system the way api.get_system() does and load the shareable models."""
+    huggingface_token = os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_TOKEN")
+    if not huggingface_token:
+        raise RuntimeError("HF_TOKEN or HUGGINGFACE_TOKEN is required")
+    # Same defaults as api.py (importing api here would start its threads before the fork)
+    speaker_db_dir = Path(os.getenv("SPEAKER_DB_DIR", BASE_DIR / "speaker_db")).resolve()
+    Path(os.getenv("OUTPUT_DIR", BASE_DIR / "meeting_output")).resolve().mkdir(parents=True, exist_ok=True)
+    speaker_db_dir.mkdir(parents=True, exist_ok=True)
+
+    system = IntegratedMeetingSystem(
+        huggingface_token=huggingface_token,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        device="cpu",
+        speaker_db_dir=str(speaker_db_dir),
+    )
+    for name in ("diarizer", "recognizer"):
+        pool = system.pools[name]
+        for index in range(pool.size):
+            with pool.checkout(index):
+                pass
+    return system
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(system: IntegratedMeetingSystem, sock: socket.socket, args) -> None:
+    """Child process: serve the API on the inherited socket with the shared models."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Threads do not survive fork(): size the child's torch pool to the
+    # per-replica share its stages reserve
+    set_intra_op_threads(system.replica_threads)
+
+    import uvicorn
+    import api
+
+    # Startup sees the models already loaded and only loads WhisperX and warms up
+    api.system = system
+    config = uvicorn.Config(api.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(system: IntegratedMeetingSystem, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(system, sock, args)
+        except BaseException:  # noqa: BLE001
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"[INFO] Worker started (pid {pid})")
+    return pid
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Serve the API from workers forked after loading the models")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="CPU threads per worker (default: cores / workers)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5, help="HTTP keep-alive timeout (seconds)")
+    args = parser.parse_args()
+    args.threads = args.threads or max(1, cpu_count // args.workers)
+    # Replicas inside one worker split that worker's threads
+    os.environ.setdefault(
+        "REPLICA_THREADS", str(max(1, args.threads // int(os.getenv("JOB_MAX_CONCURRENCY", "1"))))
+    )
+
+    if not sys.platform.startswith("linux"):
+        print("[ERROR] Pre-fork serving needs fork() and is supported on Linux only")
+        sys.exit(1)
+
+    load_start = time.perf_counter()
+    system = build_system()
+    shared_bytes = system.model_cache.share_memory() if system.model_cache else 0
+    if torch.cuda.is_initialized():
+        print("[ERROR] CUDA was initialized in the parent; forked workers could not use it")
+        sys.exit(1)
+    print(f"[OK] Models loaded in {time.perf_counter() - load_start:.1f}s, "
+          f"{shared_bytes / (1024 * 1024):.0f} MB moved to shared memory")
+
+    sock = bind_socket(args.host, args.port)
+    # Objects created so far belong to the shared image; keep the GC off them
+    gc.collect()
+    gc.freeze()
+
+    print(f"[INFO] Forking {args.workers} workers on {args.host}:{args.port} "
+          f"({args.threads} threads each), parent pid {os.getpid()}")
+    workers: Dict[int, int] = {}
+    for slot in range(args.workers):
+        workers[spawn(system, sock, args)] = slot
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: a worker that dies is replaced by a fresh fork of the parent
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = workers.pop(pid, None)
+        if slot is None:
+            continue
+        if stopping:
+            print(f"[INFO] Worker {pid} stopped")
+            continue
+        print(f"[WARN] Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        time.sleep(1)
+        workers[spawn(system, sock, args)] = slot
+
+    print("[OK] All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
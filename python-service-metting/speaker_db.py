@@ -7,27 +7,40 @@ Supports:
   - List enrolled speakers
   - Remove/clear speakers
   - Check if speaker exists
+
+Embeddings are torch tensors, so loading a non-empty database imports torch
+(pickle does so while rebuilding them); this module itself does not.
 """
 
+from __future__ import annotations
+
 import os
 import pickle
 from pathlib import Path
-from typing import Dict, List, Optional
-import torch
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import torch
+
+
+# Embeddings of different models live in different files
+DEFAULT_DB_NAME = "speaker_db.pkl"
+PYANNOTE_DB_NAME = "speaker_db_pyannote.pkl"
 
 
 class SpeakerDatabase:
     """Manages speaker embeddings database."""
     
-    def __init__(self, db_dir: str = "./speaker_db"):
+    def __init__(self, db_dir: str = "./speaker_db", db_name: str = DEFAULT_DB_NAME):
         """
         Initialize speaker database.
         
         Args:
             db_dir: Directory to store speaker embeddings
+            db_name: Database file name (one file per embedding space)
         """
         self.db_dir = db_dir
-        self.db_path = os.path.join(db_dir, "speaker_db.pkl")
+        self.db_path = os.path.join(db_dir, db_name)
         self.metadata_path = os.path.join(db_dir, "metadata.json")
         
         # Create directory if not exists
@@ -55,6 +68,7 @@ class SpeakerDatabase:
         if os.path.exists(self.db_path):
             try:
                 with open(self.db_path, 'rb') as f:
+                    # Rebuilding the tensors imports torch
                     self.speakers = pickle.load(f)
                 print(f"[OK] Loaded {len(self.speakers)} speakers from: {self.db_path}")
                 return True
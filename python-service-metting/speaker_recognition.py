@@ -12,11 +12,31 @@ Supports:
 import os
 import torch
 import torchaudio
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 from torch.nn import CosineSimilarity
 from tqdm import tqdm
 from speaker_db import SpeakerDatabase
-from model_cache import get_model_cache
+from model_cache import ModelCache, get_model_cache
+from ecapa_export import DEFAULT_EXPORT_DIR, INFERENCE_BACKENDS, load_encoder
+from quantization import load_or_quantize, resolve_mode
+
+
+def load_speechbrain_classifier(model_source: str, device: str):
+    """Load the SpeechBrain ECAPA EncoderClassifier."""
+    from speechbrain.inference.speaker import EncoderClassifier
+    from speechbrain.utils.fetching import LocalStrategy
+    
+    return EncoderClassifier.from_hparams(
+        source=model_source,
+        run_opts={"device": device},
+        local_strategy=LocalStrategy.COPY,
+        savedir=os.path.join("pretrained_models", "ecapa-tdnn")
+    )
+    # return EncoderClassifier.from_hparams(
+    #     source="pretrained_models/ecapa-tdnn",
+    #     savedir=os.path.join("pretrained_models", "ecapa-tdnn"),
+    #     run_opts={"device": device},
+    # )
 
 
 class SpeakerRecognizer:
@@ -27,7 +47,12 @@ class SpeakerRecognizer:
                  device: str = None,
                  speaker_db: SpeakerDatabase = None,
                  use_cache: bool = True,
-                 cache_dir: str = "./model_cache"):
+                 cache_dir: str = "./model_cache",
+                 replica: int = 0,
+                 inference_backend: str = "speechbrain",
+                 export_dir: str = DEFAULT_EXPORT_DIR,
+                 quantization: str = "none",
+                 threads: Optional[int] = None):
         """
         Initialize speaker recognizer.
         
@@ -37,31 +62,48 @@ class SpeakerRecognizer:
             speaker_db: SpeakerDatabase instance (creates new if None)
             use_cache: If True, use model caching to avoid reloading
             cache_dir: Directory for model cache
+            replica: Replica index; replicas > 0 load their own model copy
+            inference_backend: "speechbrain", or "torchscript" / "onnx" to run
+                the graph exported by ecapa_export.py
+            export_dir: Directory holding the exported graphs
+            quantization: "int8" to run the embedding model with dynamic int8
+                weights (CPU, speechbrain backend only), "none" for fp32
+            threads: Threads of this replica, for backends that size their own
+                pool (ONNX Runtime); None = all cores
         """
-        from speechbrain.inference.speaker import EncoderClassifier
-        from speechbrain.utils.fetching import LocalStrategy
-        
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.model_source = model_source
         self.use_cache = use_cache
-        self.cache = get_model_cache(cache_dir) if use_cache else None
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown ECAPA inference backend: {inference_backend}")
+        self.inference_backend = inference_backend
+        self.export_dir = export_dir
+        self.threads = threads
+        self.quantization = resolve_mode(quantization, self.device)
+        if self.quantization != "none" and inference_backend != "speechbrain":
+            print(f"[WARN] {self.quantization} quantization applies to the speechbrain backend only; "
+                  f"running the exported {inference_backend} graph as is")
+            self.quantization = "none"
+        # Without the shared cache the model is still kept, just not shared
+        self.cache = get_model_cache(cache_dir) if use_cache else ModelCache(cache_dir)
         
         # Cache key for this model
-        self.model_cache_key = f"ecapa_tdnn_{self.device}"
-        
-        print(f"[INFO] Loading ECAPA-TDNN model on device: {self.device}, cache={'enabled' if use_cache else 'disabled'}")
-        
-        self.classifier = EncoderClassifier.from_hparams(
-            source=model_source,
-            run_opts={"device": self.device},
-            local_strategy=LocalStrategy.COPY,
-            savedir=os.path.join("pretrained_models", "ecapa-tdnn")
-        )
-        # self.classifier = EncoderClassifier.from_hparams(
-        #     source="pretrained_models/ecapa-tdnn",
-        #     savedir=os.path.join("pretrained_models", "ecapa-tdnn"),
-        #     run_opts={"device": self.device},
-        # )
+        backend_key = "" if inference_backend == "speechbrain" else f"{inference_backend}_"
+        quantization_key = "" if self.quantization == "none" else f"{self.quantization}_"
+        self.model_cache_key = (f"ecapa_tdnn_{backend_key}{quantization_key}{self.device}"
+                                + (f"_r{replica}" if replica else ""))
+        self.model_metadata = {
+            "type": "ecapa_tdnn",
+            "model_source": model_source,
+            "device": self.device,
+            "inference_backend": inference_backend,
+            "quantization": self.quantization,
+            "savedir": os.path.join("pretrained_models", "ecapa-tdnn"),
+        }
+        
+        print(f"[INFO] Loading ECAPA-TDNN model ({inference_backend}, {self.quantization}) on device: {self.device}, "
+              f"cache={'enabled' if use_cache else 'disabled'}")
+        self.cache.get_or_load(self.model_cache_key, self._load_classifier, self.model_metadata)
         
         self.cosine_sim = CosineSimilarity(dim=-1)
         
@@ -73,6 +115,28 @@ class SpeakerRecognizer:
         
         print(f"[OK] ECAPA model loaded. Database has {len(self.db)} speakers")
     
+    def _load_classifier(self):
+        classifier = load_encoder(self.inference_backend, self.model_source, self.device,
+                                  self.export_dir, self.threads)
+        if self.quantization == "int8":
+            # Filterbank features stay fp32; the embedding model holds the weights
+            classifier.mods.embedding_model = load_or_quantize(
+                classifier.mods.embedding_model,
+                "ecapa_tdnn_embedding",
+                self.model_source,
+                self.cache.cache_dir,
+            )
+        return classifier
+    
+    def _use_classifier(self):
+        """Hold the classifier (reloaded if it was evicted) while it runs."""
+        return self.cache.use(self.model_cache_key, self._load_classifier, self.model_metadata)
+    
+    @property
+    def classifier(self):
+        """The ECAPA classifier (loaded through the model cache)."""
+        return self.cache.get_or_load(self.model_cache_key, self._load_classifier, self.model_metadata)
+    
     def compute_embedding(self, audio_path: str) -> torch.Tensor:
         """
         Compute ECAPA embedding for audio file.
@@ -91,7 +155,8 @@ class SpeakerRecognizer:
             signal = resampler(signal)
         
         signal = signal.to(self.device)
-        embedding = self.classifier.encode_batch(signal)
+        with self._use_classifier() as classifier:
+            embedding = classifier.encode_batch(signal)
         # Ensure embedding is 1D: [embedding_dim]
         embedding = embedding.squeeze()
         # If still multi-dimensional, flatten it
@@ -99,6 +164,136 @@ class SpeakerRecognizer:
             embedding = embedding.flatten()
         return embedding
     
+    def compute_embeddings_batch(self, waveforms: List[torch.Tensor]) -> torch.Tensor:
+        """
+        Compute ECAPA embeddings for several 16kHz mono waveforms in one pass.
+        
+        Waveforms are right-padded to the longest one; relative lengths are
+        passed to the encoder so padding is ignored by normalization and pooling.
+        
+        Args:
+            waveforms: List of tensors shaped [samples] or [1, samples]
+            
+        Returns:
+            Embedding tensor (shape: [batch, embedding_dim])
+        """
+        signals = [w.reshape(-1) for w in waveforms]
+        lengths = torch.tensor([s.shape[0] for s in signals], dtype=torch.float32)
+        batch = torch.nn.utils.rnn.pad_sequence(signals, batch_first=True)
+        wav_lens = lengths / lengths.max()
+        with torch.no_grad(), self._use_classifier() as classifier:
+            embeddings = classifier.encode_batch(
+                batch.to(self.device), wav_lens.to(self.device)
+            )
+        return embeddings.reshape(len(signals), -1)
+    
+    def match_embeddings(self,
+                         embeddings: torch.Tensor,
+                         threshold: float = 0.25) -> List[Tuple[str, float]]:
+        """
+        Match embeddings against all enrolled speakers (vectorized cosine).
+        
+        Args:
+            embeddings: Tensor shaped [batch, embedding_dim]
+            threshold: Cosine similarity threshold for match
+            
+        Returns:
+            List of (speaker_name, similarity_score) tuples
+        """
+        all_speakers = self.db.get_all_speakers()
+        dim = embeddings.shape[-1]
+        names = [name for name, emb in all_speakers.items() if emb.numel() == dim]
+        if not names:
+            return [("Unknown", 0.0)] * embeddings.shape[0]
+        
+        gallery = torch.stack([all_speakers[name].flatten() for name in names])
+        gallery = gallery.to(embeddings.device, embeddings.dtype)
+        scores = torch.nn.functional.cosine_similarity(
+            embeddings.unsqueeze(1), gallery.unsqueeze(0), dim=-1
+        )
+        best_scores, best_idx = scores.max(dim=1)
+        
+        results = []
+        for score, idx in zip(best_scores.tolist(), best_idx.tolist()):
+            results.append((names[idx], score) if score >= threshold else ("Unknown", score))
+        return results
+    
+    def embed_waveforms(self,
+                        waveforms: List[torch.Tensor],
+                        batch_size: int = 32) -> List[Optional[torch.Tensor]]:
+        """
+        Compute ECAPA embeddings for in-memory 16kHz waveforms in batches.
+        
+        Args:
+            waveforms: List of waveform tensors
+            batch_size: Number of waveforms per encoder call
+            
+        Returns:
+            One CPU embedding per waveform (None for empty or failed crops)
+        """
+        results: List[Optional[torch.Tensor]] = [None] * len(waveforms)
+        
+        # Empty crops cannot be embedded; sort by length to minimise padding
+        valid = [i for i, w in enumerate(waveforms) if w.numel() > 0]
+        valid.sort(key=lambda i: waveforms[i].numel())
+        for start in range(0, len(valid), batch_size):
+            chunk = valid[start:start + batch_size]
+            try:
+                embeddings = list(self.compute_embeddings_batch([waveforms[i] for i in chunk]).cpu())
+            except Exception as e:
+                print(f"[WARN] Batched embedding failed ({e}); falling back to single waveforms")
+                embeddings = []
+                for i in chunk:
+                    try:
+                        embeddings.append(self.compute_embeddings_batch([waveforms[i]]).cpu()[0])
+                    except Exception as single_error:
+                        print(f"[WARN] Error computing embedding: {single_error}")
+                        embeddings.append(None)
+            for i, embedding in zip(chunk, embeddings):
+                results[i] = embedding
+        return results
+    
+    def identify_embeddings(self,
+                            embeddings: List[Optional[torch.Tensor]],
+                            threshold: float = 0.25) -> List[Tuple[str, float]]:
+        """
+        Match a list of embeddings (None entries stay Unknown).
+        
+        Args:
+            embeddings: Embeddings as returned by embed_waveforms
+            threshold: Cosine similarity threshold for match
+            
+        Returns:
+            List of (speaker_name, similarity_score) tuples
+        """
+        results: List[Tuple[str, float]] = [("Unknown", 0.0)] * len(embeddings)
+        valid = [i for i, emb in enumerate(embeddings) if emb is not None]
+        if not valid or len(self.db) == 0:
+            return results
+        matches = self.match_embeddings(torch.stack([embeddings[i] for i in valid]), threshold)
+        for i, match in zip(valid, matches):
+            results[i] = match
+        return results
+    
+    def identify_waveforms(self,
+                           waveforms: List[torch.Tensor],
+                           threshold: float = 0.25,
+                           batch_size: int = 32) -> List[Tuple[str, float]]:
+        """
+        Identify speakers for in-memory 16kHz waveforms, embedding in batches.
+        
+        Args:
+            waveforms: List of waveform tensors
+            threshold: Cosine similarity threshold for match
+            batch_size: Number of waveforms per encoder call
+            
+        Returns:
+            List of (speaker_name, similarity_score) tuples, one per waveform
+        """
+        if len(self.db) == 0:
+            return [("Unknown", 0.0)] * len(waveforms)
+        return self.identify_embeddings(self.embed_waveforms(waveforms, batch_size), threshold)
+    
     def enroll_speaker(self, 
                       speaker_name: str, 
                       audio_files: List[str],
@@ -140,6 +335,29 @@ class SpeakerRecognizer:
             print("[WARN] Failed to persist speaker database to disk")
         return True
     
+    @staticmethod
+    def list_enrollment_files(enroll_dir: str) -> Dict[str, List[str]]:
+        """
+        Group the enrollment files of a directory by speaker name.
+        
+        Speaker name = first part before underscore/extension
+        
+        Args:
+            enroll_dir: Directory containing enrollment audio files
+            
+        Returns:
+            {speaker_name: [file paths]}
+        """
+        speaker_files = {}
+        for fname in os.listdir(enroll_dir):
+            if fname.endswith(('.wav', '.flac', '.mp3')):
+                # Extract speaker name: "khoa_1.wav" -> "khoa"
+                speaker_name = fname.split('_')[0].split('.')[0]
+                if speaker_name not in speaker_files:
+                    speaker_files[speaker_name] = []
+                speaker_files[speaker_name].append(os.path.join(enroll_dir, fname))
+        return speaker_files
+    
     def enroll_speakers_from_directory(self, 
                                       enroll_dir: str,
                                       force: bool = False) -> int:
@@ -167,15 +385,7 @@ class SpeakerRecognizer:
         
         print(f"[PROCESS] Enrolling speakers from: {enroll_dir}")
         
-        # Group files by speaker name
-        speaker_files = {}
-        for fname in os.listdir(enroll_dir):
-            if fname.endswith(('.wav', '.flac', '.mp3')):
-                # Extract speaker name: "khoa_1.wav" -> "khoa"
-                speaker_name = fname.split('_')[0].split('.')[0]
-                if speaker_name not in speaker_files:
-                    speaker_files[speaker_name] = []
-                speaker_files[speaker_name].append(os.path.join(enroll_dir, fname))
+        speaker_files = self.list_enrollment_files(enroll_dir)
         
         newly_enrolled = 0
         skipped = 0
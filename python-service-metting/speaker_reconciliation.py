@@ -0,0 +1,265 @@
+"""
+Speaker Reconciliation Module
+
+Links the per-segment diarization clusters of a meeting into stable
+meeting-wide speaker labels. pyannote labels (SPEAKER_00, ...) are only
+meaningful inside the segment they were produced for; this module keeps a
+small per-meeting store of cluster centroids and speaker turns and maps each
+new segment's clusters onto it:
+
+  1. Overlap anchors: where the new segment overlaps an already reconciled
+     segment in absolute time, clusters speaking at the same moment are the
+     same speaker
+  2. Otherwise the cluster centroid (mean ECAPA embedding) is matched against
+     the meeting speakers by cosine similarity
+  3. Clusters that match nothing become a new meeting speaker
+
+The store keeps each segment's contribution separately, so re-processing a
+segment (retries) or receiving segments out of order gives the same result
+as an in-order run.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class SpeakerReconciler:
+    """Per-meeting store mapping segment diarization clusters to stable labels."""
+
+    def __init__(self,
+                 store_dir: str,
+                 similarity_threshold: float = 0.55,
+                 anchor_min_seconds: float = 1.0,
+                 max_age_seconds: float = 2 * 24 * 3600,
+                 label_format: str = "Speaker {}"):
+        """
+        Initialize reconciler.
+
+        Args:
+            store_dir: Directory holding one JSON store per meeting
+            similarity_threshold: Minimum centroid cosine similarity to link clusters
+            anchor_min_seconds: Minimum co-speaking time in overlaps to link clusters
+            max_age_seconds: Stores untouched for longer than this are deleted
+            label_format: Format of meeting-wide labels (receives a 1-based number)
+        """
+        self.store_dir = Path(store_dir)
+        self.similarity_threshold = similarity_threshold
+        self.anchor_min_seconds = anchor_min_seconds
+        self.max_age_seconds = max_age_seconds
+        self.label_format = label_format
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def reconcile(self,
+                  meeting_id: str,
+                  segment_index: int,
+                  segment_start: float,
+                  entries: List[Dict]) -> Dict[str, str]:
+        """
+        Assign meeting-wide labels to the diarization clusters of one segment.
+
+        Sets entry["meeting_speaker"] on every entry in place.
+
+        Args:
+            meeting_id: Meeting the segment belongs to
+            segment_index: Segment position in the meeting
+            segment_start: Segment start on the meeting timeline (seconds)
+            entries: Merged entries with start/end (segment-relative),
+                     diarization_speaker and embedding
+
+        Returns:
+            Mapping of diarization label -> meeting-wide label
+        """
+        clusters = _segment_clusters(entries, segment_start)
+
+        with self._lock_for(meeting_id):
+            state = self._load(meeting_id)
+            # A retried segment replaces its previous contribution (and keeps its labels)
+            previous = state["segments"].pop(str(segment_index), None) or {}
+            reusable = [turn[2] for turn in previous.get("turns", [])]
+
+            mapping, new_labels = self._link(state, clusters, reusable)
+
+            state["segments"][str(segment_index)] = {
+                "start": segment_start,
+                "turns": [
+                    [start, end, mapping[label]]
+                    for label, cluster in clusters.items()
+                    for start, end in cluster["turns"]
+                ],
+                "clusters": {
+                    mapping[label]: {
+                        "sum": cluster["sum"].tolist(),
+                        "seconds": cluster["seconds"],
+                    }
+                    for label, cluster in clusters.items()
+                    if cluster["sum"] is not None
+                },
+            }
+            self._save(meeting_id, state)
+
+        for entry in entries:
+            entry["meeting_speaker"] = mapping.get(entry.get("diarization_speaker"))
+        linked = len(mapping) - len(new_labels)
+        print(f"[INFO] Reconciled segment {segment_index} of {meeting_id}: "
+              f"{len(mapping)} clusters, {linked} linked to earlier segments")
+        return mapping
+
+    def forget(self, meeting_id: str):
+        """Delete the store of a finished meeting."""
+        with self._lock_for(meeting_id):
+            try:
+                self._path(meeting_id).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _link(self,
+              state: Dict,
+              clusters: Dict[str, Dict],
+              reusable: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Greedy one-to-one matching of segment clusters to meeting speakers.
+
+        Args:
+            state: Meeting store (without the segment being reconciled)
+            clusters: Clusters of the segment being reconciled
+            reusable: Labels created by an earlier run of this segment
+
+        Returns:
+            Tuple of (label mapping, newly created meeting labels)
+        """
+        speakers = _meeting_centroids(state)
+        candidates: List[Tuple[float, str, str]] = []
+
+        for label, cluster in clusters.items():
+            votes = self._anchor_votes(state, cluster["turns"])
+            for speaker, seconds in votes.items():
+                if seconds >= self.anchor_min_seconds:
+                    # Anchors outrank any embedding similarity (which is <= 1)
+                    candidates.append((1.0 + seconds, label, speaker))
+            if cluster["sum"] is None:
+                continue
+            centroid = _normalize(cluster["sum"])
+            for speaker, speaker_centroid in speakers.items():
+                similarity = float(np.dot(centroid, speaker_centroid))
+                if similarity >= self.similarity_threshold:
+                    candidates.append((similarity, label, speaker))
+
+        mapping: Dict[str, str] = {}
+        taken = set()
+        for _, label, speaker in sorted(candidates, reverse=True):
+            if label in mapping or speaker in taken:
+                continue
+            mapping[label] = speaker
+            taken.add(speaker)
+
+        # Longest unmatched clusters get the lowest new numbers
+        new_labels = []
+        for label in sorted(clusters, key=lambda l: -clusters[l]["seconds"]):
+            if label in mapping:
+                continue
+            free = [l for l in dict.fromkeys(reusable) if l not in mapping.values()]
+            if free:
+                mapping[label] = free[0]
+            else:
+                state["next_label"] += 1
+                mapping[label] = self.label_format.format(state["next_label"])
+            new_labels.append(mapping[label])
+        return mapping, new_labels
+
+    def _anchor_votes(self, state: Dict, turns: List[Tuple[float, float]]) -> Dict[str, float]:
+        """Seconds each meeting speaker spoke at the same time as the given turns."""
+        votes: Dict[str, float] = {}
+        for segment in state["segments"].values():
+            for start, end, speaker in segment["turns"]:
+                for turn_start, turn_end in turns:
+                    overlap = min(end, turn_end) - max(start, turn_start)
+                    if overlap > 0:
+                        votes[speaker] = votes.get(speaker, 0.0) + overlap
+        return votes
+
+    def _lock_for(self, meeting_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(meeting_id, threading.Lock())
+
+    def _path(self, meeting_id: str) -> Path:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in meeting_id)
+        return self.store_dir / f"{safe_id}.json"
+
+    def _load(self, meeting_id: str) -> Dict:
+        path = self._path(meeting_id)
+        if path.exists():
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Unreadable speaker store {path.name}, starting over: {e}")
+        return {"meeting_id": meeting_id, "next_label": 0, "segments": {}}
+
+    def _save(self, meeting_id: str, state: Dict):
+        state["updated_at"] = time.time()
+        path = self._path(meeting_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        """Remove stores of meetings that have not been touched for a while."""
+        cutoff = time.time() - self.max_age_seconds
+        for path in self.store_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _segment_clusters(entries: List[Dict], segment_start: float) -> Dict[str, Dict]:
+    """
+    Group entries by diarization label.
+
+    Returns:
+        {label: {"sum": duration-weighted sum of unit embeddings (or None),
+                 "seconds": speaking time, "turns": absolute (start, end) list}}
+    """
+    clusters: Dict[str, Dict] = {}
+    for entry in entries:
+        label = entry.get("diarization_speaker")
+        if label is None:
+            continue
+        cluster = clusters.setdefault(label, {"sum": None, "seconds": 0.0, "turns": []})
+        start = segment_start + float(entry["start"])
+        end = segment_start + float(entry["end"])
+        duration = max(0.0, end - start)
+        cluster["seconds"] += duration
+        cluster["turns"].append((start, end))
+
+        embedding = entry.get("embedding")
+        if embedding is None or duration <= 0:
+            continue
+        vector = _normalize(np.asarray(embedding, dtype=np.float64).reshape(-1)) * duration
+        cluster["sum"] = vector if cluster["sum"] is None else cluster["sum"] + vector
+    return clusters
+
+
+def _meeting_centroids(state: Dict) -> Dict[str, np.ndarray]:
+    """Unit centroid of every meeting speaker, summed over all stored segments."""
+    sums: Dict[str, np.ndarray] = {}
+    for segment in state["segments"].values():
+        for speaker, contribution in segment.get("clusters", {}).items():
+            vector = np.asarray(contribution["sum"], dtype=np.float64)
+            sums[speaker] = vector if speaker not in sums else sums[speaker] + vector
+    return {speaker: _normalize(vector) for speaker, vector in sums.items()}
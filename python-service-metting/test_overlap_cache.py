@@ -0,0 +1,72 @@
+"""
+Overlap cache tests: two overlapping segments go through plan -> store -> plan
+(in either order) and no stretch of the meeting is delivered twice.
+
+Run with: python -m pytest test_overlap_cache.py
+"""
+
+from overlap_cache import OverlapCache
+
+# Segment 0 covers 0-30s, segment 1 covers 25-55s (5 s overlap)
+SEGMENTS = {0: (0.0, 30.0), 1: (25.0, 55.0)}
+
+# What each segment would transcribe on its own (absolute times); entries at
+# a cut are partial, the other segment hears them whole
+TRANSCRIPTS = {
+    0: [(0.0, 10.0), (10.0, 20.0), (20.0, 26.5), (26.5, 29.5), (29.5, 30.0)],
+    1: [(25.0, 26.5), (26.5, 29.5), (29.5, 33.0), (33.0, 55.0)],
+}
+
+
+def run_segment(cache, index):
+    """Process one segment the way api.run_segment_pipeline does."""
+    start, end = SEGMENTS[index]
+    plan = cache.plan("meeting", index, start, end)
+    transcribe_from = start + plan.transcribe_from
+    transcribe_to = end if plan.transcribe_to is None else start + plan.transcribe_to
+    fresh = [
+        {"text": f"{index}:{s}-{e}", "start": s - start, "end": e - start}
+        for s, e in TRANSCRIPTS[index]
+        if s >= transcribe_from and e <= transcribe_to
+    ]
+    delivered = cache.store("meeting", index, start, end, fresh)
+    return [(start + entry["start"], start + entry["end"]) for entry in delivered]
+
+
+def assert_disjoint(ranges):
+    ranges = sorted(ranges)
+    for (_, previous_end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert next_start >= previous_end, f"delivered twice: {ranges}"
+
+
+def test_earlier_segment_first(tmp_path):
+    cache = OverlapCache(str(tmp_path))
+    first = run_segment(cache, 0)
+    second = run_segment(cache, 1)
+
+    assert first == TRANSCRIPTS[0]
+    assert second and min(s for s, _ in second) >= 30.0
+    assert_disjoint(first + second)
+
+
+def test_later_segment_first(tmp_path):
+    cache = OverlapCache(str(tmp_path))
+    first = run_segment(cache, 1)
+    second = run_segment(cache, 0)
+
+    assert first == TRANSCRIPTS[1]
+    assert second and max(e for _, e in second) <= 25.0
+    assert_disjoint(first + second)
+
+
+def test_reprocessed_segment_is_not_its_own_neighbour(tmp_path):
+    cache = OverlapCache(str(tmp_path))
+    run_segment(cache, 0)
+    assert run_segment(cache, 0) == TRANSCRIPTS[0]
+
+
+def test_forget(tmp_path):
+    cache = OverlapCache(str(tmp_path))
+    run_segment(cache, 0)
+    cache.forget("meeting")
+    assert run_segment(cache, 1) == TRANSCRIPTS[1]
@@ -0,0 +1,184 @@
+"""
+CPU Thread Budget
+
+WhisperX (CTranslate2), pyannote and SpeechBrain each size their thread
+pools from the core count, so two jobs running at once oversubscribe the
+CPU and finish later than one job would. This module gives every model
+stage an explicit thread count and admits stages only while their threads
+fit in the process budget:
+
+  - configure_process_threads(): OMP / MKL / OpenBLAS defaults for the
+    worker process, set before torch and CTranslate2 are imported
+  - set_intra_op_threads(): torch's intra-op pool size, set once per process
+  - ThreadBudget.reserve(stage, threads): waits until `threads` cores are
+    free (and fewer than max_stages stages run) before a stage starts
+
+The budget only admits stages; it does not change any thread count. Each
+engine is sized once to the per-replica share (REPLICA_THREADS) and every
+checkout reserves exactly that share:
+  - CTranslate2 (WhisperX): cpu_threads, fixed when a replica is loaded
+  - ONNX Runtime (exported ECAPA): SessionOptions of each replica's session
+  - torch (pyannote, SpeechBrain): torch.set_num_threads is process-wide,
+    not per thread, so it is set once instead of around each stage, where
+    concurrent stages would overwrite each other's value
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from metrics import THREAD_BUDGET_WAIT_SECONDS, THREADS_RESERVED
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+_configured = False
+
+
+def available_cores() -> int:
+    """Cores this process may run on (CPU affinity / cpuset aware)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def process_thread_budget() -> int:
+    """Threads the whole process may use (CPU_THREAD_BUDGET, default: available cores)."""
+    return int(os.getenv("CPU_THREAD_BUDGET", "0")) or available_cores()
+
+
+def configure_process_threads(threads: Optional[int] = None):
+    """
+    Set the default size of the native thread pools of this process.
+
+    Must run before torch / CTranslate2 are imported to affect OpenMP and
+    MKL; variables that are already set are left alone.
+
+    Args:
+        threads: Default threads per stage (REPLICA_THREADS, else the process budget)
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    threads = threads or int(os.getenv("REPLICA_THREADS", "0")) or process_thread_budget()
+    for name in _THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+    if "torch" in sys.modules:
+        print("[WARN] torch was imported before configure_process_threads(); "
+              "OpenMP defaults may not apply")
+
+
+def set_interop_threads(threads: int = 1):
+    """
+    Size torch's inter-op pool (only used by parallel graph execution).
+
+    Stages already run in parallel on their own threads, so one inter-op
+    thread per process avoids another core-count-sized pool. Can only be
+    set before the pool starts; later calls are ignored.
+    """
+    import torch
+    try:
+        torch.set_num_interop_threads(threads)
+    except RuntimeError:
+        pass
+
+
+def set_intra_op_threads(threads: Optional[int]):
+    """
+    Size torch's intra-op pool for the whole process.
+
+    The setting is process-wide, so every torch stage runs with this many
+    threads; set it to the per-replica share the stages reserve.
+
+    Args:
+        threads: Intra-op threads (None/0 = leave torch's default)
+    """
+    if not threads:
+        return
+    import torch
+    torch.set_num_threads(threads)
+
+
+class ThreadBudget:
+    """
+    Admits model stages while their thread counts fit in the process budget.
+
+    The budget never resizes an engine's thread pool; a reservation bounds
+    real thread use because each replica already runs with the fixed count
+    it reserves.
+    """
+
+    def __init__(self,
+                 total_threads: Optional[int] = None,
+                 max_stages: Optional[int] = None):
+        """
+        Initialize budget.
+
+        Args:
+            total_threads: Threads available to all stages (process budget if None)
+            max_stages: Maximum stages running at once (None = limited by threads only)
+        """
+        self.total_threads = total_threads or process_thread_budget()
+        self.max_stages = max_stages
+        self._cond = threading.Condition()
+        self._reserved = 0
+        self._running: Dict[int, int] = {}
+        # FIFO tickets so a large stage is not starved by small ones
+        self._next_ticket = 0
+        self._serving = 0
+
+        print(f"[INFO] Thread budget: {self.total_threads} threads"
+              + (f", at most {max_stages} stages at once" if max_stages else ""))
+
+    @contextmanager
+    def reserve(self, stage: str, threads: int) -> Iterator[int]:
+        """
+        Hold `threads` cores for one stage.
+
+        Admission only: the stage's engine must already run with `threads`
+        threads (see the module docstring).
+
+        Args:
+            stage: Stage name (for metrics)
+            threads: Threads the stage will use (capped at the budget)
+
+        Yields:
+            The number of threads granted
+        """
+        threads = max(1, min(threads, self.total_threads))
+        wait_start = time.perf_counter()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while not (ticket == self._serving and self._fits(threads)):
+                self._cond.wait()
+            self._serving += 1
+            self._reserved += threads
+            self._running[ticket] = threads
+            self._cond.notify_all()
+        THREAD_BUDGET_WAIT_SECONDS.labels(stage).observe(time.perf_counter() - wait_start)
+        THREADS_RESERVED.inc(threads)
+        try:
+            yield threads
+        finally:
+            THREADS_RESERVED.dec(threads)
+            with self._cond:
+                self._reserved -= self._running.pop(ticket)
+                self._cond.notify_all()
+
+    def _fits(self, threads: int) -> bool:
+        if self.max_stages and len(self._running) >= self.max_stages:
+            return False
+        return self._reserved + threads <= self.total_threads
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "total_threads": self.total_threads,
+                "reserved_threads": self._reserved,
+                "running_stages": len(self._running),
+                "waiting_stages": self._next_ticket - self._serving,
+            }
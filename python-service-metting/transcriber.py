@@ -10,8 +10,29 @@ Supports:
 
 import torch
 import whisperx
-from typing import Dict
+from typing import Dict, Optional
 import os
+import time
+from model_cache import ModelCache, get_model_cache
+
+
+def ctranslate2_model_bytes(model_size: str) -> int:
+    """
+    Size of a CTranslate2 Whisper model's weights (model.bin on disk).
+    
+    Args:
+        model_size: Model size name or local model directory
+        
+    Returns:
+        Size in bytes (0 if the model files are not found)
+    """
+    try:
+        from faster_whisper.utils import download_model
+        model_dir = model_size if os.path.isdir(model_size) else download_model(model_size, local_files_only=True)
+        return os.path.getsize(os.path.join(model_dir, "model.bin"))
+    except Exception as e:
+        print(f"[WARN] Could not size WhisperX model '{model_size}': {e}")
+        return 0
 
 
 class Transcriber:
@@ -22,7 +43,9 @@ class Transcriber:
                  device: str = None,
                  compute_type: str = None,
                  use_cache: bool = True,
-                 cache_dir: str = "./model_cache"):
+                 cache_dir: str = "./model_cache",
+                 replica: int = 0,
+                 threads: Optional[int] = None):
         """
         Initialize transcriber.
         
@@ -32,10 +55,19 @@ class Transcriber:
             compute_type: "float16" for GPU, "int8" for CPU (auto-detect if None)
             use_cache: If True, use model caching to avoid reloading
             cache_dir: Directory for model cache
+            replica: Replica index; replicas > 0 load their own model copies
+            threads: CPU threads of the WhisperX model (WhisperX default if None)
         """
         self.model_size = model_size
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.compute_type = compute_type or ("float16" if self.device == "cuda" else "int8")
+        # Without the shared cache the models are still kept, just not shared
+        self.cache = get_model_cache(cache_dir) if use_cache else ModelCache(cache_dir)
+        self.threads = threads
+        self.replica_suffix = f"_r{replica}" if replica else ""
+        self.whisper_cache_key = f"whisperx_{model_size}_{self.device}_{self.compute_type}{self.replica_suffix}"
+        # Duration of the most recent WhisperX model load, per model
+        self.model_load_seconds: Dict[str, float] = {}
         
         print(f"[INFO] Transcriber initialized: model={model_size}, device={self.device}")
     
@@ -76,29 +108,121 @@ class Transcriber:
                     "language": "vi"
                 }
         """
+        audio = self.load_audio(audio_path)
+        result = self.transcribe_audio(audio, language=language, batch_size=batch_size)
+        return self.align(result["segments"], audio, language=language)
+    
+    def load_audio(self, audio_path: str):
+        """
+        Decode audio file into the 16kHz float32 array WhisperX expects.
+        
+        Args:
+            audio_path: Path to audio file
+            
+        Returns:
+            numpy array of samples
+        """
+        return whisperx.load_audio(audio_path)
+    
+    def transcribe_audio(self,
+                         audio,
+                         language: str = "vi",
+                         batch_size: int = 16) -> Dict:
+        """
+        Transcribe decoded audio without word alignment.
+        
+        Args:
+            audio: Audio array from load_audio()
+            language: Language code
+            batch_size: Batch size for processing
+            
+        Returns:
+            Dictionary with unaligned "segments" and "language"
+        """
+        with self.cache.use(self.whisper_cache_key, self._load_whisper, self._whisper_metadata()) as model:
+            print(f"[PROCESS] Transcribing audio...")
+            return model.transcribe(audio, batch_size=batch_size, language=language)
+    
+    def load_models(self, language: str = "vi"):
+        """
+        Load the WhisperX model and the alignment model for a language.
+        
+        Args:
+            language: Language code of the alignment model to load
+        """
+        self.cache.get_or_load(self.whisper_cache_key, self._load_whisper, self._whisper_metadata())
+        self.cache.get_or_load(
+            self._align_cache_key(language),
+            lambda: whisperx.load_align_model(language_code=language, device=self.device),
+            self._align_metadata(language),
+        )
+    
+    def warmup(self, audio, language: str = "vi"):
+        """
+        Transcribe and align a short clip once to trigger first-call allocations.
+        
+        Args:
+            audio: 16kHz float32 audio array (a few seconds is enough)
+            language: Language code
+        """
+        result = self.transcribe_audio(audio, language=language, batch_size=1)
+        # Synthetic audio rarely yields text; align a fixed segment so the
+        # alignment model runs either way
+        segments = result["segments"] or [{"start": 0.0, "end": len(audio) / 16000, "text": "xin chào"}]
+        self.align(segments, audio, language)
+    
+    def _whisper_metadata(self) -> Dict:
+        return {"type": "whisperx", "model_size": self.model_size,
+                "device": self.device, "compute_type": self.compute_type}
+    
+    def _align_cache_key(self, language: str) -> str:
+        return f"whisperx_align_{language}_{self.device}{self.replica_suffix}"
+    
+    def _align_metadata(self, language: str) -> Dict:
+        return {"type": "whisperx_align", "language": language, "device": self.device}
+    
+    def _load_whisper(self):
         print(f"[PROCESS] Loading WhisperX model ({self.model_size})...")
+        load_start = time.perf_counter()
+        options = {"threads": self.threads} if self.threads else {}
         model = whisperx.load_model(
             self.model_size, 
             self.device, 
-            compute_type=self.compute_type
+            compute_type=self.compute_type,
+            **options
         )
+        # CTranslate2 weights are not torch tensors: size the model for the
+        # cache's memory budget from its weights file
+        model.resident_bytes = ctranslate2_model_bytes(self.model_size)
+        self.model_load_seconds[f"whisper_{self.model_size}"] = time.perf_counter() - load_start
+        return model
+    
+    def align(self, segments: list, audio, language: str = "vi") -> Dict:
+        """
+        Align transcript segments to get word-level timestamps.
         
-        print(f"[PROCESS] Transcribing audio...")
-        audio = whisperx.load_audio(audio_path)
-        result = model.transcribe(audio, batch_size=batch_size, language=language)
-        
+        Args:
+            segments: Segments from transcribe_audio()
+            audio: Audio array from load_audio()
+            language: Language code
+            
+        Returns:
+            Dictionary with aligned "segments"
+        """
         print(f"[PROCESS] Aligning timestamps...")
-        model_a, metadata = whisperx.load_align_model(
-            language_code=language, 
-            device=self.device
-        )
-        result = whisperx.align(
-            result["segments"], 
-            model_a, 
-            metadata, 
-            audio, 
-            self.device
-        )
+        # One alignment model per language; idle ones may be evicted
+        with self.cache.use(
+            self._align_cache_key(language),
+            lambda: whisperx.load_align_model(language_code=language, device=self.device),
+            self._align_metadata(language),
+        ) as (model_a, metadata):
+            result = whisperx.align(
+                segments, 
+                model_a, 
+                metadata, 
+                audio, 
+                self.device
+            )
         
         print(f"[OK] Transcription complete: {len(result['segments'])} segments")
         return result